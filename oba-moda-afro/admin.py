@@ -2,13 +2,14 @@
 import os
 from datetime import datetime, timedelta
 from sqlalchemy import func
-from flask_admin import Admin, AdminIndexView, expose 
+from sqlalchemy.orm import selectinload
+from flask_admin import Admin, AdminIndexView, BaseView, expose 
 from flask_admin.contrib.sqla import ModelView
 from flask_ckeditor import CKEditorField
 from flask_admin.form.upload import ImageUploadField
 from flask_admin.menu import MenuLink
 from wtforms.validators import ValidationError
-from flask import flash, redirect, url_for, request, render_template
+from flask import current_app, has_request_context, flash, redirect, url_for, request, render_template
 from flask_login import current_user, logout_user 
 from slugify import slugify
 from wtforms.fields import DateField
@@ -17,6 +18,15 @@ from flask_admin.actions import action
 from slugify import slugify
 
 from extensions import db
+from cache import invalidate
+from counters import counters
+import rollup
+import inventory
+import images
+import assets
+import performance
+import search
+import order_search
 from models import (
     HeaderCategory, CircularCategory, Banner,
     Product, ProductSection, TextSection,
@@ -24,7 +34,7 @@ from models import (
     FooterLink,
     Product, Promotion,
     Order, SiteStat,
-    OrderItem
+    OrderItem, Job
 )
 
 # --- Configuração do Caminho de Upload ---
@@ -34,7 +44,25 @@ upload_path = os.path.join(basedir, 'static', 'uploads')
 
 # --- Views de Admin Personalizadas ---
 
-class SecureModelView(ModelView):
+class AdminCssMixin:
+    """
+    Inclui o FLASK_ADMIN_EXTRA_CSS nas páginas do admin (o Flask-Admin só lê
+    o atributo `extra_css` da view), pela URL com hash (ver assets.py).
+    """
+
+    @property
+    def extra_css(self):
+        # O Flask-Admin também lê os atributos da view ao montar os formulários, fora de requisição
+        if not has_request_context():
+            return []
+        return [assets.asset_url(name) for name in current_app.config.get('FLASK_ADMIN_EXTRA_CSS', ())]
+
+
+class SecureModelView(AdminCssMixin, ModelView):
+    # Namespaces de cache (ver cache.py) invalidados quando este modelo muda
+    cache_namespaces = ()
+    # Campos ImageUploadField cujas versões redimensionadas são geradas (ver images.py)
+    image_fields = ()
     
     def is_accessible(self):
         # Retorna True se o usuário estiver logado
@@ -44,7 +72,26 @@ class SecureModelView(ModelView):
         if not self.is_accessible():
             return redirect(url_for('login', next=request.url))
 
-class SecureAdminIndexView(AdminIndexView):
+    def after_model_change(self, form, model, is_created):
+        invalidate(*self.cache_namespaces)
+        for field in self.image_fields:
+            try:
+                # Gerada em segundo plano; até lá o site usa o original
+                images.enqueue(getattr(model, field))
+            except Exception as e:
+                # O original continua sendo usado; `flask gerar-imagens` tenta de novo
+                flash(f'Não foi possível agendar as versões otimizadas da imagem: {e}', 'warning')
+        super().after_model_change(form, model, is_created)
+
+    def after_model_delete(self, model):
+        invalidate(*self.cache_namespaces)
+        super().after_model_delete(model)
+
+# Quantos produtos de cada lista de estoque aparecem no dashboard
+DASHBOARD_STOCK_PREVIEW = 10
+
+
+class SecureAdminIndexView(AdminCssMixin, AdminIndexView):
     """
     Protege a página inicial do painel admin e exibe o dashboard com filtros.
     """
@@ -101,52 +148,34 @@ class SecureAdminIndexView(AdminIndexView):
         
         # --- 3. QUERIES (DENTRO DE UM 'TRY' CORRIGIDO) ---
         try:
-            # Cria uma consulta base de pedidos dentro do período
-            base_query_pedidos = Order.query.filter(
-                Order.created_at >= start_date,
-                Order.created_at <= end_date
-            )
-            
-            total_leads = base_query_pedidos.count()
-
-            vendas_concluidas_query = base_query_pedidos.filter(Order.status == 'Concluído')
-            total_vendas_concluidas = vendas_concluidas_query.count()
+            # Lê o resumo diário (uma linha por dia e status) em vez dos pedidos
+            resumo = rollup.rows_between(start_date.date(), end_date.date())
 
-            receita_total_raw = db.session.query(func.sum(Order.total_price))\
-                                  .filter(Order.status == 'Concluído')\
-                                  .filter(Order.created_at >= start_date, Order.created_at <= end_date)\
-                                  .scalar()
-            receita_total = receita_total_raw or 0.0
+            total_leads = sum(r.order_count for r in resumo)
+            total_vendas_concluidas = sum(r.order_count for r in resumo if r.status == 'Concluído')
+            receita_total = sum(r.revenue for r in resumo if r.status == 'Concluído')
 
             taxa_conversao = 0.0
             if total_leads > 0:
                 taxa_conversao = (total_vendas_concluidas / total_leads) * 100
 
             # 4. DADOS PARA GRÁFICOS
-            status_data = db.session.query(Order.status, func.count(Order.id))\
-                              .filter(Order.created_at >= start_date, Order.created_at <= end_date)\
-                              .group_by(Order.status).all()
+            pedidos_por_status = {}
+            receita_por_dia = {}
+            for r in resumo:
+                if r.order_count:
+                    pedidos_por_status[r.status] = pedidos_por_status.get(r.status, 0) + r.order_count
+                if r.status == 'Concluído' and r.order_count:
+                    receita_por_dia[r.day] = receita_por_dia.get(r.day, 0.0) + r.revenue
+
             dados_status_pizza = {
-                'labels': [s[0] for s in status_data],
-                'data': [s[1] for s in status_data]
+                'labels': list(pedidos_por_status.keys()),
+                'data': list(pedidos_por_status.values())
             }
 
-            receita_por_dia_raw = db.session.query(
-                                    func.date(Order.created_at), 
-                                    func.sum(Order.total_price)
-                                 ).filter(
-                                    Order.status == 'Concluído',
-                                    Order.created_at >= start_date,
-                                    Order.created_at <= end_date
-                                 ).group_by(
-                                    func.date(Order.created_at)
-                                 ).order_by(
-                                    func.date(Order.created_at)
-                                 ).all()
-            
             dados_receita_linha = {
-                'labels': [ (datetime.strptime(d[0], '%Y-%m-%d') if isinstance(d[0], str) else d[0]).strftime('%d/%m') for d in receita_por_dia_raw ],
-                'data': [float(d[1]) for d in receita_por_dia_raw]
+                'labels': [day.strftime('%d/%m') for day in receita_por_dia],
+                'data': [float(total) for total in receita_por_dia.values()]
             }
             
             # --- CÓDIGO REMOVIDO ---
@@ -155,25 +184,13 @@ class SecureAdminIndexView(AdminIndexView):
             # --- FIM DA REMOÇÃO ---
 
             # --- LÓGICA DE GESTÃO DE ESTOQUE ---
-            LOW_STOCK_THRESHOLD = 5
-            
-            all_active_products = Product.query.filter_by(active=True).all()
-            
-            low_stock_products = [
-                p for p in all_active_products
-                if p.total_stock > 0 and p.total_stock <= LOW_STOCK_THRESHOLD
-            ]
-            
-            out_of_stock_products_inactive = Product.query.filter_by(active=False).all()
-            out_of_stock_products_active = [
-                p for p in all_active_products
-                if p.total_stock == 0
-            ]
-            
-            out_of_stock_products = out_of_stock_products_active + out_of_stock_products_inactive
-            
-            low_stock_count = len(low_stock_products)
-            out_of_stock_count = len(out_of_stock_products)
+            # Contagens e prévias das listas calculadas no SQL (ver inventory.py)
+            contagem_estoque = inventory.summary()
+            low_stock_count = contagem_estoque[inventory.LOW_STOCK]
+            out_of_stock_count = contagem_estoque[inventory.OUT_OF_STOCK]
+
+            low_stock_products = inventory.products_at(inventory.LOW_STOCK, per_page=DASHBOARD_STOCK_PREVIEW)
+            out_of_stock_products = inventory.products_at(inventory.OUT_OF_STOCK, per_page=DASHBOARD_STOCK_PREVIEW)
             
             url_filtro_esgotados = url_for('product.index_view') + '?flt2_0=False'
             # --- FIM DA LÓGICA DE ESTOQUE ---
@@ -192,8 +209,8 @@ class SecureAdminIndexView(AdminIndexView):
                 
                 'low_stock_count': low_stock_count,
                 'out_of_stock_count': out_of_stock_count,
-                'low_stock_products': sorted(low_stock_products, key=lambda p: p.total_stock), 
-                'out_of_stock_products': sorted(out_of_stock_products, key=lambda p: p.name), 
+                'low_stock_products': low_stock_products, 
+                'out_of_stock_products': out_of_stock_products, 
                 'url_filtro_esgotados': url_filtro_esgotados 
             })
 
@@ -228,6 +245,7 @@ class SecureAdminIndexView(AdminIndexView):
 # ... (O resto do arquivo: CategoryView, ProductView, etc. permanece igual) ...
 
 class HeaderCategoryView(SecureModelView):
+    cache_namespaces = ('navegacao',)
     form_columns = ('name', 'category', 'order')
     column_list = ('name', 'category', 'order')
     column_default_sort = ('order', False)
@@ -240,12 +258,18 @@ class HeaderCategoryView(SecureModelView):
     }   
 
 class CategoryView(SecureModelView):
-    form_columns = ('name', 'description', 'products')
-    column_list = ('name', 'slug', 'products')
+    cache_namespaces = ('navegacao', 'home')
+    form_columns = ('name', 'description', 'low_stock_threshold', 'products')
+    column_list = ('name', 'slug', 'low_stock_threshold', 'products')
+    column_labels = {'low_stock_threshold': 'Limite de Baixo Estoque'}
     
     form_args = {
          'products': {
             'label': 'Produtos nesta Categoria'
+         },
+         'low_stock_threshold': {
+            'label': 'Limite de Baixo Estoque',
+            'description': f'Unidades (somando os tamanhos). Vazio = padrão ({inventory.LOW_STOCK_THRESHOLD}).'
          }
     }
 
@@ -266,6 +290,8 @@ class CategoryView(SecureModelView):
 
 
 class ProductView(SecureModelView):
+    cache_namespaces = ('home',)
+    image_fields = ('image',)
     form_overrides = {
         'image': ImageUploadField,
         'description': CKEditorField
@@ -276,7 +302,7 @@ class ProductView(SecureModelView):
             'label': 'Imagem do Produto',
             'base_path': upload_path,
             'url_relative_path': 'uploads/',
-            'namegen': lambda obj, file_data: f'product_{file_data.filename}',
+            'namegen': lambda obj, file_data: assets.hashed_upload_name('product_', file_data),
             'allowed_extensions': ('jpg', 'jpeg', 'png', 'gif', 'webp'),
         },
         'description': {
@@ -297,8 +323,14 @@ class ProductView(SecureModelView):
     }
     
     column_list = ('name', 'categories', 'price',  'image', 'active', 'total_stock', 'view_count', 'cart_add_count', 'slug')
+    # Contadores incluem os incrementos que ainda não foram gravados (ver counters.py)
+    column_formatters = {
+        'view_count': lambda v, c, m, n: (m.view_count or 0) + counters.pending_product(m.id, 'view_count'),
+        'cart_add_count': lambda v, c, m, n: (m.cart_add_count or 0) + counters.pending_product(m.id, 'cart_add_count'),
+    }
     form_columns = ('name', 'categories', 'description', 'price',  'image', 'active', 'slug', 'sections')
     
+    # A caixa de busca usa o índice FTS5 (nome, descrição, categorias, tamanhos; ver search.py)
     column_searchable_list = ('name',) 
     # A ordem aqui é crucial: [0]categories, [1]sections, [2]active
     column_filters = ('categories', 'sections', 'active') 
@@ -309,6 +341,21 @@ class ProductView(SecureModelView):
         'min_entries': 1,
     })]
 
+    def _apply_search(self, query, count_query, joins, count_joins, search_text):
+        # Em vez do LIKE '%...%' do Flask-Admin (varre a tabela inteira)
+        ids = search.matching_ids_subquery(search_text)
+        if ids is None:
+            return query, count_query, joins, count_joins
+        query = query.filter(Product.id.in_(ids))
+        if count_query is not None:
+            count_query = count_query.filter(Product.id.in_(ids))
+        return query, count_query, joins, count_joins
+
+    def get_query(self):
+        # Carrega as variações (total_stock) de todos os produtos da página em lote.
+        # (As categorias da column_list já são carregadas pelo próprio Flask-Admin.)
+        return super().get_query().options(selectinload(Product.variations))
+
     def on_model_change(self, form, model, is_created):
         if form.slug.data:
             model.slug = slugify(form.slug.data)
@@ -359,6 +406,7 @@ class ProductView(SecureModelView):
                 self.session.add(new_product)
             
             self.session.commit()
+            invalidate(*self.cache_namespaces)
             flash(f"{len(ids)} produto(s) duplicado(s) com sucesso. Lembre-se de ativá-los após a edição.", 'success')
         
         except Exception as ex:
@@ -366,6 +414,8 @@ class ProductView(SecureModelView):
                 flash(f"Falha ao duplicar produtos: {ex}", 'error')
 
 class PromotionView(SecureModelView):
+    # 'promocoes' refaz o índice de preços promocionais (ver promotions.py)
+    cache_namespaces = ('home', 'promocoes')
     # Colunas que você vê na lista
     column_list = ('name', 'is_active', 'start_date', 'end_date', 'discount_percent', 'products')
     
@@ -388,6 +438,8 @@ class PromotionView(SecureModelView):
     }
 
 class BannerView(SecureModelView):
+    cache_namespaces = ('home',)
+    image_fields = ('image_url_desktop', 'image_url_mobile')
     form_overrides = {
         'image_url_desktop': ImageUploadField,
         'image_url_mobile': ImageUploadField,
@@ -397,14 +449,14 @@ class BannerView(SecureModelView):
             'label': 'Imagem Desktop (1920x600)',
             'base_path': upload_path,
             'url_relative_path': 'uploads/',
-            'namegen': lambda obj, file_data: f'banner_d_{file_data.filename}',
+            'namegen': lambda obj, file_data: assets.hashed_upload_name('banner_d_', file_data),
             'allowed_extensions': ('jpg', 'jpeg', 'png', 'gif', 'webp'),
         },
         'image_url_mobile': {
             'label': 'Imagem Mobile (opcional) (600x600)',
             'base_path': upload_path,
             'url_relative_path': 'uploads/',
-            'namegen': lambda obj, file_data: f'banner_m_{file_data.filename}',
+            'namegen': lambda obj, file_data: assets.hashed_upload_name('banner_m_', file_data),
             'allowed_extensions': ('jpg', 'jpeg', 'png', 'gif', 'webp'),
         },
         'link_url': {
@@ -421,12 +473,15 @@ class BannerView(SecureModelView):
     column_default_sort = ('order', False)
 
 class FooterLinkView(SecureModelView):
+    cache_namespaces = ('navegacao',)
     form_columns = ('title', 'url', 'order', 'column')
     column_list = ('title', 'url', 'order', 'column')
     column_default_sort = ('column', False)
     column_filters = ('column',)
 
 class CircularCategoryView(SecureModelView):
+    cache_namespaces = ('home',)
+    image_fields = ('image_url',)
     form_overrides = {
         'image_url': ImageUploadField
     }
@@ -435,7 +490,7 @@ class CircularCategoryView(SecureModelView):
             'label': 'Imagem (100x100)',
             'base_path': upload_path,
             'url_relative_path': 'uploads/',
-            'namegen': lambda obj, file_data: f'cat_{file_data.filename}',
+            'namegen': lambda obj, file_data: assets.hashed_upload_name('cat_', file_data),
             'allowed_extensions': ('jpg', 'jpeg', 'png', 'gif', 'webp'),
         },
         'category': {
@@ -450,6 +505,7 @@ class CircularCategoryView(SecureModelView):
     column_filters = ('section',) 
 
 class TextSectionView(SecureModelView):
+    cache_namespaces = ('home',)
     form_overrides = {
         'content': CKEditorField
     }
@@ -459,6 +515,7 @@ class TextSectionView(SecureModelView):
     can_delete = True
 
 class ProductSectionView(SecureModelView):
+    cache_namespaces = ('home',)
     column_list = ('title',)
     form_columns = ('title', 'products')
     form_args = dict(
@@ -495,6 +552,8 @@ class OrderItemView(SecureModelView):
 # --- ATUALIZADO: OrderView (Com lógica de restock) ---
 class OrderView(SecureModelView):
     """Visualização para os Pedidos/Leads"""
+    # Devolver/re-subtrair estoque muda o selo "indisponível" da home
+    cache_namespaces = ('home',)
     can_create = True # criar pedidos manualmente
     can_edit = True
     can_delete = True
@@ -512,21 +571,49 @@ class OrderView(SecureModelView):
 
     column_editable_list = ['status']
     
-    # 'items_summary' agora é uma @property, funciona na lista!
+    # 'items_summary' é uma coluna mantida por order_search.py (não relê os itens de cada pedido)
     column_list = ('id', 'status','created_at', 'total_price', 'items_summary', 'restocked', 'whatsapp_url')
+    column_labels = {'items_summary': 'Itens'}
     
     # 'restocked' não deve ser editável no formulário principal
     form_columns = ('status', 'created_at', 'total_price', 'whatsapp_url')
     
     column_default_sort = ('created_at', True) # Ordenar por mais novo
-    column_searchable_list = ('order_items.variation.product.name',) # Permite buscar pelo nome do produto
+    # Busca pelo nome do produto, tamanho, status ou número do pedido (ver _apply_search)
+    column_searchable_list = ('items_summary',)
     column_filters = ('created_at', 'total_price', 'status', 'restocked')
 
+    def _apply_search(self, query, count_query, joins, count_joins, search_text):
+        # Índice FTS5 dos pedidos em vez do join com itens/variações/produtos + LIKE
+        condition = order_search.search_filter(search_text)
+        if condition is None:
+            return query, count_query, joins, count_joins
+        query = query.filter(condition)
+        if count_query is not None:
+            count_query = count_query.filter(condition)
+        return query, count_query, joins, count_joins
+
     def on_model_change(self, form, model, is_created):
-        """
-        Esta é a lógica de RESTOCK.
-        É acionada sempre que um Pedido é salvo no admin.
-        """
+        """É acionada sempre que um Pedido é salvo no admin."""
+        self._update_stock(form, model, is_created)
+        # Mantém o resumo diário de vendas do dashboard em dia
+        if is_created:
+            rollup.record_order(model)
+        else:
+            rollup.record_order_change(model, model._rollup_snapshot)
+        super().on_model_change(form, model, is_created)
+
+    def update_model(self, form, model):
+        # Guarda os valores antigos antes do formulário ser aplicado
+        model._rollup_snapshot = rollup.snapshot(model)
+        return super().update_model(form, model)
+
+    def on_model_delete(self, model):
+        rollup.remove_order(model)
+        super().on_model_delete(model)
+
+    def _update_stock(self, form, model, is_created):
+        """Esta é a lógica de RESTOCK."""
         if not is_created and 'status' in form.data:
             
             # --- LÓGICA DE CANCELAMENTO ---
@@ -556,7 +643,7 @@ class OrderView(SecureModelView):
                             flash(f"Não foi possível re-subtrair estoque para {item.variation.product.name}. Estoque insuficiente.", "error")
                             # Impede a mudança de status
                             model.status = 'Cancelado' 
-                            return super().on_model_change(form, model, is_created)
+                            return
 
                     # Se todos os itens têm estoque, subtrai
                     for item in model.order_items:
@@ -571,8 +658,6 @@ class OrderView(SecureModelView):
                 except Exception as e:
                     flash(f"Erro ao re-subtrair o estoque: {e}", "danger")
 
-        super().on_model_change(form, model, is_created)
-
 
 class SiteStatView(SecureModelView):
     """Visualização para as Estatísticas"""
@@ -583,6 +668,86 @@ class SiteStatView(SecureModelView):
     can_edit = True 
     
     column_list = ('key', 'value')
+    # Mostra o valor gravado + os incrementos ainda em memória (ver counters.py)
+    column_formatters = {
+        'value': lambda v, c, m, n: (m.value or 0) + counters.pending_stat(m.key)
+    }
+
+
+class JobView(SecureModelView):
+    """Tarefas em segundo plano (ver jobs.py), só para acompanhar."""
+    can_create = False
+    can_edit = False
+    column_list = ('id', 'kind', 'status', 'attempts', 'created_at', 'finished_at', 'payload')
+    column_details_list = ('id', 'kind', 'status', 'attempts', 'payload', 'error',
+                           'created_at', 'started_at', 'finished_at')
+    can_view_details = True
+    column_default_sort = ('id', True)
+    column_filters = ('kind', 'status')
+    column_labels = {
+        'kind': 'Tipo', 'payload': 'Parâmetros', 'attempts': 'Tentativas', 'error': 'Erro',
+        'created_at': 'Criada em', 'started_at': 'Iniciada em', 'finished_at': 'Terminada em'
+    }
+
+
+class InventoryReportView(AdminCssMixin, BaseView):
+    """Lista paginada de produtos com baixo estoque ou esgotados."""
+    per_page = 50
+
+    def is_accessible(self):
+        return current_user.is_authenticated
+
+    def _handle_view(self, name, **kwargs):
+        if not self.is_accessible():
+            return redirect(url_for('login', next=request.url))
+
+    @expose('/')
+    def index(self):
+        level = request.args.get('nivel', inventory.LOW_STOCK)
+        if level not in inventory.LEVEL_LABELS:
+            level = inventory.LOW_STOCK
+        page = request.args.get('page', 1, type=int) or 1
+
+        total = inventory.summary()[level]
+        pages = max(1, -(-total // self.per_page))
+        page = max(1, min(page, pages))
+        return self.render(
+            'admin/estoque.html',
+            level=level,
+            levels=inventory.LEVEL_LABELS,
+            products=inventory.products_at(level, page, self.per_page),
+            page=page,
+            pages=pages,
+            total=total
+        )
+
+
+class PerformanceView(AdminCssMixin, BaseView):
+    """Tempos por rota e requisições lentas medidos por performance.py."""
+
+    def is_accessible(self):
+        return current_user.is_authenticated
+
+    def _handle_view(self, name, **kwargs):
+        if not self.is_accessible():
+            return redirect(url_for('login', next=request.url))
+
+    @expose('/')
+    def index(self):
+        return self.render(
+            'admin/desempenho.html',
+            routes=performance.stats.routes(),
+            slow_requests=performance.stats.slow_requests(),
+            since=performance.stats.since,
+            slow_ms=current_app.config.get('PERF_SLOW_MS'),
+            enabled=current_app.config.get('PERF_ENABLED')
+        )
+
+    @expose('/zerar', methods=['POST'])
+    def reset(self):
+        performance.stats.reset()
+        flash('Medições zeradas.', 'success')
+        return redirect(url_for('.index'))
 
 
 def init_admin(app):
@@ -620,6 +785,12 @@ def init_admin(app):
     
     admin.add_view(SiteStatView(SiteStat, db.session, name='Estatísticas',
                    menu_icon_value='fa-bar-chart'))
+    admin.add_view(JobView(Job, db.session, name='Tarefas em Segundo Plano',
+                   menu_icon_value='fa-tasks'))
+    admin.add_view(InventoryReportView(name='Relatório de Estoque', endpoint='estoque',
+                   menu_icon_value='fa-cubes'))
+    admin.add_view(PerformanceView(name='Desempenho', endpoint='desempenho',
+                   menu_icon_value='fa-tachometer'))
     admin.add_view(PromotionView(Promotion, db.session, name='Promoções (Campanhas)',
                    menu_icon_value='fa-bullhorn'))
     admin.add_link(MenuLink(name='Voltar ao Site', category='', url='/',
@@ -1,5 +1,5 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, abort, jsonify
 from extensions import db, login_manager, bcrypt, migrate # migrate foi importado
 from admin import init_admin
 from flask_ckeditor import CKEditor
@@ -7,8 +7,28 @@ import math
 import os
 import datetime
 from sqlalchemy import not_
+from sqlalchemy.orm import joinedload, selectinload
+from markupsafe import Markup
+from collections import namedtuple
 from urllib.parse import quote_plus as url_escape 
 from flask_login import login_user, logout_user, current_user
+from cache import VersionedCache, invalidate
+from counters import counters
+import rollup
+import cart as cart_service
+import promotions
+import cart_storage
+import images
+import jobs
+import assets
+import conditional
+import changelog
+import product_detail
+import sqlite_profile
+import performance
+import search
+import order_search
+import facets
 
 WHATSAPP_NUMBER = '+5515997479931' 
 
@@ -16,7 +36,13 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 db_path = os.path.join(basedir, 'oba_afro.db')
 upload_folder = os.path.join(basedir, 'static', 'uploads')
 
-def create_app():
+# Itens "congelados" da navegação (podem ficar em cache entre requisições)
+NavLink = namedtuple('NavLink', ['name', 'slug'])
+FooterItem = namedtuple('FooterItem', ['title', 'final_url'])
+
+def create_app(config=None):
+    """Cria a aplicação. `config` (dict) sobrescreve as configurações padrão
+    (ex: outro banco em scripts de benchmark)."""
     app = Flask(__name__)
 
     app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
@@ -25,14 +51,38 @@ def create_app():
     app.config['UPLOAD_FOLDER'] = upload_folder
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
     app.config['FLASK_ADMIN_EXTRA_CSS'] = ['css/admin_custom.css']
+    # Vida máxima (segundos) do corpo da home em cache, mesmo sem edições no admin
+    app.config['HOME_CACHE_TTL'] = 300
+    # Onde guardar o carrinho: 'cookie' (compactado e assinado) ou 'servidor' (ver cart_storage.py)
+    app.config['CART_STORAGE'] = 'cookie'
+    # 'producao' (WAL, pragmas, leitura/escrita separadas) ou None para as opções padrão do SQLite
+    app.config['SQLITE_PROFILE'] = 'producao'
+    app.config.update(config or {})
 
     if not os.path.exists(upload_folder):
         os.makedirs(upload_folder)
 
+    # Perfil de produção do SQLite: WAL, pragmas, pools de leitura e escrita (ver sqlite_profile.py)
+    sqlite_profile.configure(app)
     db.init_app(app)
+    sqlite_profile.init_app(app, db)
+    # Antes dos outros: mede também os after_request deles (ver performance.py)
+    performance.init_app(app)
     login_manager.init_app(app)
     bcrypt.init_app(app)
-    migrate.init_app(app, db) # migrate foi inicializado
+    migrate.init_app(app, db, render_as_batch=True, # migrate foi inicializado (batch: ALTER TABLE no SQLite)
+                     include_name=search.include_name) # as tabelas FTS5 das buscas não são modelos
+    counters.init_app(app)
+    rollup.init_app(app)
+    promotions.init_app(app)
+    cart_storage.init_app(app)
+    jobs.init_app(app)
+    images.init_app(app)
+    assets.init_app(app)
+    conditional.init_app(app)
+    changelog.init_app(app)
+    search.init_app(app)
+    order_search.init_app(app)
     CKEditor(app)
     init_admin(app) 
 
@@ -42,33 +92,45 @@ def create_app():
                         User,
                         FooterLink, # <-- 1. IMPORTAR FooterLink
                         Order, SiteStat,
-                        OrderItem
+                        OrderItem,
+                        product_category_association
                         )
+    from catalog import paginate_products, parse_page_size, SORT_OPTIONS
     
     @login_manager.user_loader
     def load_user(user_id):
         """Função que o Flask-Login usa para recarregar o usuário da sessão."""
         return User.query.get(int(user_id))
 
-    # --- ATUALIZADO: CONTEXT PROCESSOR ---
+    # --- CACHE DA NAVEGAÇÃO (header, categorias e rodapé) ---
+    # Esses dados mudam poucas vezes por mês, então ficam em memória e só são
+    # recarregados quando o admin salva/exclui algo (ver cache.py e admin.py).
+    def load_navigation():
+        header_categories = tuple(
+            NavLink(name=cat.name, slug=cat.category.slug if cat.category else None)
+            for cat in HeaderCategory.query.options(joinedload(HeaderCategory.category))
+                                            .order_by(HeaderCategory.order).all()
+        )
+        all_categories = tuple(
+            NavLink(name=cat.name, slug=cat.slug)
+            for cat in Category.query.order_by(Category.name).all()
+        )
+        # Agrupa os links do rodapé por coluna
+        footer_links_grouped = {}
+        for link in FooterLink.query.order_by(FooterLink.column, FooterLink.order).all():
+            footer_links_grouped.setdefault(link.column, []).append(
+                FooterItem(title=link.title, final_url=link.final_url)
+            )
+        footer_links = {column: tuple(links) for column, links in footer_links_grouped.items()}
+        return header_categories, all_categories, footer_links
+
+    navigation_cache = VersionedCache('navegacao', load_navigation)
+
     @app.context_processor
     def inject_global_data():
-        header_categories = HeaderCategory.query.order_by(HeaderCategory.order).all()
-        
-        cart = session.get('cart', {})
-        cart_item_count = sum(cart.values()) 
+        header_categories, all_categories, footer_links = navigation_cache.get()
         
-        all_categories = Category.query.order_by(Category.name).all()
-        
-        # --- 2. NOVA LÓGICA DO RODAPÉ ---
-        # Busca todos os links e os agrupa por coluna em um dicionário
-        footer_links_db = FooterLink.query.order_by(FooterLink.column, FooterLink.order).all()
-        footer_links_grouped = {}
-        for link in footer_links_db:
-            if link.column not in footer_links_grouped:
-                footer_links_grouped[link.column] = []
-            footer_links_grouped[link.column].append(link)
-        # --- FIM DA LÓGICA DO RODAPÉ ---
+        cart_item_count = sum(cart_storage.current_cart().values()) 
 
         return {
             'now': datetime.datetime.now(),
@@ -77,211 +139,233 @@ def create_app():
             'cart_item_count': cart_item_count,
             'all_categories': all_categories, 
             'current_user': current_user,
-            'footer_links': footer_links_grouped # <-- 3. ENVIA PARA O TEMPLATE
+            'footer_links': footer_links
         }
 
-    def get_stat(key):
-        """Busca ou cria uma estatística e retorna o objeto."""
-        stat = SiteStat.query.filter_by(key=key).first()
-        if not stat:
-            stat = SiteStat(key=key, value=0)
-            db.session.add(stat)
-            # Tenta salvar imediatamente
-            try:
-                db.session.commit()
-            except:
-                db.session.rollback()
-                stat = SiteStat.query.filter_by(key=key).first()
-        return stat
-    
     # --- Rotas da Loja ---
 
-    @app.route('/')
-    def index():
-        try:
-            stat = get_stat('total_visitas')
-            stat.value += 1
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            print(f"Erro ao contar visita: {e}")
-        circular_categories_1 = CircularCategory.query.filter_by(section=1).order_by(CircularCategory.order).all()
-        banners = Banner.query.order_by(Banner.order).all()
-        product_sections = ProductSection.query.all()
-        circular_categories_2 = CircularCategory.query.filter_by(section=2).order_by(CircularCategory.order).all()
+    # --- CACHE DO CORPO DA PÁGINA INICIAL ---
+    # O HTML do corpo da home é igual para todos os visitantes; só o header
+    # (contador do carrinho) e as mensagens flash mudam, e esses continuam sendo
+    # renderizados pelo base.html a cada requisição.
+    def render_home_body():
+        circular_categories_1 = CircularCategory.query.options(joinedload(CircularCategory.category))\
+                                    .filter_by(section=1).order_by(CircularCategory.order).all()
+        banners = Banner.query.options(joinedload(Banner.product)).order_by(Banner.order).all()
+        product_sections = ProductSection.query.options(
+            selectinload(ProductSection.products).options(*Product.listing_options())
+        ).all()
+        circular_categories_2 = CircularCategory.query.options(joinedload(CircularCategory.category))\
+                                    .filter_by(section=2).order_by(CircularCategory.order).all()
         about_section = TextSection.query.filter_by(key='sobre-nos').first()
-        return render_template(
-            'index.html',
+        return Markup(render_template(
+            '_home_conteudo.html',
             circular_categories_1=circular_categories_1,
             banners=banners,
             product_sections=product_sections,
             circular_categories_2=circular_categories_2,
             about_section=about_section
+        ))
+
+    # Com promoções, a home também vence na próxima virada de preço
+    home_cache = VersionedCache(
+        'home', render_home_body,
+        max_age=lambda body: promotions.scheduler.ttl(app.config['HOME_CACHE_TTL'])
+    )
+    promotions.scheduler.register(home_cache)
+
+    @app.route('/')
+    def index():
+        counters.incr_stat('total_visitas')
+        # 304 se nada mudou desde a última visita (ver conditional.py)
+        return conditional.page(lambda: render_template('index.html', home_html=home_cache.get()))
+
+    def current_product_page(query):
+        """Pagina a query com os parâmetros da URL (?ordem=, ?cursor=, ?por_pagina=)."""
+        return paginate_products(
+            query.options(*Product.listing_options()),
+            sort=request.args.get('ordem'),
+            cursor=request.args.get('cursor'),
+            per_page=parse_page_size(request.args.get('por_pagina'))
         )
 
+    def apply_facets(query, category=None):
+        """Filtros da URL (?tamanho=, ?preco=, ...) e contagens, pelo índice em memória (ver facets.py)."""
+        index = facets.current()
+        result = index.apply(facets.parse_selection(request.args, index.categories),
+                             base=category.id if category else None)
+        if result.filtered:
+            query = query.filter(result.id_filter(Product.id))
+        return query, result
+
     @app.route('/produtos')
     def produtos():
-        produtos_list = Product.query.filter_by(active=True).all()
-        return render_template('produtos.html', produtos=produtos_list)
+        def render():
+            query, facet_result = apply_facets(Product.query.filter_by(active=True))
+            page = current_product_page(query)
+            return render_template('produtos.html', produtos=page.items, page=page,
+                                   sort_options=SORT_OPTIONS, facets=facet_result)
+        return conditional.page(render)
 
     @app.route('/categoria/<slug>')
     def categoria_produtos(slug):
-        category = Category.query.filter_by(slug=slug).first_or_404()
-        produtos_list = [product for product in category.products if product.active]
-        return render_template(
-            'categoria_produtos.html', 
-            produtos=produtos_list,
-            category=category
-        )
+        def render():
+            category = Category.query.filter_by(slug=slug).first_or_404()
+            # Filtra os produtos ativos da categoria direto no SQL (join na tabela de associação)
+            query = Product.query.join(
+                product_category_association,
+                product_category_association.c.product_id == Product.id
+            ).filter(
+                product_category_association.c.category_id == category.id,
+                Product.active == True
+            )
+            query, facet_result = apply_facets(query, category)
+            page = current_product_page(query)
+            return render_template(
+                'categoria_produtos.html', 
+                produtos=page.items,
+                page=page,
+                sort_options=SORT_OPTIONS,
+                category=category,
+                facets=facet_result
+            )
+        # Categoria excluída/renomeada muda a versão 'catalogo': o 404 não fica preso no 304
+        return conditional.page(render)
 
     @app.route('/produto/<slug>')
     def produto_detalhe(slug):
-        produto = Product.query.filter_by(slug=slug, active=True).first_or_404()
+        # Produto, variações e categorias em uma query (ver product_detail.py)
+        produto = product_detail.load(slug)
+        if produto is None:
+            abort(404)
         
-        # --- RASTREAMENTO DE VISUALIZAÇÃO DE PRODUTO ---
-        try:
-            produto.view_count += 1
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            print(f"Erro ao contar view do produto: {e}")
-        # --- FIM DO RASTREAMENTO ---
+        # --- RASTREAMENTO DE VISUALIZAÇÃO DE PRODUTO (gravado em lote) ---
+        counters.incr_product(produto.id, 'view_count')
 
-        return render_template(
+        return conditional.page(lambda: render_template(
             'produto_detalhe.html', 
-            produto=produto
-        )
+            produto=produto,
+            size_matrix=product_detail.size_matrix_cache.get(produto)
+        ))
+
+    @app.route('/busca')
+    def busca():
+        # Índice FTS5, ordenado por relevância (ver search.py)
+        termo = request.args.get('q', '').strip()
+        pagina = request.args.get('pagina', 1, type=int) or 1
+        def render():
+            results = search.search(termo, page=pagina)
+            return render_template('busca.html', termo=termo, produtos=results.items, results=results)
+        return conditional.page(render)
+
+    @app.route('/busca/sugestoes')
+    def busca_sugestoes():
+        """Autocompletar do campo de busca: nomes que começam com o que foi digitado."""
+        return jsonify([
+            {'nome': name, 'url': url_for('produto_detalhe', slug=slug)}
+            for name, slug in search.suggest(request.args.get('q', ''))
+        ])
 
     @app.route('/carrinho')
     def carrinho():
-        cart_session = session.get('cart', {})
-        cart_items = []
-        total_price = 0
-        
-        whatsapp_message_lines = ["Olá! Gostaria de fazer o seguinte pedido:\n"]
-        
-        for var_id_str, quantity in cart_session.items():
-            variation = Variation.query.get(var_id_str)
-            if variation:
-                product = variation.product
-                # Preço correto (com promoção)
-                subtotal = product.current_price * quantity
-                total_price += subtotal
-                
-                cart_items.append({
-                    'product': product,
-                    'variation': variation,
-                    'quantity': quantity,
-                    'subtotal': subtotal
-                })
-                whatsapp_message_lines.append(
-                    f"- {quantity}x {product.name} (Tamanho: {variation.size}) - R$ {subtotal:.2f}"
-                )
-
-        whatsapp_message_lines.append(f"\n*Total: R$ {total_price:.2f}*")
-        
-        session['whatsapp_message'] = "\n".join(whatsapp_message_lines)
+        cart_session = cart_storage.current_cart()
+        # Uma única query para todas as linhas (ver cart.py)
+        cart = cart_service.snapshot(cart_session)
+
+        # Remove do carrinho variações que foram excluídas no admin
+        if cart.missing:
+            for var_id_str in cart.missing:
+                cart_session.pop(var_id_str, None)
+            cart_storage.mark_changed()
         
         return render_template(
             'carrinho.html', 
-            cart_items=cart_items, 
-            total_price=total_price
+            cart_items=cart.lines, 
+            total_price=cart.total_price
         )
     
+    def out_of_stock_redirect(line):
+        # Se alguém comprou o item enquanto ele estava no carrinho
+        flash(f'Desculpe, o item {line.product.name} ({line.variation.size}) não tem mais {line.quantity} unidades em estoque. Por favor, ajuste seu carrinho.', 'danger')
+        return redirect(url_for('carrinho'))
+
     # --- ROTA DE CHECKOUT (CRIAR PEDIDO) ATUALIZADA ---
     @app.route('/checkout/criar-pedido', methods=['POST'])
     def criar_pedido():
         """
         Esta rota é chamada quando o usuário clica em "Finalizar Pedido".
-        1. Valida o estoque (previne race condition)
-        2. Subtrai o estoque
+        1. Valida o estoque (aviso rápido ao cliente)
+        2. Subtrai o estoque com UPDATE condicional (previne race condition)
         3. Cria o Pedido (Lead) e os OrderItems no banco
         4. Redireciona ao WhatsApp.
         """
-        cart_session = session.get('cart', {})
-        whatsapp_message = session.get('whatsapp_message', 'Erro: Carrinho vazio.')
+        cart_session = cart_storage.current_cart()
         
         if not cart_session:
             flash('Seu carrinho está vazio.', 'warning')
             return redirect(url_for('carrinho'))
 
-        # --- 1. PASSO DE VALIDAÇÃO (Checa estoque ANTES de subtrair) ---
-        for var_id_str, quantity in cart_session.items():
-            variation = Variation.query.get(var_id_str)
-            if not variation or variation.stock < quantity:
-                # Se alguém comprou o item enquanto ele estava no carrinho
-                flash(f'Desculpe, o item {variation.product.name} ({variation.size}) não tem mais {quantity} unidades em estoque. Por favor, ajuste seu carrinho.', 'danger')
-                return redirect(url_for('carrinho'))
+        # Variações (com produto e promoções) carregadas em uma única query
+        cart = cart_service.snapshot(cart_session)
 
-        # Se a validação passou, o estoque está garantido.
+        # --- 1. PASSO DE VALIDAÇÃO (aviso rápido antes de tentar subtrair) ---
+        if cart.missing:
+            flash('Um dos itens do seu carrinho não está mais disponível. Por favor, revise seu carrinho.', 'danger')
+            return redirect(url_for('carrinho'))
+        for line in cart.lines:
+            if line.variation.stock < line.quantity:
+                return out_of_stock_redirect(line)
 
         # --- 2. PASSO DE PROCESSAMENTO (Subtrai o estoque e cria o pedido) ---
         try:
-            total_price = 0
-            
-            # Cria o Pedido (ainda sem preço total)
-            novo_pedido = Order(total_price=0, status='Pendente')
+            # *** AQUI SUBTRAI O ESTOQUE ***
+            # UPDATE condicional por linha: se outro cliente levou a última
+            # unidade entre a validação e aqui, nada é subtraído (rollback)
+            sold_out_ids = cart_service.reserve_stock(cart)
+
+            # Cria o Pedido com o total calculado no snapshot
+            novo_pedido = Order(total_price=cart.total_price, status='Pendente')
             db.session.add(novo_pedido)
-            
-            items_for_message = [] # Para a msg do WhatsApp
 
-            for var_id_str, quantity in cart_session.items():
-                variation = Variation.query.get(var_id_str)
-                
-                # Preço "congelado" no momento da compra
-                price_at_time = variation.product.current_price
-                total_price += price_at_time * quantity
-                
-                # *** AQUI SUBTRAI O ESTOQUE ***
-                variation.stock -= quantity
-                db.session.add(variation)
-                
+            for line in cart.lines:
                 # Cria o OrderItem (o registro permanente do item)
-                new_item = OrderItem(
+                # com o preço "congelado" no momento da compra
+                db.session.add(OrderItem(
                     order=novo_pedido, 
-                    variation=variation, 
-                    quantity=quantity, 
-                    price_per_item=price_at_time
-                )
-                db.session.add(new_item)
-                items_for_message.append(f"{quantity}x {variation.product.name} ({variation.size})")
-
-            # Agora atualiza o pedido com o preço final
-            novo_pedido.total_price = total_price
-            
-            # Monta a URL do WhatsApp com o ID do Pedido
-            whatsapp_message_lines = [
-                f"Olá! Gostaria de fazer o seguinte pedido:\n",
-                f"*(Nº do Pedido: {novo_pedido.id})*\n"
-            ]
-            for var_id_str, quantity in cart_session.items():
-                 variation = Variation.query.get(var_id_str)
-                 subtotal = variation.product.current_price * quantity
-                 whatsapp_message_lines.append(
-                    f"- {quantity}x {variation.product.name} (Tamanho: {variation.size}) - R$ {subtotal:.2f}"
-                 )
-            whatsapp_message_lines.append(f"\n*Total: R$ {total_price:.2f}*")
-            whatsapp_message = "\n".join(whatsapp_message_lines)
+                    variation_id=line.variation.id, 
+                    quantity=line.quantity, 
+                    price_per_item=line.product.current_price
+                ))
 
+            # Soma o pedido no resumo diário do dashboard (mesma transação)
+            rollup.record_order(novo_pedido, items_sold=cart.item_count)
+            
+            # Monta a URL do WhatsApp com o ID do Pedido (o flush gera o ID)
+            db.session.flush()
+            whatsapp_message = cart_service.whatsapp_message(cart, order_id=novo_pedido.id)
             whatsapp_url = f"https://wa.me/{WHATSAPP_NUMBER}?text={url_escape(whatsapp_message)}"
             novo_pedido.whatsapp_url = whatsapp_url
             
-            # 3. Incrementa a estatística de "checkout"
-            stat = get_stat('total_checkouts_whatsapp')
-            stat.value += 1
-            
-            # 4. Salva tudo no banco
+            # 3. Salva tudo no banco
             db.session.commit()
+            # Algum tamanho esgotou? (muda o selo da home)
+            if sold_out_ids:
+                invalidate('home')
+
+            # 4. Incrementa a estatística de "checkout" (gravada em lote)
+            counters.incr_stat('total_checkouts_whatsapp')
             
             # 5. Limpa o carrinho
-            session.pop('cart', None)
-            session.pop('whatsapp_message', None)
-            session.modified = True
+            cart_storage.clear()
             
             # 6. Redireciona o usuário para o WhatsApp
             flash(f'Seu pedido (Nº {novo_pedido.id}) foi registrado! Estamos te redirecionando para o WhatsApp.', 'success')
             return redirect(whatsapp_url)
 
+        except cart_service.OutOfStock as e:
+            db.session.rollback()
+            return out_of_stock_redirect(e.line)
+
         except Exception as e:
             db.session.rollback()
             flash(f'Ocorreu um erro ao processar seu pedido: {e}. Tente novamente.', 'danger')
@@ -290,8 +374,7 @@ def create_app():
     
     @app.route('/carrinho/adicionar/<int:produto_id>', methods=['POST'])
     def adicionar_carrinho(produto_id):
-        if 'cart' not in session:
-            session['cart'] = {}
+        cart_session = cart_storage.current_cart()
         
         variation_id = request.form.get('variation_id')
         produto = Product.query.get_or_404(produto_id) # <-- Já busca o produto
@@ -313,23 +396,17 @@ def create_app():
             return redirect(url_for('produto_detalhe', slug=produto.slug))
 
         var_id_str = str(variation_id)
-        current_in_cart = session['cart'].get(var_id_str, 0)
+        current_in_cart = cart_session.get(var_id_str, 0)
         total_wanted = current_in_cart + quantity
 
         if total_wanted > variacao.stock:
             flash(f'Desculpe, temos apenas {variacao.stock} unidades de {produto.name} ({variacao.size}) em estoque. (Você já tem {current_in_cart} no carrinho).', 'danger')
         else:
-            session['cart'][var_id_str] = total_wanted
-            session.modified = True 
+            cart_session[var_id_str] = total_wanted
+            cart_storage.mark_changed()
             
-            # --- ADICIONADO: Rastreamento de Adição ao Carrinho ---
-            try:
-                produto.cart_add_count += 1
-                db.session.commit()
-            except Exception as e:
-                db.session.rollback()
-                print(f"Erro ao salvar contagem de carrinho: {e}")
-            # --- FIM DA ADIÇÃO ---
+            # --- Rastreamento de Adição ao Carrinho (gravado em lote) ---
+            counters.incr_product(produto.id, 'cart_add_count')
             
             flash(f'{quantity}x {produto.name} ({variacao.size}) adicionado ao carrinho!', 'success')
             
@@ -337,32 +414,35 @@ def create_app():
 
     @app.route('/carrinho/atualizar', methods=['POST'])
     def atualizar_carrinho():
-        if 'cart' not in session:
+        cart_session = cart_storage.current_cart()
+        if not cart_session:
             return redirect(url_for('carrinho'))
+        cart = cart_service.snapshot(cart_session)
         for var_id_str, new_quantity_str in request.form.items():
-            if var_id_str in session['cart']:
+            if var_id_str in cart_session:
                 try:
                     new_quantity = int(new_quantity_str)
-                    if new_quantity < 1: 
-                        session['cart'].pop(var_id_str, None)
+                    line = cart.line(var_id_str)
+                    if new_quantity < 1 or line is None: 
+                        cart_session.pop(var_id_str, None)
                         continue
-                    variation = Variation.query.get(var_id_str)
-                    if new_quantity > variation.stock:
-                        flash(f'Estoque máximo para {variation.product.name} ({variation.size}) é {variation.stock}.', 'warning')
-                        session['cart'][var_id_str] = variation.stock
+                    if new_quantity > line.variation.stock:
+                        flash(f'Estoque máximo para {line.product.name} ({line.variation.size}) é {line.variation.stock}.', 'warning')
+                        cart_session[var_id_str] = line.variation.stock
                     else:
-                        session['cart'][var_id_str] = new_quantity
+                        cart_session[var_id_str] = new_quantity
                 except (ValueError, TypeError):
                     pass 
-        session.modified = True
+        cart_storage.mark_changed()
         return redirect(url_for('carrinho'))
 
     @app.route('/carrinho/remover/<int:variation_id>')
     def remover_do_carrinho(variation_id):
         var_id_str = str(variation_id)
-        if 'cart' in session and var_id_str in session['cart']:
-            session['cart'].pop(var_id_str, None)
-            session.modified = True
+        cart_session = cart_storage.current_cart()
+        if var_id_str in cart_session:
+            cart_session.pop(var_id_str, None)
+            cart_storage.mark_changed()
             flash('Item removido do carrinho.', 'success')
         return redirect(url_for('carrinho'))
 
@@ -0,0 +1,248 @@
+# assets.py
+"""
+Arquivos estáticos com hash no nome e cache "para sempre" no navegador.
+
+O style.css (e o admin_custom.css, script.js...) era servido sempre com o
+mesmo nome, então o navegador tinha que revalidar a cada visita, e depois
+de um deploy podia continuar usando a versão velha. No deploy rode:
+    flask gerar-assets
+que copia cada arquivo de static/ (menos uploads/) para static/dist/ com o
+hash do conteúdo no nome (`css/style.3f2a9c1b0d4e.css`), grava versões já
+compactadas ao lado (`.gz` e, se o pacote `brotli` estiver instalado, `.br`)
+e um manifest.json {nome original: nome com hash}.
+
+Nos templates use:
+    {{ asset_url('css/style.css') }}
+que devolve a URL da versão com hash (ou a URL normal de /static, se o
+manifest ainda não foi gerado, ex: em desenvolvimento).
+
+Arquivos com hash no nome nunca mudam de conteúdo, então saem com
+`Cache-Control: public, max-age=31536000, immutable`, e a versão compactada
+é escolhida pelo Accept-Encoding. O mesmo vale para os uploads com nome
+baseado no conteúdo: as variantes de images.py e os arquivos enviados pelo
+admin, que passam a ser salvos como `<prefixo><hash>.<ext>` (ver
+hashed_upload_name). Uploads antigos, com o nome original, continuam com o
+cache padrão do Flask.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+from werkzeug.utils import secure_filename
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele, só a versão .gz é gerada
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Pastas de static/ que não entram no build
+SKIP_DIRS = ('uploads', DIST_DIR)
+# Tamanho do hash no nome dos arquivos
+HASH_LENGTH = 12
+# Só vale a pena compactar texto
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+# Versões compactadas, em ordem de preferência: (encoding, extensão)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Só os nomes que este módulo e o images.py geram (caminhos a partir de static/).
+# Um upload antigo com números no nome (`Screenshot_20240101123045.png`) pode
+# ser trocado pelo admin na mesma URL, então não entra aqui.
+_HASHED_NAMES = (
+    # build(): `dist/css/style.3f2a9c1b0d4e.css`
+    re.compile(r'%s/(?:[^/]+/)*[^/]+\.[0-9a-f]{%d}(?:\.[^./]+)?' % (DIST_DIR, HASH_LENGTH)),
+    # hashed_upload_name(): `uploads/product_<24 hex>.jpg`
+    re.compile(r'uploads/(?:[a-z]+_)+[0-9a-f]{%d}(?:\.[a-z0-9]+)?' % (2 * HASH_LENGTH)),
+    # variantes do images.py: `uploads/derivados/<32 hex>-640w.webp`
+    re.compile(r'uploads/derivados/[0-9a-f]{32}-[1-9][0-9]*w\.[a-z0-9]+'),
+)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hashed_name(filename, data):
+    """`css/style.css` -> `css/style.<hash>.css`"""
+    root, ext = os.path.splitext(filename)
+    return f'{root}.{content_hash(data)[:HASH_LENGTH]}{ext}'
+
+
+def hashed_upload_name(prefix, file_data):
+    """
+    Nome para um arquivo enviado pelo admin (namegen do ImageUploadField).
+
+    Em vez do nome que veio do computador de quem enviou (com espaços,
+    acentos, e que pode ser reaproveitado para outra foto), usa o hash do
+    conteúdo: a URL muda sempre que a imagem muda e pode ficar em cache.
+    """
+    stream = file_data.stream
+    sha = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+        sha.update(chunk)
+    stream.seek(0)
+    ext = os.path.splitext(secure_filename(file_data.filename or ''))[1].lower()
+    return f'{prefix}{sha.hexdigest()[:2 * HASH_LENGTH]}{ext}'
+
+
+def is_hashed(filename):
+    """`filename` (relativo a static/) tem o conteúdo fixo pelo nome?"""
+    return any(pattern.fullmatch(filename) for pattern in _HASHED_NAMES)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def _compressed(data):
+    """[(extensão, bytes)] das versões compactadas que ficam menores que o original."""
+    versions = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        versions.append(('.br', brotli.compress(data, quality=11)))
+    return [(ext, packed) for ext, packed in versions if len(packed) < len(data)]
+
+
+def build(static_folder):
+    """
+    Gera static/dist/ e o manifest. Retorna o manifest {original: com hash}.
+
+    Não apaga versões antigas de dist/: páginas ainda em cache (ou servidas
+    por outro worker no meio do deploy) podem pedir o arquivo anterior.
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        rel_root = os.path.relpath(root, static_folder)
+        if rel_root == '.':
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            logical = os.path.normpath(os.path.join(rel_root, name)).replace(os.sep, '/')
+            with open(source, 'rb') as fh:
+                data = fh.read()
+            target_name = hashed_name(logical, data)
+            target = os.path.join(dist, target_name)
+            if not os.path.exists(target):
+                _write(target, data)
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE:
+                for ext, packed in _compressed(data):
+                    if not os.path.exists(target + ext):
+                        _write(target + ext, packed)
+            manifest[logical] = target_name
+    _write(os.path.join(dist, MANIFEST_NAME),
+           json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+class Manifest:
+    """
+    O manifest.json de static/dist, recarregado quando o arquivo muda
+    (um `flask gerar-assets` com a app rodando vale sem reiniciar).
+    """
+
+    def __init__(self):
+        self.path = None
+        self.mtime = None
+        self.entries = {}
+
+    def init_app(self, app):
+        self.path = os.path.join(app.static_folder, DIST_DIR, MANIFEST_NAME)
+
+    def _load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except (OSError, TypeError):
+            self.mtime, self.entries = None, {}
+            return
+        if mtime != self.mtime:
+            try:
+                with open(self.path, encoding='utf-8') as fh:
+                    self.entries = json.load(fh)
+            except (OSError, ValueError):
+                self.entries = {}
+            self.mtime = mtime
+
+    def get(self, filename):
+        self._load()
+        return self.entries.get(filename)
+
+    def version(self):
+        """Muda a cada `flask gerar-assets` (None = sem manifest)."""
+        self._load()
+        return self.mtime
+
+
+manifest = Manifest()
+
+
+def asset_url(filename, **kwargs):
+    """URL de um arquivo de static/: a versão com hash, se já foi gerada."""
+    hashed = manifest.get(filename)
+    if hashed is not None:
+        filename = f'{DIST_DIR}/{hashed}'
+    return url_for('static', filename=filename, **kwargs)
+
+
+def _accepted_encodings():
+    header = request.headers.get('Accept-Encoding', '')
+    accepted = set()
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        if token:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+def send_static(filename):
+    """
+    View /static/<filename>. Arquivos com hash no nome saem imutáveis e, se
+    o navegador aceitar, na versão já compactada; os outros seguem o padrão
+    do Flask.
+    """
+    folder = current_app.static_folder
+    if not is_hashed(filename):
+        return current_app.send_static_file(filename)
+
+    accepted = _accepted_encodings()
+    for encoding, ext in ENCODINGS:
+        if encoding in accepted and os.path.isfile(os.path.join(folder, filename + ext)):
+            # O werkzeug tira o tipo (text/css) e o Content-Encoding de `style.<hash>.css.gz`
+            response = send_from_directory(folder, filename + ext)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(folder, filename)
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+@click.command('gerar-assets')
+def build_command():
+    """Gera static/dist/ (arquivos com hash, .gz/.br e manifest.json)."""
+    generated = build(current_app.static_folder)
+    for logical, hashed in sorted(generated.items()):
+        click.echo(f'{logical} -> {DIST_DIR}/{hashed}')
+    if brotli is None:
+        click.echo('Pacote brotli não instalado: só foram geradas versões .gz.')
+    click.echo(f'{len(generated)} arquivos no manifest.')
+
+
+def init_app(app):
+    manifest.init_app(app)
+    # Troca a view padrão de /static/<path:filename> (mesmo endpoint 'static')
+    app.view_functions['static'] = send_static
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.cli.add_command(build_command)
@@ -0,0 +1,101 @@
+# benchmarks/checkout_stress.py
+"""
+Teste de estresse do checkout: muitas threads tentando comprar o mesmo
+tamanho ao mesmo tempo (ex: queima de estoque / flash sale).
+
+Verifica que o estoque nunca fica negativo e que a soma dos itens vendidos
+é exatamente o que saiu do estoque (nenhuma venda a mais).
+
+Cria um banco SQLite temporário; não toca no oba_afro.db. Uma versão
+pequena roda com os testes (tests/test_checkout.py).
+
+Uso (dentro da pasta oba-moda-afro):
+    python benchmarks/checkout_stress.py [--estoque 20] [--clientes 100] [--threads 16]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+
+from app import create_app
+from extensions import db
+from models import Product, Variation, Order, OrderItem
+
+
+def seed(stock):
+    product = Product(name='Turbante Edição Limitada', slug='turbante-edicao-limitada', price=89.9)
+    product.variations = [Variation(size='Único', stock=stock), Variation(size='Infantil', stock=stock)]
+    db.session.add(product)
+    db.session.commit()
+    return [v.id for v in product.variations]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--estoque', type=int, default=20, help='unidades de cada tamanho')
+    parser.add_argument('--clientes', type=int, default=100, help='checkouts simultâneos')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--quantidade', type=int, default=1, help='unidades por tamanho em cada carrinho')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'stress.db')}",
+                          'TESTING': True})
+        with app.app_context():
+            db.create_all()
+            variation_ids = seed(args.estoque)
+
+        # Todos os carrinhos são montados antes, para os checkouts saírem juntos
+        clients = []
+        for _ in range(args.clientes):
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['cart'] = {str(v): args.quantidade for v in variation_ids}
+            clients.append(client)
+
+        start = threading.Barrier(min(args.threads, args.clientes))
+
+        def checkout(client):
+            try:
+                start.wait(timeout=5)
+            except threading.BrokenBarrierError:
+                pass
+            response = client.post('/checkout/criar-pedido')
+            return 'wa.me' in (response.location or '')
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            results = list(pool.map(checkout, clients))
+        elapsed = time.perf_counter() - began
+
+        with app.app_context():
+            stocks = dict(db.session.query(Variation.id, Variation.stock))
+            orders = db.session.query(func.count(Order.id)).scalar()
+            sold = dict(db.session.query(OrderItem.variation_id, func.sum(OrderItem.quantity))
+                        .group_by(OrderItem.variation_id))
+            db.session.remove()
+            db.engine.dispose()
+
+    ok = sum(results)
+    expected_orders = min(args.clientes, args.estoque // args.quantidade)
+    print(f'{args.clientes} checkouts em {elapsed:.2f}s com {args.threads} threads')
+    print(f'pedidos criados: {orders} (sucesso na resposta: {ok}, máximo possível: {expected_orders})')
+    for variation_id in variation_ids:
+        print(f'variação {variation_id}: estoque final {stocks[variation_id]}, vendido {sold.get(variation_id, 0)}')
+
+    assert all(stock >= 0 for stock in stocks.values()), 'estoque negativo!'
+    for variation_id in variation_ids:
+        assert sold.get(variation_id, 0) + stocks[variation_id] == args.estoque, 'venda a mais (oversell)!'
+    assert orders == ok <= expected_orders, 'pedidos não batem com as respostas'
+    print('OK: nenhum estoque negativo nem venda a mais.')
+
+
+if __name__ == '__main__':
+    main()
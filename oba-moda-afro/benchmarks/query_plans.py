@@ -0,0 +1,128 @@
+# benchmarks/query_plans.py
+"""
+Mostra o plano de execução (EXPLAIN QUERY PLAN) e o tempo das consultas mais
+frequentes da loja, sem e com os índices declarados em models.py.
+
+Cria um banco SQLite temporário com dados sintéticos; não toca no oba_afro.db.
+
+Uso (dentro da pasta oba-moda-afro):
+    python benchmarks/query_plans.py [--produtos 5000] [--pedidos 50000]
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select
+
+from app import create_app
+from extensions import db
+from models import (Product, Variation, Category, Order, OrderItem, CircularCategory,
+                    product_category_association)
+
+
+def seed(num_products, num_orders):
+    rng = random.Random(42)
+    categories = [Category(name=f'Categoria {i}', slug=f'categoria-{i}') for i in range(20)]
+    db.session.add_all(categories)
+    db.session.flush()
+    products = []
+    for i in range(num_products):
+        product = Product(name=f'Produto {i:06d}', slug=f'produto-{i}', price=rng.uniform(10, 500),
+                          active=rng.random() > 0.1)
+        product.categories = rng.sample(categories, 2)
+        product.variations = [Variation(size=size, stock=rng.randint(0, 10)) for size in ('P', 'M', 'G')]
+        products.append(product)
+    db.session.add_all(products)
+    db.session.flush()
+    variation_ids = [v.id for p in products for v in p.variations]
+    start = datetime.datetime.now() - datetime.timedelta(days=730)
+    statuses = ['Pendente', 'Concluído', 'Cancelado']
+    for i in range(num_orders):
+        order = Order(created_at=start + datetime.timedelta(minutes=rng.randint(0, 730 * 24 * 60)),
+                      total_price=rng.uniform(20, 800), status=rng.choice(statuses))
+        order.order_items.append(OrderItem(variation_id=rng.choice(variation_ids),
+                                           quantity=rng.randint(1, 3), price_per_item=50))
+        db.session.add(order)
+    db.session.commit()
+
+
+def hot_queries():
+    """(nome, statement) das consultas que as rotas e o dashboard fazem."""
+    end = datetime.datetime.now()
+    start = end - datetime.timedelta(days=30)
+    return [
+        ('dashboard: pedidos no período',
+         select(func.count(Order.id)).where(Order.created_at >= start, Order.created_at <= end)),
+        ('dashboard: receita concluída',
+         select(func.sum(Order.total_price)).where(Order.status == 'Concluído',
+                                                   Order.created_at >= start, Order.created_at <= end)),
+        ('/produtos: página por nome',
+         select(Product.id).where(Product.active == True).order_by(Product.name, Product.id).limit(25)),
+        ('/categoria: produtos ativos',
+         select(Product.id).join(product_category_association,
+                                 product_category_association.c.product_id == Product.id)
+         .where(product_category_association.c.category_id == 3, Product.active == True)
+         .order_by(Product.name, Product.id).limit(25)),
+        ('listagens: variações (selectin)',
+         select(Variation.id).where(Variation.product_id.in_(list(range(1, 25))))),
+        ('pedido: itens',
+         select(OrderItem.id).where(OrderItem.order_id == 1234)),
+        ('home: bolinhas da seção 1',
+         select(CircularCategory.id).where(CircularCategory.section == 1).order_by(CircularCategory.order)),
+    ]
+
+
+def run(label, repeat):
+    print(f'\n=== {label} ===')
+    with db.engine.connect() as conn:
+        for name, statement in hot_queries():
+            sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+            plan = [row[-1] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql)]
+            began = time.perf_counter()
+            for _ in range(repeat):
+                conn.exec_driver_sql(sql).fetchall()
+            elapsed_ms = (time.perf_counter() - began) * 1000 / repeat
+            print(f'{name:<36} {elapsed_ms:8.3f} ms  | ' + ' / '.join(plan))
+
+
+def set_indexes(enabled):
+    with db.engine.begin() as conn:
+        for table in db.metadata.tables.values():
+            for index in table.indexes:
+                if enabled:
+                    index.create(conn, checkfirst=True)
+                else:
+                    index.drop(conn, checkfirst=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--produtos', type=int, default=5000)
+    parser.add_argument('--pedidos', type=int, default=50000)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}"})
+        with app.app_context():
+            db.create_all()
+            print(f'Gerando {args.produtos} produtos e {args.pedidos} pedidos...')
+            seed(args.produtos, args.pedidos)
+            set_indexes(False)
+            db.session.execute(db.text('ANALYZE'))
+            run('ANTES (sem índices secundários)', args.repeticoes)
+            set_indexes(True)
+            db.session.execute(db.text('ANALYZE'))
+            run('DEPOIS (com índices)', args.repeticoes)
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# benchmarks/sqlite_load.py
+"""
+Teste de carga com vários processos (como workers do gunicorn) lendo
+páginas da loja e gravando contadores no mesmo arquivo SQLite.
+
+Roda a mesma carga com cada perfil (ver sqlite_profile.py):
+  - producao: WAL, synchronous=NORMAL, busy_timeout, leitura/escrita separadas;
+  - padrao:   opções padrão do SQLite (journal "delete", sem pragmas).
+e mostra requisições por segundo, latência e quantos "database is locked".
+
+Cada processo faz, em loop: uma escrita de contadores (um commit com
+`UPDATE ... SET x = x + n`, como o flush de counters.py) a cada
+--escritas leituras, e as leituras são GETs na home, na listagem e em
+páginas de produto, pelo test client do Flask.
+
+Cria bancos SQLite temporários; não toca no oba_afro.db.
+
+Uso (dentro da pasta oba-moda-afro):
+    python benchmarks/sqlite_load.py [--processos 4] [--segundos 10] [--escritas 5] [--produtos 200]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROFILES = {'producao': 'producao', 'padrao': None}
+
+
+def make_app(db_file, profile):
+    from app import create_app
+    return create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_file}',
+                       'SQLITE_PROFILE': PROFILES[profile],
+                       'TESTING': True})
+
+
+def seed(db_file, profile, products):
+    from extensions import db
+    from models import Category, Product, Variation
+    app = make_app(db_file, profile)
+    with app.app_context():
+        db.create_all()
+        category = Category(name='Turbantes', slug='turbantes')
+        for i in range(products):
+            product = Product(name=f'Turbante {i:04d}', slug=f'turbante-{i}', price=50 + i % 40)
+            product.categories = [category]
+            product.variations = [Variation(size='Único', stock=10), Variation(size='Infantil', stock=i % 3)]
+            db.session.add(product)
+        db.session.commit()
+
+
+def worker(db_file, profile, seconds, write_every, products, start_at, results):
+    from counters import counters
+    app = make_app(db_file, profile)
+    client = app.test_client()
+    rng = random.Random(os.getpid())
+    reads = writes = errors = 0
+    latencies = []
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = start_at + seconds
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            if (reads + writes) % (write_every + 1) == write_every:
+                counters.incr_stat('total_visitas')
+                counters.incr_product(rng.randint(1, products), 'view_count')
+                counters.flush()
+                writes += 1
+            else:
+                url = rng.choice(['/', '/produtos', f'/produto/turbante-{rng.randrange(products)}'])
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise RuntimeError(f'{url}: {response.status_code}')
+                reads += 1
+        except Exception as e:
+            errors += 1
+            if 'locked' not in str(e):
+                print(f'[{os.getpid()}] erro: {e}')
+        latencies.append(time.perf_counter() - started)
+    results.put((reads, writes, errors, latencies))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run(profile, args):
+    ctx = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, f'carga-{profile}.db')
+        # Em outro processo: cada perfil configura os engines de um jeito
+        seeder = ctx.Process(target=seed, args=(db_file, profile, args.produtos))
+        seeder.start()
+        seeder.join()
+        results = ctx.Queue()
+        # Todos começam juntos, depois de importar a app
+        start_at = time.time() + 3
+        procs = [ctx.Process(target=worker, args=(db_file, profile, args.segundos, args.escritas,
+                                                  args.produtos, start_at, results))
+                 for _ in range(args.processos)]
+        for proc in procs:
+            proc.start()
+        totals = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+
+    reads = sum(r[0] for r in totals)
+    writes = sum(r[1] for r in totals)
+    errors = sum(r[2] for r in totals)
+    latencies = [lat for r in totals for lat in r[3]]
+    print(f'perfil {profile}: {reads} leituras + {writes} escritas em {args.segundos}s '
+          f'({(reads + writes) / args.segundos:.0f} req/s), {errors} erros; '
+          f'latência p50 {percentile(latencies, 50) * 1000:.1f} ms, '
+          f'p99 {percentile(latencies, 99) * 1000:.1f} ms')
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processos', type=int, default=4)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--escritas', type=int, default=5, help='leituras entre duas escritas de contadores')
+    parser.add_argument('--produtos', type=int, default=200)
+    parser.add_argument('--perfil', choices=sorted(PROFILES), action='append',
+                        help='perfil a testar (padrão: os dois)')
+    args = parser.parse_args()
+
+    for profile in args.perfil or ['producao', 'padrao']:
+        run(profile, args)
+
+
+if __name__ == '__main__':
+    main()
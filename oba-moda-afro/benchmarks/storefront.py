@@ -0,0 +1,393 @@
+# benchmarks/storefront.py
+"""
+Benchmark da loja com catálogos grandes: latência, queries e vazão por rota.
+
+Até aqui só havia o oba_afro.db, com poucos produtos, e nenhum número para
+comparar entre versões. Este script:
+
+1. cria um catálogo sintético pelos modelos de models.py (com os mesmos
+   eventos do site: changelog, row_version...): categorias, menu, bolinhas,
+   banners, seções da vitrine, "Sobre Nós", links do rodapé, promoções,
+   produtos com 3 tamanhos e pedidos com itens, além de um usuário admin;
+2. chama, com o test client do Flask e várias threads (cada uma com o seu
+   cliente/cookies), os cenários:
+      home, produtos, produtos-filtros, categoria, produto, busca, carrinho-adicionar,
+      carrinho, checkout, admin-dashboard, admin-pedidos
+3. mostra, por cenário: requisições/s, latência p50/p95/p99/máx. e
+   queries por requisição (lidas do header Server-Timing, ver
+   performance.py).
+
+Os tamanhos padrão são 1k, 10k e 100k produtos. Popular 100k leva alguns
+minutos; com --banco o banco populado fica guardado e é reaproveitado na
+próxima execução (um arquivo por tamanho).
+
+Para pegar regressões antes do deploy:
+    python benchmarks/storefront.py --saida base.json          # na versão atual
+    python benchmarks/storefront.py --comparar base.json       # na nova versão
+--comparar sai com código 1 se o p95 de algum cenário piorar mais que
+--tolerancia (%) ou se as queries por requisição aumentarem.
+
+Uso (dentro da pasta oba-moda-afro):
+    python benchmarks/storefront.py [--produtos 1000 --produtos 10000] [--threads 4]
+        [--requisicoes 200] [--banco /tmp/bench] [--saida r.json] [--comparar base.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from extensions import db
+from models import (Banner, Category, CircularCategory, FooterLink, HeaderCategory, Order,
+                    OrderItem, Product, ProductSection, Promotion, TextSection, User, Variation)
+import cart_storage
+from counters import counters
+import rollup
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+SIZES = ('P', 'M', 'G')
+ADMIN_EMAIL = 'bench@obamodaafro.com'
+ADMIN_PASSWORD = 'bench'
+# Produtos gravados por commit ao popular
+BATCH = 1000
+
+_QUERIES = re.compile(r'sql;[^,]*desc="(\d+) queries"')
+
+
+# --- Catálogo sintético ---
+
+def seed(num_products, rng):
+    now = datetime.datetime.now()
+    num_categories = max(10, num_products // 100)
+    categories = [Category(name=f'Categoria {i}', slug=f'categoria-{i}', description=f'Descrição {i}')
+                  for i in range(num_categories)]
+    db.session.add_all(categories)
+    db.session.flush()
+    category_ids = [c.id for c in categories]
+
+    db.session.add_all([HeaderCategory(name=c.name, category_id=c.id, order=i)
+                        for i, c in enumerate(categories[:6])])
+    db.session.add_all([CircularCategory(name=c.name, image_url=f'bolinha-{i}.png', category_id=c.id,
+                                         order=i, section=1 + i % 2)
+                        for i, c in enumerate(categories[:8])])
+    db.session.add(TextSection(key='sobre-nos', title='Sobre Nós', content='<p>' + 'Texto. ' * 80 + '</p>'))
+    db.session.add_all([FooterLink(title=f'Link {i}', url=f'/pagina-{i}', order=i, column=1 + i % 3)
+                        for i in range(9)])
+    promotions = [
+        Promotion(name='Campanha em vigor', is_active=True, discount_percent=15,
+                  start_date=now - datetime.timedelta(days=3), end_date=now + datetime.timedelta(days=30)),
+        Promotion(name='Campanha sem fim', is_active=True, discount_percent=10),
+        Promotion(name='Campanha futura', is_active=True, discount_percent=30,
+                  start_date=now + datetime.timedelta(days=10)),
+        Promotion(name='Campanha encerrada', is_active=True, discount_percent=20,
+                  end_date=now - datetime.timedelta(days=1)),
+        Promotion(name='Campanha desligada', is_active=False, discount_percent=50),
+    ]
+    db.session.add_all(promotions)
+    db.session.commit()
+
+    # Produtos em lotes (a sessão não segura 100k objetos de uma vez)
+    promotion_ids = [p.id for p in promotions]
+    for start in range(0, num_products, BATCH):
+        batch_categories = {c.id: c for c in db.session.query(Category).filter(Category.id.in_(category_ids))}
+        batch_promotions = db.session.query(Promotion).filter(Promotion.id.in_(promotion_ids)).all()
+        for i in range(start, min(start + BATCH, num_products)):
+            product = Product(name=f'Produto {i:06d}', slug=f'produto-{i}', price=round(rng.uniform(10, 500), 2),
+                              description='<p>Tecido africano, costura artesanal.</p>', image=f'produto-{i}.png',
+                              active=rng.random() > 0.05)
+            product.categories = [batch_categories[cid] for cid in rng.sample(category_ids, 2)]
+            product.variations = [Variation(size=size, stock=rng.randint(0, 50)) for size in SIZES]
+            if rng.random() < 0.2:
+                product.promotions = [rng.choice(batch_promotions)]
+            db.session.add(product)
+        db.session.commit()
+        db.session.expunge_all()
+
+    featured = db.session.query(Product).filter_by(active=True).order_by(Product.id).limit(36).all()
+    for s in range(3):
+        db.session.add(ProductSection(title=f'Destaques {s + 1}', products=featured[s * 12:(s + 1) * 12]))
+    db.session.add_all([Banner(image_url_desktop=f'banner-{i}.png', image_url_mobile=f'banner-{i}-m.png',
+                               title=f'Banner {i}', subtitle='Coleção nova', order=i,
+                               product_id=featured[i].id if featured else None)
+                        for i in range(5)])
+
+    user = User(email=ADMIN_EMAIL)
+    user.set_password(ADMIN_PASSWORD)
+    db.session.add(user)
+    db.session.commit()
+
+    # Pedidos dos últimos 90 dias (dashboard)
+    num_variations = db.session.query(Variation).count()
+    statuses = ['Pendente', 'Concluído', 'Cancelado']
+    for start in range(0, num_products // 2, BATCH):
+        for _ in range(start, min(start + BATCH, num_products // 2)):
+            order = Order(created_at=now - datetime.timedelta(minutes=rng.randint(0, 90 * 24 * 60)),
+                          total_price=round(rng.uniform(20, 800), 2), status=rng.choice(statuses))
+            for _ in range(rng.randint(1, 3)):
+                order.order_items.append(OrderItem(variation_id=rng.randint(1, num_variations),
+                                                   quantity=rng.randint(1, 3), price_per_item=50))
+            db.session.add(order)
+        db.session.commit()
+    rollup.rebuild()
+
+
+def is_seeded():
+    return db.session.query(User).filter_by(email=ADMIN_EMAIL).first() is not None
+
+
+# --- Cenários: cada um faz uma requisição medida (o preparo não entra no tempo) ---
+
+class Catalog:
+    """Slugs e ids sorteados pelos cenários (lidos uma vez do banco)."""
+
+    def __init__(self):
+        self.product_slugs = [slug for slug, in db.session.query(Product.slug).filter_by(active=True)]
+        self.category_slugs = [slug for slug, in db.session.query(Category.slug)]
+        # (produto, variação) com estoque de sobra para o carrinho e o checkout
+        self.in_stock = db.session.query(Variation.product_id, Variation.id)\
+            .join(Product).filter(Product.active == True, Variation.stock >= 20).all()
+
+
+def _add_to_cart(client, catalog, rng):
+    product_id, variation_id = rng.choice(catalog.in_stock)
+    return client.post(f'/carrinho/adicionar/{product_id}', data={'variation_id': variation_id, 'quantity': 1})
+
+
+def _expect(response, status=200):
+    """(response, erro ou None)."""
+    return response, None if response.status_code == status else f'status {response.status_code}'
+
+
+def scenario_home(client, catalog, rng):
+    return _expect(client.get('/'))
+
+
+def scenario_produtos(client, catalog, rng):
+    return _expect(client.get('/produtos', query_string={'ordem': rng.choice(['nome', 'preco', 'preco-desc', 'novos'])}))
+
+
+def scenario_produtos_filtros(client, catalog, rng):
+    # Facetas (ver facets.py): tamanhos, faixa de preço e em estoque
+    filtros = {'tamanho': rng.sample(SIZES, rng.randint(1, 2)),
+               'preco': rng.choice(['ate-50', '50-100', '100-200', '200-mais'])}
+    if rng.random() < 0.5:
+        filtros['estoque'] = '1'
+    return _expect(client.get('/produtos', query_string=filtros))
+
+
+def scenario_categoria(client, catalog, rng):
+    return _expect(client.get(f'/categoria/{rng.choice(catalog.category_slugs)}'))
+
+
+def scenario_produto(client, catalog, rng):
+    return _expect(client.get(f'/produto/{rng.choice(catalog.product_slugs)}'))
+
+
+def empty_cart(client, catalog, rng):
+    # Começa de um carrinho vazio (senão a quantidade só cresce até esgotar)
+    client.delete_cookie(cart_storage.COOKIE_NAME)
+
+
+def scenario_busca(client, catalog, rng):
+    termo = rng.choice(['tecido africano', 'categoria', rng.choice(catalog.product_slugs).replace('-', ' ')])
+    return _expect(client.get('/busca', query_string={'q': termo}))
+
+
+def scenario_carrinho_adicionar(client, catalog, rng):
+    return _expect(_add_to_cart(client, catalog, rng), 302)
+
+
+def scenario_carrinho(client, catalog, rng):
+    return _expect(client.get('/carrinho'))
+
+
+def scenario_checkout(client, catalog, rng):
+    response = client.post('/checkout/criar-pedido')
+    if response.status_code == 302 and response.location.startswith('https://wa.me/'):
+        return response, None
+    return response, f'não redirecionou ao WhatsApp ({response.location})'
+
+
+def scenario_admin(client, catalog, rng):
+    return _expect(client.get('/admin/'))
+
+
+def scenario_admin_pedidos(client, catalog, rng):
+    # Lista de pedidos: 2 em cada 3 com uma busca por produto ou status
+    termo = rng.choice(['', rng.choice(catalog.product_slugs).replace('-', ' '), 'cancelado'])
+    return _expect(client.get('/admin/order/', query_string={'search': termo} if termo else None))
+
+
+# (nome, requisição medida, preparo antes de cada requisição)
+SCENARIOS = [
+    ('home', scenario_home, None),
+    ('produtos', scenario_produtos, None),
+    ('produtos-filtros', scenario_produtos_filtros, None),
+    ('categoria', scenario_categoria, None),
+    ('produto', scenario_produto, None),
+    ('busca', scenario_busca, None),
+    ('carrinho-adicionar', scenario_carrinho_adicionar, empty_cart),
+    ('carrinho', scenario_carrinho, None),
+    ('checkout', scenario_checkout, _add_to_cart),
+    ('admin-dashboard', scenario_admin, None),
+    ('admin-pedidos', scenario_admin_pedidos, None),
+]
+
+
+def _prepare_client(client, name, catalog, rng):
+    if name == 'carrinho':
+        for _ in range(3):
+            _add_to_cart(client, catalog, rng)
+    elif name.startswith('admin-'):
+        client.post('/login', data={'email': ADMIN_EMAIL, 'senha': ADMIN_PASSWORD})
+
+
+# --- Driver ---
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run_scenario(app, catalog, name, func, setup, threads, requests, warmup):
+    local = threading.local()
+
+    def one(i):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+            local.rng = random.Random(f'{name}-{threading.get_ident()}')
+            _prepare_client(local.client, name, catalog, local.rng)
+        if setup is not None:
+            setup(local.client, catalog, local.rng)
+        started = time.perf_counter()
+        response, error = func(local.client, catalog, local.rng)
+        elapsed = time.perf_counter() - started
+        match = _QUERIES.search(response.headers.get('Server-Timing', ''))
+        return elapsed, int(match.group(1)) if match else 0, error
+
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(one, range(warmup)))
+        started = time.perf_counter()
+        results = list(pool.map(one, range(requests)))
+        wall = time.perf_counter() - started
+
+    latencies = [r[0] for r in results]
+    errors = [r[2] for r in results if r[2]]
+    if errors:
+        print(f'  {name}: {len(errors)} erro(s), ex: {errors[0]}')
+    return {
+        'requests': requests,
+        'rps': requests / wall if wall else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': max(latencies) * 1000,
+        'queries': sum(r[1] for r in results) / len(results),
+        'errors': len(errors),
+    }
+
+
+def run_size(num_products, args):
+    tmp = None
+    if args.banco:
+        os.makedirs(args.banco, exist_ok=True)
+        db_file = os.path.join(args.banco, f'loja-{num_products}.db')
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        db_file = os.path.join(tmp.name, f'loja-{num_products}.db')
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_file}', 'TESTING': True,
+                      'PERF_SERVER_TIMING': True, 'PERF_PROFILE_RATE': 0})
+    try:
+        with app.app_context():
+            db.create_all()
+            if not is_seeded():
+                started = time.perf_counter()
+                seed(num_products, random.Random(args.semente))
+                print(f'{num_products} produtos populados em {time.perf_counter() - started:.0f}s ({db_file})')
+            catalog = Catalog()
+
+        print(f'\n== {num_products} produtos, {args.threads} threads, {args.requisicoes} requisições por cenário ==')
+        print(f'{"cenário":<20}{"req/s":>9}{"p50":>9}{"p95":>9}{"p99":>9}{"máx":>9}{"queries":>9}{"erros":>7}')
+        results = {}
+        for name, func, setup in SCENARIOS:
+            if args.cenario and name not in args.cenario:
+                continue
+            r = results[name] = run_scenario(app, catalog, name, func, setup, args.threads,
+                                             args.requisicoes, args.aquecimento)
+            print(f'{name:<20}{r["rps"]:>9.1f}{r["p50_ms"]:>9.1f}{r["p95_ms"]:>9.1f}{r["p99_ms"]:>9.1f}'
+                  f'{r["max_ms"]:>9.1f}{r["queries"]:>9.1f}{r["errors"]:>7}')
+        return results
+    finally:
+        # Grava as visitas ainda em memória antes de o banco temporário sumir
+        counters.flush()
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+        if tmp is not None:
+            tmp.cleanup()
+
+
+def compare(results, baseline, tolerance):
+    """Lista as regressões em relação a um resultado salvo com --saida."""
+    regressions = []
+    for size, scenarios in results.items():
+        for name, r in scenarios.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            if r['p95_ms'] > base['p95_ms'] * (1 + tolerance / 100):
+                regressions.append(f'{size} produtos / {name}: p95 {base["p95_ms"]:.1f} -> {r["p95_ms"]:.1f} ms')
+            if r["queries"] > base["queries"] + 0.5:
+                regressions.append(f'{size} produtos / {name}: queries {base["queries"]:.1f} -> {r["queries"]:.1f}')
+            if r['errors'] > base['errors']:
+                regressions.append(f'{size} produtos / {name}: {r["errors"]} erro(s)')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--produtos', type=int, action='append',
+                        help='tamanho do catálogo (pode repetir; padrão: 1000, 10000 e 100000)')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--requisicoes', type=int, default=200, help='requisições medidas por cenário')
+    parser.add_argument('--aquecimento', type=int, default=20, help='requisições antes de medir (caches)')
+    parser.add_argument('--cenario', choices=[name for name, _, _ in SCENARIOS], action='append',
+                        help='cenário a rodar (pode repetir; padrão: todos)')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--banco', help='pasta onde guardar (e reaproveitar) os bancos populados')
+    parser.add_argument('--saida', help='grava os resultados em JSON')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior (--saida) para comparar')
+    parser.add_argument('--tolerancia', type=float, default=20, help='piora aceita no p95, em %%')
+    args = parser.parse_args()
+
+    results = {str(size): run_size(size, args) for size in args.produtos or DEFAULT_SIZES}
+
+    if args.saida:
+        with open(args.saida, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.comparar:
+        with open(args.comparar) as f:
+            regressions = compare(results, json.load(f), args.tolerancia)
+        if regressions:
+            print('\nRegressões:')
+            for line in regressions:
+                print(f'  {line}')
+            sys.exit(1)
+        print('\nNenhuma regressão em relação a', args.comparar)
+
+
+if __name__ == '__main__':
+    main()
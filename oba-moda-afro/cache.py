@@ -0,0 +1,146 @@
+# cache.py
+"""
+Cache em memória (por processo) para dados que mudam pouco, como a
+navegação do site (header, categorias e rodapé).
+
+Cada "namespace" de cache tem um carimbo de versão guardado no banco
+(tabela `cache_version`). Quando o admin salva ou exclui algo, a versão é
+incrementada; os outros workers percebem a mudança ao reler os carimbos,
+o que é feito no máximo uma vez a cada VERSION_CHECK_INTERVAL segundos
+(uma única query pequena, em vez de recarregar tudo a cada página).
+"""
+import datetime
+import threading
+import time
+
+from extensions import db
+
+# Intervalo mínimo (segundos) entre leituras dos carimbos de versão no banco
+VERSION_CHECK_INTERVAL = 2.0
+
+
+class VersionRegistry:
+    """Guarda (em memória) a última versão conhecida de cada namespace."""
+
+    def __init__(self, check_interval=VERSION_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._versions = {}
+        self._updated_at = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        from models import CacheVersion
+        rows = db.session.query(CacheVersion.namespace, CacheVersion.version,
+                                CacheVersion.updated_at).all()
+        self._versions = {namespace: version for namespace, version, _ in rows}
+        self._updated_at = {namespace: updated_at for namespace, _, updated_at in rows}
+        self._checked_at = time.monotonic()
+
+    def current(self, namespace):
+        """Versão atual do namespace (relida do banco se o intervalo expirou)."""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self.check_interval:
+                    self._refresh()
+        return self._versions.get(namespace, 0)
+
+    def updated_at(self, namespace):
+        """Quando o namespace mudou pela última vez (None = nunca), junto com current()."""
+        self.current(namespace)
+        return self._updated_at.get(namespace)
+
+    def bump(self, *namespaces):
+        """Incrementa a versão dos namespaces (visível para todos os workers)."""
+        from models import CacheVersion
+        if not namespaces:
+            return
+        now = datetime.datetime.now()
+        for namespace in set(namespaces):
+            updated = CacheVersion.query.filter_by(namespace=namespace).update(
+                {CacheVersion.version: CacheVersion.version + 1,
+                 CacheVersion.updated_at: now},
+                synchronize_session=False
+            )
+            if not updated:
+                db.session.add(CacheVersion(namespace=namespace, version=1, updated_at=now))
+        db.session.commit()
+        self.expire()
+
+    def bump_in_transaction(self, connection, *namespaces):
+        """
+        Como bump(), mas dentro da transação de `connection`, sem commit: a
+        versão muda junto com os dados (ou não muda, se houver rollback).
+        Chame expire() depois do commit.
+        """
+        from models import CacheVersion
+        table = CacheVersion.__table__
+        now = datetime.datetime.now()
+        for namespace in set(namespaces):
+            updated = connection.execute(
+                table.update().where(table.c.namespace == namespace)
+                     .values(version=table.c.version + 1, updated_at=now)
+            ).rowcount
+            if not updated:
+                connection.execute(table.insert().values(namespace=namespace, version=1, updated_at=now))
+
+    def expire(self):
+        """Força a releitura dos carimbos na próxima consulta deste worker."""
+        with self._lock:
+            self._checked_at = 0.0
+
+
+versions = VersionRegistry()
+
+
+class VersionedCache:
+    """
+    Guarda o resultado de `loader()` enquanto a versão do namespace não mudar.
+
+    O valor guardado deve ser "puro" (tuplas, dicts, strings): objetos do
+    SQLAlchemy não podem ser reaproveitados entre requisições.
+
+    `max_age` (segundos) limita a vida do valor mesmo sem mudança de versão,
+    para conteúdos que dependem do relógio (ex: preços de promoções). Também
+    pode ser uma função que recebe o valor carregado e devolve os segundos
+    (ou None para não expirar).
+    """
+
+    def __init__(self, namespace, loader, max_age=None):
+        self.namespace = namespace
+        self.loader = loader
+        self.max_age = max_age
+        self._entry = None
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, entry, version):
+        return (entry is not None and entry[0] == version
+                and (entry[1] is None or time.monotonic() < entry[1]))
+
+    def get(self):
+        version = versions.current(self.namespace)
+        entry = self._entry
+        if self._is_fresh(entry, version):
+            return entry[2]
+        with self._lock:
+            entry = self._entry
+            if not self._is_fresh(entry, version):
+                value = self.loader()
+                max_age = self.max_age(value) if callable(self.max_age) else self.max_age
+                expires_at = time.monotonic() + max_age if max_age is not None else None
+                entry = (version, expires_at, value)
+                self._entry = entry
+        return entry[2]
+
+    def peek(self):
+        """Valor guardado (mesmo vencido), sem carregar nem checar versão."""
+        entry = self._entry
+        return entry[2] if entry is not None else None
+
+    def clear(self):
+        self._entry = None
+
+
+def invalidate(*namespaces):
+    """Invalida os caches dos namespaces em todos os workers."""
+    versions.bump(*namespaces)
@@ -0,0 +1,154 @@
+# cart.py
+"""
+Carrinho de compras: carrega todas as linhas do carrinho de uma vez.
+
+O carrinho (ver cart_storage.py) guarda só {variation_id (str): quantidade}.
+Antes cada rota buscava as variações uma a uma (e depois o produto e as
+promoções de cada uma). Aqui uma única query (variação + produto, com IN nos
+ids) monta um CartSnapshot imutável, com valores simples, usado pela página
+do carrinho, pela atualização de quantidades e pelo checkout.
+
+No checkout o estoque é subtraído com UPDATEs condicionais
+(`... SET stock = stock - :q WHERE id = :id AND stock >= :q`): o banco só
+subtrai se ainda houver estoque, então dois checkouts simultâneos da última
+unidade não conseguem vender a mesma peça duas vezes.
+"""
+import datetime
+from collections import namedtuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import contains_eager
+
+import changelog
+from extensions import db
+from models import Variation
+
+CartProduct = namedtuple('CartProduct', ['id', 'name', 'slug', 'image', 'price', 'current_price', 'is_on_sale'])
+CartVariation = namedtuple('CartVariation', ['id', 'size', 'stock'])
+CartLine = namedtuple('CartLine', ['product', 'variation', 'quantity', 'subtotal'])
+
+
+class OutOfStock(Exception):
+    """Uma linha do carrinho não tem mais estoque suficiente."""
+
+    def __init__(self, line):
+        super().__init__(f'{line.product.name} ({line.variation.size})')
+        self.line = line
+
+
+class CartSnapshot(namedtuple('CartSnapshot', ['lines', 'total_price', 'missing'])):
+    """
+    Foto do carrinho no momento da leitura.
+
+    `lines` segue a ordem da sessão; `missing` são os ids (str) de variações
+    que estão na sessão mas não existem mais no banco.
+    """
+    __slots__ = ()
+
+    @property
+    def item_count(self):
+        return sum(line.quantity for line in self.lines)
+
+    def line(self, variation_id):
+        for line in self.lines:
+            if line.variation.id == int(variation_id):
+                return line
+        return None
+
+
+def _variation_ids(cart_session):
+    ids = []
+    for var_id_str in cart_session:
+        try:
+            ids.append(int(var_id_str))
+        except (ValueError, TypeError):
+            continue
+    return ids
+
+
+def load_variations(cart_session):
+    """
+    {id: Variation} das variações do carrinho, com o produto já carregado,
+    em uma única query (JOIN + IN). Os preços promocionais vêm do índice
+    em memória (ver promotions.py).
+    """
+    ids = _variation_ids(cart_session)
+    if not ids:
+        return {}
+    stmt = select(Variation)\
+        .join(Variation.product)\
+        .options(contains_eager(Variation.product))\
+        .where(Variation.id.in_(ids))
+    return {variation.id: variation for variation in db.session.execute(stmt).unique().scalars()}
+
+
+def snapshot(cart_session, variations=None):
+    """Monta o CartSnapshot. Passe `variations` para reaproveitar load_variations()."""
+    if variations is None:
+        variations = load_variations(cart_session)
+    lines = []
+    missing = []
+    total_price = 0
+    for var_id_str, quantity in cart_session.items():
+        try:
+            variation = variations.get(int(var_id_str))
+        except (ValueError, TypeError):
+            variation = None
+        if variation is None:
+            missing.append(var_id_str)
+            continue
+        product = variation.product
+        # Preço correto (com promoção)
+        current_price = product.current_price
+        subtotal = current_price * quantity
+        total_price += subtotal
+        lines.append(CartLine(
+            product=CartProduct(product.id, product.name, product.slug, product.image,
+                                product.price, current_price, product.is_on_sale),
+            variation=CartVariation(variation.id, variation.size, variation.stock),
+            quantity=quantity,
+            subtotal=subtotal
+        ))
+    return CartSnapshot(lines=tuple(lines), total_price=total_price, missing=tuple(missing))
+
+
+def whatsapp_message(cart, order_id=None):
+    """Texto do pedido enviado ao WhatsApp."""
+    lines = ["Olá! Gostaria de fazer o seguinte pedido:\n"]
+    if order_id is not None:
+        lines.append(f"*(Nº do Pedido: {order_id})*\n")
+    for line in cart.lines:
+        lines.append(
+            f"- {line.quantity}x {line.product.name} (Tamanho: {line.variation.size}) - R$ {line.subtotal:.2f}"
+        )
+    lines.append(f"\n*Total: R$ {cart.total_price:.2f}*")
+    return "\n".join(lines)
+
+
+def reserve_stock(cart):
+    """
+    Subtrai do estoque todas as linhas do carrinho, na transação atual.
+
+    Levanta OutOfStock na primeira linha sem estoque; quem chama deve fazer
+    rollback (tudo ou nada). Retorna os ids das variações que zeraram.
+    """
+    now = datetime.datetime.now()
+    # Sempre na mesma ordem, para as transações concorrentes não se cruzarem
+    lines = sorted(cart.lines, key=lambda line: line.variation.id)
+    for line in lines:
+        result = db.session.execute(
+            update(Variation)
+            .where(Variation.id == line.variation.id, Variation.stock >= line.quantity)
+            .values(stock=Variation.stock - line.quantity,
+                    row_version=Variation.row_version + 1, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            raise OutOfStock(line)
+    ids = [line.variation.id for line in lines]
+    rows = db.session.execute(
+        select(Variation.id, Variation.stock, Variation.row_version).where(Variation.id.in_(ids))
+    ).all()
+    # UPDATE em massa não passa pelos eventos do ORM (ver changelog.py)
+    changelog.record_updates(Variation, ((var_id, row_version) for var_id, _, row_version in rows))
+    return {var_id for var_id, stock, _ in rows if stock <= 0}
@@ -0,0 +1,228 @@
+# cart_storage.py
+"""
+Onde o carrinho de cada visitante fica guardado entre as requisições.
+
+Antes o carrinho ia no cookie de sessão do Flask como JSON
+({"123": 2, ...}) junto com o texto inteiro da mensagem do WhatsApp, e esse
+cookie viaja em todas as requisições e respostas (limite de ~4KB).
+
+Agora há dois modos, escolhidos por `CART_STORAGE` na configuração:
+
+- 'cookie' (padrão): cookie próprio `carrinho`, com os pares
+  (variation_id, quantidade) compactados em varint e assinados com a
+  SECRET_KEY. Um carrinho de 10 itens ocupa ~40 bytes.
+- 'servidor': o cookie guarda só um id de carrinho assinado; os itens ficam
+  na tabela stored_cart. Carrinhos esquecidos são apagados com
+  `flask limpar-carrinhos`.
+
+As rotas usam current_cart() (dict {variation_id (str): quantidade}) e
+chamam mark_changed() quando alteram o carrinho; ele é gravado uma vez, no
+fim da requisição. A mensagem do WhatsApp é gerada na hora (cart.py), não
+é mais guardada.
+"""
+import base64
+import datetime
+import secrets
+
+import click
+from flask import current_app, g, request, session
+from itsdangerous import BadSignature, Signer
+
+from extensions import db
+
+COOKIE_NAME = 'carrinho'
+COOKIE_MAX_AGE = 60 * 60 * 24 * 30  # 30 dias
+# Carrinhos no servidor sem uso há mais que isso são apagados pelo comando
+STORED_CART_MAX_AGE_DAYS = 30
+
+
+# --- Compactação varint (LEB128) ---
+
+def _write_varint(value, out):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError('varint muito longo')
+
+
+def pack_cart(cart):
+    """{variation_id: quantidade} -> bytes (varint id, varint quantidade, ...)."""
+    out = bytearray()
+    for var_id, quantity in cart.items():
+        var_id, quantity = int(var_id), int(quantity)
+        if var_id < 0 or quantity < 1:
+            continue
+        _write_varint(var_id, out)
+        _write_varint(quantity, out)
+    return bytes(out)
+
+
+def unpack_cart(data):
+    """bytes -> {variation_id (str): quantidade}. Dados inválidos viram carrinho vazio."""
+    cart = {}
+    pos = 0
+    try:
+        while pos < len(data):
+            var_id, pos = _read_varint(data, pos)
+            quantity, pos = _read_varint(data, pos)
+            if quantity > 0:
+                cart[str(var_id)] = quantity
+    except (IndexError, ValueError):
+        return {}
+    return cart
+
+
+# --- Modos de armazenamento ---
+
+class CookieCartStore:
+    """Itens compactados e assinados no próprio cookie."""
+
+    def _signer(self):
+        return Signer(current_app.secret_key, salt='carrinho')
+
+    def load(self):
+        token = request.cookies.get(COOKIE_NAME)
+        if not token:
+            return {}
+        try:
+            payload = self._signer().unsign(token)
+            return unpack_cart(base64.urlsafe_b64decode(payload + b'=' * (-len(payload) % 4)))
+        except (BadSignature, ValueError):
+            return {}
+
+    def save(self, cart, response):
+        if not cart:
+            response.delete_cookie(COOKIE_NAME)
+            return
+        payload = base64.urlsafe_b64encode(pack_cart(cart)).rstrip(b'=')
+        set_cart_cookie(response, self._signer().sign(payload).decode())
+
+
+class ServerCartStore:
+    """Itens na tabela stored_cart; o cookie guarda só o id assinado."""
+
+    def _signer(self):
+        return Signer(current_app.secret_key, salt='carrinho-id')
+
+    def _cart_id(self):
+        token = request.cookies.get(COOKIE_NAME)
+        if not token:
+            return None
+        try:
+            return self._signer().unsign(token).decode()
+        except BadSignature:
+            return None
+
+    def load(self):
+        from models import StoredCart
+        cart_id = self._cart_id()
+        if not cart_id:
+            return {}
+        stored = db.session.get(StoredCart, cart_id)
+        return unpack_cart(stored.items) if stored else {}
+
+    def save(self, cart, response):
+        from models import StoredCart
+        cart_id = self._cart_id()
+        if not cart:
+            if cart_id:
+                StoredCart.query.filter_by(id=cart_id).delete()
+                db.session.commit()
+            response.delete_cookie(COOKIE_NAME)
+            return
+        if not cart_id:
+            cart_id = secrets.token_hex(16)
+        stored = db.session.get(StoredCart, cart_id)
+        if stored is None:
+            stored = StoredCart(id=cart_id)
+            db.session.add(stored)
+        stored.items = pack_cart(cart)
+        stored.updated_at = datetime.datetime.now()
+        db.session.commit()
+        set_cart_cookie(response, self._signer().sign(cart_id.encode()).decode())
+
+
+STORES = {
+    'cookie': CookieCartStore,
+    'servidor': ServerCartStore,
+}
+
+
+def set_cart_cookie(response, value):
+    response.set_cookie(COOKIE_NAME, value, max_age=COOKIE_MAX_AGE,
+                        httponly=True, samesite='Lax',
+                        secure=current_app.config.get('SESSION_COOKIE_SECURE', False))
+
+
+def _store():
+    return current_app.extensions['cart_storage']
+
+
+# --- API usada pelas rotas ---
+
+def current_cart():
+    """Carrinho da requisição atual ({variation_id (str): quantidade}), mutável."""
+    if '_cart' not in g:
+        cart = _store().load()
+        # Carrinhos antigos, ainda no cookie de sessão do Flask
+        legacy = session.pop('cart', None)
+        session.pop('whatsapp_message', None)
+        if legacy:
+            for var_id, quantity in legacy.items():
+                cart[str(var_id)] = cart.get(str(var_id), 0) + int(quantity)
+            g._cart_changed = True
+        g._cart = cart
+    return g._cart
+
+
+def mark_changed():
+    g._cart_changed = True
+
+
+def clear():
+    current_cart().clear()
+    mark_changed()
+
+
+def _persist(response):
+    if g.get('_cart_changed') and '_cart' in g:
+        _store().save(g._cart, response)
+    return response
+
+
+@click.command('limpar-carrinhos')
+@click.option('--dias', default=STORED_CART_MAX_AGE_DAYS, show_default=True,
+              help='Apaga carrinhos do servidor sem uso há mais dias que isso.')
+def purge_command(dias):
+    """Apaga carrinhos guardados no servidor que foram abandonados."""
+    from models import StoredCart
+    limit = datetime.datetime.now() - datetime.timedelta(days=dias)
+    total = StoredCart.query.filter(StoredCart.updated_at < limit).delete()
+    db.session.commit()
+    click.echo(f'{total} carrinhos apagados.')
+
+
+def init_app(app):
+    mode = app.config['CART_STORAGE']
+    if mode not in STORES:
+        raise ValueError(f"CART_STORAGE inválido: {mode!r} (use {', '.join(STORES)})")
+    app.extensions['cart_storage'] = STORES[mode]()
+    app.after_request(_persist)
+    app.cli.add_command(purge_command)
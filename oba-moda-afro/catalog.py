@@ -0,0 +1,135 @@
+# catalog.py
+"""
+Paginação das listagens de produtos (/produtos e /categoria/<slug>).
+
+Usa paginação por "keyset" (seek): em vez de OFFSET (que fica mais lento a
+cada página), o cursor guarda o valor da ordenação e o id do último produto
+exibido, e a próxima página começa logo depois dele com um
+`WHERE (nome, id) > (:nome, :id) ORDER BY nome, id LIMIT n`.
+"""
+import base64
+import json
+import math
+from collections import namedtuple
+
+from sqlalchemy import tuple_
+
+from models import Product
+
+# Ordenações disponíveis: chave da URL -> (coluna, decrescente?, rótulo)
+SORT_OPTIONS = {
+    'nome': (Product.name, False, 'Nome (A-Z)'),
+    'preco': (Product.price, False, 'Menor preço'),
+    'preco-desc': (Product.price, True, 'Maior preço'),
+    'novos': (Product.id, True, 'Novidades'),
+}
+DEFAULT_SORT = 'nome'
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 60
+
+# Faixa do INTEGER do SQLite (64 bits com sinal); fora dela o bind estoura
+_SQLITE_INT_MIN, _SQLITE_INT_MAX = -2 ** 63, 2 ** 63 - 1
+
+ProductPage = namedtuple('ProductPage', ['items', 'sort', 'per_page', 'next_cursor', 'prev_cursor'])
+
+
+def encode_cursor(value, product_id, backwards=False):
+    raw = json.dumps([value, product_id, backwards], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _fits_sqlite(value):
+    """Números que o SQLite aceita: inteiros de 64 bits e floats finitos."""
+    if isinstance(value, int):
+        return _SQLITE_INT_MIN <= value <= _SQLITE_INT_MAX
+    if isinstance(value, float):
+        return math.isfinite(value)
+    return True
+
+
+def _matches_column(value, column):
+    """O valor do cursor tem o tipo da coluna de ordenação (texto para o nome, número para preço/id)?"""
+    python_type = column.type.python_type
+    if isinstance(value, bool) or not _fits_sqlite(value):
+        return False
+    if python_type is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, python_type)
+
+
+def decode_cursor(token, column=None):
+    """
+    Retorna (valor, id, para_tras) ou None se o cursor for inválido. Com
+    `column`, o valor também precisa ser do tipo da coluna: um objeto ou
+    lista montado na mão iria direto para o SQL (erro 500), assim como
+    números fora da faixa do SQLite (1e999, 10**30).
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        value, product_id, backwards = json.loads(raw)
+        position = value, int(product_id), bool(backwards)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    if not _fits_sqlite(position[1]):
+        return None
+    if column is not None and not _matches_column(value, column):
+        return None
+    return position
+
+
+def parse_page_size(value):
+    try:
+        per_page = int(value)
+    except (ValueError, TypeError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(per_page, MAX_PAGE_SIZE))
+
+
+def paginate_products(query, sort=None, cursor=None, per_page=DEFAULT_PAGE_SIZE):
+    """
+    Aplica ordenação + cursor à query de produtos e retorna um ProductPage.
+
+    `query` deve ser uma query de Product já filtrada (ex: só ativos).
+    """
+    if sort not in SORT_OPTIONS:
+        sort = DEFAULT_SORT
+    column, descending, _ = SORT_OPTIONS[sort]
+    # A coluna de ordenação é sempre desempatada pelo id
+    key = tuple_(column, Product.id) if column is not Product.id else Product.id
+
+    position = decode_cursor(cursor, column) if cursor else None
+    backwards = bool(position and position[2])
+    if position:
+        value, last_id, _ = position
+        boundary = tuple_(value, last_id) if column is not Product.id else last_id
+        # Indo para trás, a comparação e a ordem se invertem
+        if descending != backwards:
+            query = query.filter(key < boundary)
+        else:
+            query = query.filter(key > boundary)
+
+    if descending != backwards:
+        query = query.order_by(column.desc(), Product.id.desc())
+    else:
+        query = query.order_by(column.asc(), Product.id.asc())
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    if backwards:
+        items.reverse()
+
+    def cursor_for(product, to_back):
+        return encode_cursor(getattr(product, column.key), product.id, to_back)
+
+    next_cursor = prev_cursor = None
+    if items:
+        # Há próxima página se sobrou linha indo para frente, ou se viemos de trás
+        if has_more or backwards:
+            next_cursor = cursor_for(items[-1], False)
+        # Há página anterior se viemos de um cursor para frente, ou se sobrou linha indo para trás
+        if (position and not backwards) or (has_more and backwards):
+            prev_cursor = cursor_for(items[0], True)
+
+    return ProductPage(items=items, sort=sort, per_page=per_page,
+                       next_cursor=next_cursor, prev_cursor=prev_cursor)
@@ -0,0 +1,170 @@
+# changelog.py
+"""
+Versão das linhas do catálogo e log global de alterações.
+
+Nenhum modelo do catálogo guardava quando mudou, então qualquer cache ou
+sincronização tinha que reler tudo. Agora os modelos com CatalogVersioned
+(Product, Variation, Category, Promotion, Banner, seções, links...) têm
+`updated_at` e `row_version`, preenchidos aqui por eventos do SQLAlchemy a
+cada flush, e cada INSERT/UPDATE/DELETE ganha uma linha na tabela
+catalog_change:
+
+    id (versão global) | table_name | row_id | row_version | operation
+
+Para buscar só o que mudou (caches, feeds, réplicas):
+    changes = changelog.changes_since(ultima_versao_vista)
+    ... relê as linhas de `changes` ...
+    ultima_versao_vista = changes[-1].version
+
+Na mesma transação a versão do namespace de cache 'catalogo' é
+incrementada (ver cache.py), então caches e ETags que dependem do catálogo
+(conditional.py) mudam junto com os dados, sem ninguém lembrar de chamar
+invalidate().
+
+UPDATEs em massa (ex: baixa de estoque no checkout) não passam pelos
+eventos do ORM: quem os faz deve incrementar `row_version` no próprio
+UPDATE e chamar record_updates().
+
+O log só cresce; `flask compactar-alteracoes` apaga as entradas que já
+foram superadas por outra mais nova da mesma linha (quem está atrás recebe
+a mais nova e relê a linha do mesmo jeito).
+"""
+import datetime
+from collections import namedtuple
+
+import click
+from sqlalchemy import event, func, select
+
+from cache import versions
+from extensions import db
+from models import CatalogChange, CatalogVersioned
+
+# Namespace de cache incrementado a cada alteração do catálogo
+CATALOG_NAMESPACE = 'catalogo'
+
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+
+Change = namedtuple('Change', ['version', 'table', 'row_id', 'row_version', 'operation', 'changed_at'])
+
+# Chaves em session.info
+_PENDING = 'catalog_changes'
+_CHANGED = 'catalog_changed'
+
+
+def _before_flush(session, flush_context, instances):
+    now = datetime.datetime.now()
+    pending = []
+    for obj in session.new:
+        if isinstance(obj, CatalogVersioned):
+            obj.row_version = 1
+            obj.updated_at = now
+            pending.append((obj, INSERT, 1))
+    for obj in session.dirty:
+        if isinstance(obj, CatalogVersioned) and session.is_modified(obj):
+            obj.row_version = (obj.row_version or 0) + 1
+            obj.updated_at = now
+            pending.append((obj, UPDATE, obj.row_version))
+    for obj in session.deleted:
+        if isinstance(obj, CatalogVersioned):
+            pending.append((obj, DELETE, (obj.row_version or 0) + 1))
+    if pending:
+        session.info.setdefault(_PENDING, []).extend(pending)
+
+
+def _after_flush(session, flush_context):
+    pending = session.info.pop(_PENDING, None)
+    if pending:
+        # Depois do flush os INSERTs já têm id
+        _log(session, [(obj.__tablename__, obj.id, row_version, operation)
+                       for obj, operation, row_version in pending])
+
+
+def _log(session, entries):
+    now = datetime.datetime.now()
+    connection = session.connection()
+    connection.execute(CatalogChange.__table__.insert(), [
+        {'table_name': table, 'row_id': row_id, 'row_version': row_version,
+         'operation': operation, 'changed_at': now}
+        for table, row_id, row_version, operation in entries
+    ])
+    versions.bump_in_transaction(connection, CATALOG_NAMESPACE)
+    session.info[_CHANGED] = True
+
+
+def _after_commit(session):
+    if session.info.pop(_CHANGED, False):
+        versions.expire()
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(_PENDING, None)
+    session.info.pop(_CHANGED, None)
+
+
+event.listen(db.session, 'before_flush', _before_flush)
+event.listen(db.session, 'after_flush', _after_flush)
+event.listen(db.session, 'after_commit', _after_commit)
+event.listen(db.session, 'after_soft_rollback', _after_rollback)
+
+
+def record_updates(model, rows):
+    """
+    Registra alterações feitas com UPDATE em massa, na transação atual.
+
+    `rows` é [(id, row_version)] com a versão que o UPDATE gravou.
+    """
+    rows = list(rows)
+    if rows:
+        _log(db.session(), [(model.__tablename__, row_id, row_version, UPDATE)
+                            for row_id, row_version in rows])
+
+
+def head():
+    """Versão atual do catálogo (0 = nenhuma alteração registrada)."""
+    return db.session.scalar(select(func.coalesce(func.max(CatalogChange.id), 0)))
+
+
+def changes_since(version, limit=1000):
+    """Alterações com versão maior que `version`, da mais antiga para a mais nova."""
+    rows = db.session.execute(
+        select(CatalogChange.id, CatalogChange.table_name, CatalogChange.row_id,
+               CatalogChange.row_version, CatalogChange.operation, CatalogChange.changed_at)
+        .where(CatalogChange.id > version)
+        .order_by(CatalogChange.id)
+        .limit(limit)
+    )
+    return [Change(*row) for row in rows]
+
+
+def compact():
+    """Apaga as entradas superadas por outra mais nova da mesma linha. Retorna quantas."""
+    latest = select(func.max(CatalogChange.id))\
+        .group_by(CatalogChange.table_name, CatalogChange.row_id)
+    deleted = CatalogChange.query.filter(CatalogChange.id.not_in(latest))\
+        .delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+@click.command('alteracoes-catalogo')
+@click.option('--desde', default=0, show_default=True, help='Última versão já vista.')
+@click.option('--limite', default=100, show_default=True)
+def changes_command(desde, limite):
+    """Lista as alterações do catálogo depois da versão --desde."""
+    for change in changes_since(desde, limite):
+        click.echo(f'{change.version}\t{change.operation}\t{change.table}\t'
+                   f'{change.row_id}\tv{change.row_version}\t{change.changed_at:%Y-%m-%d %H:%M:%S}')
+    click.echo(f'Versão atual do catálogo: {head()}')
+
+
+@click.command('compactar-alteracoes')
+def compact_command():
+    """Apaga do log as alterações superadas por outra mais nova da mesma linha."""
+    click.echo(f'{compact()} entradas removidas.')
+
+
+def init_app(app):
+    app.cli.add_command(changes_command)
+    app.cli.add_command(compact_command)
@@ -0,0 +1,112 @@
+# conditional.py
+"""
+GET condicional (ETag / Last-Modified) para as páginas da loja.
+
+A home, as listagens e a página de produto eram renderizadas e enviadas
+inteiras a cada visita, mesmo sem nada ter mudado. Aqui cada página ganha
+um ETag calculado só com carimbos já em memória, sem query e sem template:
+
+- as versões dos namespaces de cache (ver cache.py): 'catalogo' muda
+  sozinho a cada alteração de produto, estoque, categoria, banner...
+  (ver changelog.py), os outros quando o admin salva algo;
+- a "impressão digital" dos preços promocionais em vigor (promotions.py),
+  que muda nas viradas de data das promoções;
+- o que muda por visitante no base.html: o contador do carrinho e o ano do
+  rodapé;
+- a versão dos templates e dos assets (deploy).
+
+Se o navegador manda o mesmo ETag (If-None-Match), a resposta é um 304
+vazio e o template nem é renderizado. Páginas com mensagens flash
+pendentes sempre são renderizadas (a mensagem só aparece uma vez).
+
+Uso nas rotas:
+    return conditional.page(lambda: render_template(...))
+"""
+import datetime
+import hashlib
+import os
+
+from flask import current_app, request, session
+
+import assets
+import cart_storage
+import promotions
+from cache import versions
+
+# Namespaces de cache que mudam o conteúdo das páginas da loja
+PAGE_NAMESPACES = ('catalogo', 'home', 'navegacao', 'imagens', 'promocoes')
+
+# O navegador sempre revalida (o 304 sai barato); "private" porque o header
+# tem o contador do carrinho de cada visitante
+CACHE_CONTROL = 'private, no-cache'
+
+
+def templates_fingerprint(app):
+    """Muda quando algum template muda (calculado uma vez, na inicialização)."""
+    folder = os.path.join(app.root_path, app.template_folder)
+    sha = hashlib.sha1()
+    for root, _, files in sorted(os.walk(folder)):
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            sha.update(f'{os.path.relpath(os.path.join(root, name), folder)}:{stat.st_mtime_ns}:{stat.st_size};'.encode())
+    return sha.hexdigest()[:16]
+
+
+def _as_utc(value):
+    # Os carimbos são gravados com datetime.now() (hora local, sem fuso)
+    return value.astimezone(datetime.timezone.utc).replace(microsecond=0)
+
+
+def validators(namespaces=PAGE_NAMESPACES):
+    """(etag, last_modified) da página para o visitante atual."""
+    index = promotions.current_index()
+    cart_item_count = sum(cart_storage.current_cart().values())
+    parts = [f'{namespace}={versions.current(namespace)}' for namespace in namespaces]
+    parts += [
+        f'precos={index.fingerprint}',
+        f'carrinho={cart_item_count}',
+        f'ano={promotions.scheduler.now().year}',
+        f'templates={current_app.extensions["conditional_templates"]}',
+        f'assets={assets.manifest.version()}',
+    ]
+    etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()[:20]
+
+    stamps = [versions.updated_at(namespace) for namespace in namespaces]
+    # O índice de preços é refeito logo depois de cada virada de promoção
+    stamps = [stamp for stamp in stamps + [index.built_at] if stamp is not None]
+    last_modified = _as_utc(max(stamps)) if stamps else None
+    return etag, last_modified
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    # Sem ETag, só a data: não cobre o contador do carrinho, então só vale
+    # para quem está com o carrinho vazio
+    if request.if_modified_since and last_modified is not None and not cart_storage.current_cart():
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def page(render, namespaces=PAGE_NAMESPACES):
+    """
+    Responde 304 se o navegador já tem esta versão da página; senão chama
+    `render()` (que devolve o HTML) e põe o ETag e o Last-Modified.
+    """
+    if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+        return render()
+
+    etag, last_modified = validators(namespaces)
+    if _not_modified(etag, last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.make_response(render())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
+
+
+def init_app(app):
+    app.extensions['conditional_templates'] = templates_fingerprint(app)
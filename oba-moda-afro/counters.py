@@ -0,0 +1,143 @@
+# counters.py
+"""
+Contadores com escrita adiada (write-behind).
+
+Visitas da home, visualizações e adições ao carrinho eram gravadas com um
+commit por requisição (um lock de escrita no SQLite a cada GET). Agora os
+incrementos ficam acumulados em memória e são gravados de uma vez, em uma
+única transação com `UPDATE ... SET x = x + n`, quando:
+  - passa COUNTER_FLUSH_INTERVAL segundos;
+  - o número de chaves pendentes chega a COUNTER_FLUSH_THRESHOLD;
+  - o processo termina (atexit).
+"""
+import atexit
+import os
+import threading
+from collections import defaultdict
+
+from sqlalchemy import bindparam, func, update
+
+from extensions import db
+
+# Campos do Product que podem ser incrementados pelo buffer
+PRODUCT_COUNTER_FIELDS = ('view_count', 'cart_add_count')
+
+
+class CounterBuffer:
+
+    def __init__(self, flush_interval=5.0, flush_threshold=500):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.app = None
+        self._stats = defaultdict(int)
+        self._products = defaultdict(int)  # (product_id, campo) -> incremento
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config.get('COUNTER_FLUSH_INTERVAL', self.flush_interval)
+        self.flush_threshold = app.config.get('COUNTER_FLUSH_THRESHOLD', self.flush_threshold)
+        atexit.register(self.flush)
+
+    # --- Incrementos (chamados nas rotas) ---
+
+    def incr_stat(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+        self._after_incr()
+
+    def incr_product(self, product_id, field, amount=1):
+        if field not in PRODUCT_COUNTER_FIELDS:
+            raise ValueError(f"Campo de contador inválido: {field}")
+        with self._lock:
+            self._products[(product_id, field)] += amount
+        self._after_incr()
+
+    # --- Leitura: o que ainda está em memória (somado ao valor do banco no admin) ---
+
+    def pending_stat(self, key):
+        return self._stats.get(key, 0)
+
+    def pending_product(self, product_id, field):
+        return self._products.get((product_id, field), 0)
+
+    # --- Gravação ---
+
+    def _after_incr(self):
+        self._ensure_thread()
+        if len(self._stats) + len(self._products) >= self.flush_threshold:
+            self._wake.set()
+
+    def _ensure_thread(self):
+        # Cada processo (ex: workers do gunicorn após o fork) tem sua própria thread
+        if self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='counter-flush', daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Erro ao gravar contadores: {e}")
+
+    def flush(self):
+        """Grava todos os incrementos pendentes em uma única transação."""
+        if self.app is None:
+            return
+        with self._lock:
+            stats, self._stats = self._stats, defaultdict(int)
+            products, self._products = self._products, defaultdict(int)
+        if not stats and not products:
+            return
+        try:
+            with self.app.app_context():
+                self._write(stats, products)
+        except Exception:
+            # Devolve os incrementos para a próxima tentativa
+            with self._lock:
+                for key, amount in stats.items():
+                    self._stats[key] += amount
+                for key, amount in products.items():
+                    self._products[key] += amount
+            raise
+
+    def _write(self, stats, products):
+        from models import SiteStat, Product
+        stat_table = SiteStat.__table__
+        product_table = Product.__table__
+        with db.engine.begin() as conn:
+            for key, amount in stats.items():
+                result = conn.execute(
+                    update(stat_table)
+                    .where(stat_table.c.key == key)
+                    .values(value=func.coalesce(stat_table.c.value, 0) + amount)
+                )
+                if not result.rowcount:
+                    conn.execute(stat_table.insert().values(key=key, value=amount))
+            for field in PRODUCT_COUNTER_FIELDS:
+                params = [
+                    {'pid': product_id, 'amount': amount}
+                    for (product_id, f), amount in products.items() if f == field
+                ]
+                if params:
+                    column = product_table.c[field]
+                    conn.execute(
+                        update(product_table)
+                        .where(product_table.c.id == bindparam('pid'))
+                        .values({field: func.coalesce(column, 0) + bindparam('amount')}),
+                        params
+                    )
+
+
+counters = CounterBuffer()
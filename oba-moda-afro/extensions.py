@@ -3,8 +3,10 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
 from flask_migrate import Migrate
+from sqlite_profile import RoutingSession
 
-db = SQLAlchemy()
+# RoutingSession: SELECTs nas conexões de leitura, o resto na de escrita (ver sqlite_profile.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 bcrypt = Bcrypt()
 migrate = Migrate()
@@ -0,0 +1,428 @@
+# facets.py
+"""
+Filtros (facetas) das listagens com contagens pré-calculadas em memória.
+
+/categoria/<slug> só filtrava pela categoria. Agora /produtos e as
+categorias aceitam, combinados:
+
+    ?categoria=<slug>  ?tamanho=P  ?preco=50-100  ?promocao=1  ?estoque=1
+
+(os repetíveis viram "ou" dentro da faceta e "e" entre facetas), e cada
+opção mostra quantos produtos ela daria com os outros filtros já
+escolhidos.
+
+Contar isso com GROUP BY em product_category_association, variation e
+nas promoções a cada página seria caro. Aqui cada valor de faceta é um
+bitmap em memória (um int do Python: bit N = produto de id N ativo):
+
+    categoria:<id>  tamanho:<tamanho com estoque>  preco:<faixa>
+    promocao        estoque
+
+Filtrar é um AND/OR de ints e contar é int.bit_count(), tudo numa passada,
+em microssegundos mesmo com 100k produtos. A listagem continua paginada
+pelo SQL, restrita aos ids do resultado.
+
+O índice é montado uma vez por processo e atualizado aos poucos pelo log
+de alterações do catálogo (changelog.py): só os produtos que mudaram
+(produto, variação, categoria) são relidos. As faixas de preço e o
+"em promoção" usam o preço atual (promotions.py) e são recalculados
+quando o índice de preços muda.
+"""
+import json
+import threading
+from collections import namedtuple
+
+from sqlalchemy import func, select
+
+import changelog
+import promotions
+from cache import versions
+from extensions import db
+from models import Category, Product, Variation, product_category_association
+
+# (chave na URL, rótulo, de, até) — preço atual, com promoção
+PRICE_BANDS = (
+    ('ate-50', 'Até R$ 50', None, 50),
+    ('50-100', 'R$ 50 a R$ 100', 50, 100),
+    ('100-200', 'R$ 100 a R$ 200', 100, 200),
+    ('200-mais', 'Acima de R$ 200', 200, None),
+)
+
+# Ordem de exibição dos tamanhos conhecidos (os outros vêm depois, em ordem alfabética)
+SIZE_ORDER = ('PP', 'P', 'M', 'G', 'GG', 'XG', 'XGG', 'Único', 'Infantil')
+
+# Facetas, na ordem de exibição
+CATEGORY = 'categoria'
+SIZE = 'tamanho'
+PRICE = 'preco'
+ON_SALE = 'promocao'
+IN_STOCK = 'estoque'
+FACETS = (CATEGORY, SIZE, PRICE, ON_SALE, IN_STOCK)
+FACET_LABELS = {
+    CATEGORY: 'Categoria',
+    SIZE: 'Tamanho',
+    PRICE: 'Preço',
+    ON_SALE: 'Promoção',
+    IN_STOCK: 'Disponibilidade',
+}
+# Facetas "liga/desliga" (?promocao=1): um único valor
+FLAG_VALUES = {ON_SALE: 'Em promoção', IN_STOCK: 'Em estoque'}
+
+# Mais produtos alterados que isso de uma vez: remonta tudo
+MAX_INCREMENTAL = 2000
+
+# O que o índice sabe de cada produto ativo
+ProductFacts = namedtuple('ProductFacts', ['price', 'categories', 'sizes', 'in_stock'])
+
+FacetValue = namedtuple('FacetValue', ['value', 'label', 'count', 'selected'])
+
+
+def price_band(price):
+    for key, _, low, high in PRICE_BANDS:
+        if (low is None or price >= low) and (high is None or price < high):
+            return key
+    return None
+
+
+def _size_key(size):
+    return (SIZE_ORDER.index(size), '') if size in SIZE_ORDER else (len(SIZE_ORDER), size)
+
+
+def _bitmap(product_ids):
+    """Int com os bits destes ids ligados (montado de uma vez, não bit a bit)."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return 0
+    data = bytearray(max(product_ids) // 8 + 1)
+    for product_id in product_ids:
+        data[product_id >> 3] |= 1 << (product_id & 7)
+    return int.from_bytes(data, 'little')
+
+
+def _set(bitmaps, key, product_id):
+    bitmaps[key] = bitmaps.get(key, 0) | (1 << product_id)
+
+
+def _clear(bitmaps, key, product_id):
+    bits = bitmaps.get(key, 0) & ~(1 << product_id)
+    if bits:
+        bitmaps[key] = bits
+    else:
+        bitmaps.pop(key, None)
+
+
+def _price_groups(products, price_index):
+    """Ids por faixa de preço e ids em promoção, com os preços de agora."""
+    bands = {}
+    on_sale = []
+    for product_id, facts in products.items():
+        bands.setdefault(price_band(price_index.price(product_id, facts.price)), []).append(product_id)
+        if price_index.get(product_id) is not None:
+            on_sale.append(product_id)
+    return ({band: _bitmap(ids) for band, ids in bands.items()},
+            {True: _bitmap(on_sale)} if on_sale else {})
+
+
+def bit_ids(bits):
+    """Ids (em ordem) dos bits ligados."""
+    return [i for i, bit in enumerate(reversed(bin(bits)[2:])) if bit == '1']
+
+
+class FacetIndex:
+    """
+    Foto do catálogo para as facetas. Não é alterada depois de pronta: as
+    atualizações montam uma nova (as requisições em andamento seguem com
+    a que pegaram).
+    """
+
+    def __init__(self, version, products, categories, price_index):
+        self.version = version
+        self.products = products          # {product_id: ProductFacts} (só ativos)
+        self.categories = categories      # {category_id: (slug, name)}
+        self.price_fingerprint = price_index.fingerprint
+        by_category, by_size, in_stock = {}, {}, []
+        for product_id, facts in products.items():
+            for category_id in facts.categories:
+                by_category.setdefault(category_id, []).append(product_id)
+            for size in facts.sizes:
+                by_size.setdefault(size, []).append(product_id)
+            if facts.in_stock:
+                in_stock.append(product_id)
+        self.all = _bitmap(products)
+        self.bitmaps = {
+            CATEGORY: {category_id: _bitmap(ids) for category_id, ids in by_category.items()},
+            SIZE: {size: _bitmap(ids) for size, ids in by_size.items()},
+            IN_STOCK: {True: _bitmap(in_stock)} if in_stock else {},
+        }
+        self.bitmaps[PRICE], self.bitmaps[ON_SALE] = _price_groups(products, price_index)
+
+    # --- Atualização (poucos produtos por vez) ---
+
+    def _add(self, product_id, facts, price_index):
+        self.all |= 1 << product_id
+        for category_id in facts.categories:
+            _set(self.bitmaps[CATEGORY], category_id, product_id)
+        for size in facts.sizes:
+            _set(self.bitmaps[SIZE], size, product_id)
+        self._add_price(product_id, facts, price_index)
+        if facts.in_stock:
+            _set(self.bitmaps[IN_STOCK], True, product_id)
+
+    def _add_price(self, product_id, facts, price_index):
+        _set(self.bitmaps[PRICE], price_band(price_index.price(product_id, facts.price)), product_id)
+        if price_index.get(product_id) is not None:
+            _set(self.bitmaps[ON_SALE], True, product_id)
+
+    def _remove(self, product_id):
+        facts = self.products.get(product_id)
+        if facts is None:
+            return
+        self.all &= ~(1 << product_id)
+        for category_id in facts.categories:
+            _clear(self.bitmaps[CATEGORY], category_id, product_id)
+        for size in facts.sizes:
+            _clear(self.bitmaps[SIZE], size, product_id)
+        for facet in (PRICE, ON_SALE, IN_STOCK):
+            for key in list(self.bitmaps[facet]):
+                _clear(self.bitmaps[facet], key, product_id)
+
+    def updated(self, version, products, categories, price_index):
+        """Nova foto com `products` ({id: ProductFacts ou None se inativo/excluído}) relidos."""
+        index = FacetIndex.__new__(FacetIndex)
+        index.version = version
+        index.products = dict(self.products)
+        index.categories = categories
+        index.price_fingerprint = price_index.fingerprint
+        index.all = self.all
+        index.bitmaps = {facet: dict(bitmaps) for facet, bitmaps in self.bitmaps.items()}
+        for product_id, facts in products.items():
+            index._remove(product_id)
+            index.products.pop(product_id, None)
+            if facts is not None:
+                index.products[product_id] = facts
+                index._add(product_id, facts, price_index)
+        if price_index.fingerprint != self.price_fingerprint:
+            # Promoção começou/acabou: faixas de preço e "em promoção" de todos
+            index.bitmaps[PRICE], index.bitmaps[ON_SALE] = _price_groups(index.products, price_index)
+        return index
+
+    # --- Consulta ---
+
+    def apply(self, selection, base=None):
+        """
+        Filtra e conta numa passada. `selection` é {faceta: set(valores)}
+        (ver parse_selection); `base` restringe a uma categoria (id).
+        """
+        universe = self.all
+        if base is not None:
+            universe &= self.bitmaps[CATEGORY].get(base, 0)
+
+        # Máscara de cada faceta escolhida: OU dos valores marcados
+        masks = {}
+        for facet, values in selection.items():
+            if values:
+                mask = 0
+                for value in values:
+                    mask |= self.bitmaps[facet].get(value, 0)
+                masks[facet] = mask
+
+        result = universe
+        for mask in masks.values():
+            result &= mask
+
+        counts = {}
+        for facet in FACETS:
+            if facet == CATEGORY and base is not None:
+                continue
+            # A contagem de uma faceta considera os filtros das outras
+            others = universe
+            for other, mask in masks.items():
+                if other != facet:
+                    others &= mask
+            selected = selection.get(facet, set())
+            counts[facet] = [
+                FacetValue(value, self._label(facet, value), (others & bits).bit_count(), value in selected)
+                for value, bits in self._ordered(facet)
+            ]
+            counts[facet] = [v for v in counts[facet] if v.count or v.selected]
+        return FacetResult(result, bool(masks), counts, self.categories)
+
+    def _ordered(self, facet):
+        bitmaps = self.bitmaps[facet]
+        if facet == CATEGORY:
+            return sorted(bitmaps.items(), key=lambda item: self.categories.get(item[0], ('', ''))[1])
+        if facet == SIZE:
+            return sorted(bitmaps.items(), key=lambda item: _size_key(item[0]))
+        if facet == PRICE:
+            return [(key, bitmaps[key]) for key, _, _, _ in PRICE_BANDS if key in bitmaps]
+        return list(bitmaps.items())
+
+    def _label(self, facet, value):
+        if facet == CATEGORY:
+            return self.categories.get(value, ('', str(value)))[1]
+        if facet == PRICE:
+            return next(label for key, label, _, _ in PRICE_BANDS if key == value)
+        if facet in FLAG_VALUES:
+            return FLAG_VALUES[facet]
+        return value
+
+
+class FacetResult:
+    """Produtos filtrados (bitmap) e contagens por valor de faceta."""
+
+    def __init__(self, bits, filtered, counts, categories):
+        self.bits = bits
+        self.filtered = filtered
+        self.counts = counts
+        self._categories = categories
+
+    @property
+    def total(self):
+        return self.bits.bit_count()
+
+    def ids(self):
+        return bit_ids(self.bits)
+
+    def id_filter(self, column):
+        """Condição SQL "column está no resultado" (um só parâmetro, via json_each)."""
+        ids = select(func.json_each(json.dumps(self.ids())).table_valued('value').c.value)
+        return column.in_(ids)
+
+    def url_value(self, facet, value):
+        """Valor como vai na URL (a categoria vai pelo slug)."""
+        if facet == CATEGORY:
+            return self._categories[value][0]
+        if facet in FLAG_VALUES:
+            return '1'
+        return value
+
+    def groups(self):
+        """[(faceta, rótulo, [FacetValue])] para o template, sem as facetas vazias."""
+        return [(facet, FACET_LABELS[facet], values) for facet, values in self.counts.items() if values]
+
+
+def parse_selection(args, categories):
+    """Lê os filtros da URL (request.args). Valores desconhecidos são ignorados."""
+    slugs = {slug: category_id for category_id, (slug, _) in categories.items()}
+    bands = {key for key, _, _, _ in PRICE_BANDS}
+    return {
+        CATEGORY: {slugs[slug] for slug in args.getlist(CATEGORY) if slug in slugs},
+        SIZE: set(args.getlist(SIZE)),
+        PRICE: {band for band in args.getlist(PRICE) if band in bands},
+        ON_SALE: {True} if args.get(ON_SALE) == '1' else set(),
+        IN_STOCK: {True} if args.get(IN_STOCK) == '1' else set(),
+    }
+
+
+# --- Leitura do banco ---
+
+def _load_categories():
+    return {category_id: (slug, name) for category_id, slug, name in
+            db.session.execute(select(Category.id, Category.slug, Category.name))}
+
+
+def _load_products(product_ids=None):
+    """{id: ProductFacts} dos produtos ativos (todos, ou só estes ids)."""
+    products = select(Product.id, Product.price).where(Product.active == True)
+    sizes = select(Variation.product_id, Variation.size).where(Variation.stock > 0)
+    categories = select(product_category_association.c.product_id, product_category_association.c.category_id)
+    if product_ids is not None:
+        products = products.where(Product.id.in_(product_ids))
+        sizes = sizes.where(Variation.product_id.in_(product_ids))
+        categories = categories.where(product_category_association.c.product_id.in_(product_ids))
+
+    sizes_by_product = {}
+    for product_id, size in db.session.execute(sizes):
+        sizes_by_product.setdefault(product_id, set()).add(size)
+    categories_by_product = {}
+    for product_id, category_id in db.session.execute(categories):
+        categories_by_product.setdefault(product_id, set()).add(category_id)
+    return {
+        product_id: ProductFacts(price or 0.0, frozenset(categories_by_product.get(product_id, ())),
+                                 frozenset(sizes_by_product.get(product_id, ())),
+                                 product_id in sizes_by_product)
+        for product_id, price in db.session.execute(products)
+    }
+
+
+def build():
+    """Monta o índice inteiro."""
+    version = changelog.head()
+    return FacetIndex(version, _load_products(), _load_categories(), promotions.current_index())
+
+
+def _changed_products(index, changes):
+    """Ids dos produtos a reler por causa de `changes`, ou None se é melhor remontar tudo."""
+    product_ids = set()
+    variation_ids = set()
+    category_ids = set()
+    for change in changes:
+        if change.table == Product.__tablename__:
+            product_ids.add(change.row_id)
+        elif change.table == Variation.__tablename__:
+            if change.operation == changelog.DELETE:
+                # A variação já não existe: não dá para saber de qual produto era
+                return None
+            variation_ids.add(change.row_id)
+        elif change.table == Category.__tablename__:
+            category_ids.add(change.row_id)
+    if variation_ids:
+        product_ids.update(db.session.scalars(
+            select(Variation.product_id).where(Variation.id.in_(variation_ids))))
+    for category_id in category_ids:
+        # Produtos que entraram (pelo lado da categoria) ou saíram dela
+        product_ids.update(bit_ids(index.bitmaps[CATEGORY].get(category_id, 0)))
+        product_ids.update(db.session.scalars(
+            select(product_category_association.c.product_id)
+            .where(product_category_association.c.category_id == category_id)))
+    return product_ids
+
+
+class FacetCache:
+    """O índice deste processo, posto em dia com o log de alterações quando o catálogo muda."""
+
+    def __init__(self):
+        self._index = None
+        self._seen = None
+        self._lock = threading.Lock()
+
+    def _stamp(self):
+        return (versions.current(changelog.CATALOG_NAMESPACE), promotions.current_index().fingerprint)
+
+    def get(self):
+        index = self._index
+        stamp = self._stamp()
+        if index is not None and stamp == self._seen:
+            return index
+        with self._lock:
+            if self._index is not None and self._seen == stamp:
+                return self._index
+            self._index = self._refresh(self._index)
+            self._seen = stamp
+            return self._index
+
+    def _refresh(self, index):
+        if index is None:
+            return build()
+        changes = changelog.changes_since(index.version, limit=MAX_INCREMENTAL + 1)
+        if len(changes) > MAX_INCREMENTAL:
+            return build()
+        product_ids = _changed_products(index, changes)
+        if product_ids is None or len(product_ids) > MAX_INCREMENTAL:
+            return build()
+        version = changes[-1].version if changes else index.version
+        reloaded = _load_products(product_ids) if product_ids else {}
+        products = {product_id: reloaded.get(product_id) for product_id in product_ids}
+        return index.updated(version, products, _load_categories(), promotions.current_index())
+
+    def clear(self):
+        with self._lock:
+            self._index = None
+            self._seen = None
+
+
+facet_cache = FacetCache()
+
+
+def current():
+    return facet_cache.get()
@@ -0,0 +1,250 @@
+# images.py
+"""
+Versões redimensionadas (WebP/AVIF) das imagens enviadas pelo admin.
+
+Os originais de produtos, banners e bolinhas de categoria são gravados em
+static/uploads como vieram (às vezes PNGs de vários MB) e eram servidos
+assim mesmo onde a imagem aparece com 100px. Aqui cada original ganha
+variantes em larguras fixas (BREAKPOINTS), nos formatos suportados pelo
+Pillow, gravadas em static/uploads/derivados/ com o nome baseado no
+conteúdo (`<sha256>-<largura>w.<formato>`): o mesmo arquivo enviado duas
+vezes não é processado de novo, e um arquivo novo com o mesmo nome nunca
+pega variante velha do cache do navegador.
+
+Nos templates:
+    {{ responsive_image(produto.image, produto.name, sizes='50vw', class='...') }}
+gera um <picture> com `srcset` por formato e o original como fallback; sem
+variantes (ou sem Pillow instalado) sai só o <img> do original.
+
+Ao salvar no admin, a geração é agendada em segundo plano (jobs.py) e a
+página continua usando o original até as variantes ficarem prontas. Para
+processar (na hora) as imagens já existentes:
+    flask gerar-imagens
+"""
+import hashlib
+import os
+import threading
+
+import click
+from flask import current_app, url_for
+from markupsafe import Markup, escape
+
+import jobs
+from cache import VersionedCache, invalidate
+from extensions import db
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow é opcional: sem ele, os templates usam o original
+    Image = None
+
+# Larguras geradas (px). Larguras maiores que o original são puladas.
+BREAKPOINTS = (160, 320, 640, 960, 1280, 1920)
+# Formatos em ordem de preferência do navegador: (formato, mime, opções do Pillow)
+FORMATS = (
+    ('avif', 'image/avif', {'quality': 55}),
+    ('webp', 'image/webp', {'quality': 80, 'method': 6}),
+)
+DERIVATIVES_DIR = 'derivados'
+
+# Campos de imagem de cada modelo (usado pelo backfill)
+IMAGE_FIELDS = {
+    'Product': ('image',),
+    'Banner': ('image_url_desktop', 'image_url_mobile'),
+    'CircularCategory': ('image_url',),
+}
+
+def available_formats():
+    if Image is None:
+        return ()
+    return tuple(fmt for fmt in FORMATS if features.check(fmt[0]))
+
+
+def upload_dir():
+    return current_app.config['UPLOAD_FOLDER']
+
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def render_variants(source, out_dir, force=False):
+    """
+    Cria os arquivos das variantes de `source` em `out_dir`.
+
+    Não usa o banco nem a app: roda nos workers do pool (ver jobs.py).
+    Retorna (digest, [(largura, formato, nome do arquivo, bytes), ...]).
+    """
+    formats = available_formats()
+    digest = file_digest(source)
+    os.makedirs(out_dir, exist_ok=True)
+    rendered = []
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+        widths = [w for w in BREAKPOINTS if w < img.width] + [min(img.width, BREAKPOINTS[-1])]
+        for width in sorted(set(widths)):
+            resized = None
+            for fmt, _, options in formats:
+                name = f'{digest[:32]}-{width}w.{fmt}'
+                target = os.path.join(out_dir, name)
+                if force or not os.path.exists(target):
+                    if resized is None:
+                        height = max(1, round(img.height * width / img.width))
+                        resized = img.resize((width, height), Image.LANCZOS) if width != img.width else img
+                    # Grava em um temporário e renomeia: quem lê nunca vê arquivo pela metade
+                    tmp = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+                    resized.save(tmp, format=fmt.upper(), **options)
+                    os.replace(tmp, target)
+                rendered.append((width, fmt, name, os.path.getsize(target)))
+    return digest, rendered
+
+
+def record_variants(original, digest, rendered):
+    """Troca as variantes registradas do original pelas recém-geradas."""
+    from models import ImageVariant
+    ImageVariant.query.filter_by(original=original).delete()
+    db.session.add_all(
+        ImageVariant(original=original, digest=digest, width=width, format=fmt,
+                     path=f'{DERIVATIVES_DIR}/{name}', size=size)
+        for width, fmt, name, size in rendered
+    )
+    db.session.commit()
+    invalidate('imagens', 'home')
+    return len(rendered)
+
+
+def _source_to_process(original, force):
+    """
+    Caminho do original se ele precisa de variantes novas, senão None.
+
+    Se o arquivo mudou (mesmo nome, outro conteúdo), as variantes antigas
+    são descartadas já aqui: até as novas ficarem prontas, vale o original.
+    """
+    from models import ImageVariant
+    source = os.path.join(upload_dir(), original or '')
+    if not original or not available_formats() or not os.path.isfile(source):
+        return None
+    digests = {digest for (digest,) in db.session.query(ImageVariant.digest).filter_by(original=original)}
+    if digests and not force:
+        if digests == {file_digest(source)}:
+            return None
+        ImageVariant.query.filter_by(original=original).delete()
+        db.session.commit()
+        invalidate('imagens', 'home')
+    return source
+
+
+def generate(original, force=False):
+    """
+    Gera as variantes de um original de static/uploads, na hora.
+
+    Retorna quantas variantes foram registradas; 0 se o arquivo não existe,
+    se o Pillow não está instalado ou se nada mudou desde a última vez.
+    """
+    source = _source_to_process(original, force)
+    if source is None:
+        return 0
+    digest, rendered = render_variants(source, os.path.join(upload_dir(), DERIVATIVES_DIR), force)
+    return record_variants(original, digest, rendered)
+
+
+def enqueue(original, force=False):
+    """Agenda a geração das variantes em segundo plano (ver jobs.py)."""
+    if _source_to_process(original, force) is not None:
+        jobs.enqueue('imagem', original=original, force=force)
+
+
+def _prepare_job(payload):
+    source = os.path.join(upload_dir(), payload['original'])
+    return render_variants, (source, os.path.join(upload_dir(), DERIVATIVES_DIR), payload['force'])
+
+
+def _finish_job(payload, result):
+    record_variants(payload['original'], *result)
+
+
+jobs.register('imagem', prepare=_prepare_job, finish=_finish_job)
+
+
+def load_variants():
+    """{original: {formato: ((largura, caminho), ...)}} de todas as variantes."""
+    from models import ImageVariant
+    variants = {}
+    rows = db.session.query(ImageVariant.original, ImageVariant.format,
+                            ImageVariant.width, ImageVariant.path)\
+                     .order_by(ImageVariant.original, ImageVariant.width).all()
+    for original, fmt, width, path in rows:
+        variants.setdefault(original, {}).setdefault(fmt, []).append((width, path))
+    return variants
+
+
+variant_cache = VersionedCache('imagens', load_variants)
+
+
+def _upload_url(path):
+    return url_for('static', filename='uploads/' + path)
+
+
+def srcset(original, fmt):
+    """Valor do atributo srcset de um formato ('' se não há variantes)."""
+    by_format = variant_cache.get().get(original, {})
+    return ', '.join(f'{_upload_url(path)} {width}w' for width, path in by_format.get(fmt, ()))
+
+
+def image_sources(original, sizes='100vw', media=None):
+    """Só os <source> (AVIF/WebP) do original, para usar dentro de um <picture>."""
+    if not original:
+        return Markup('')
+    tags = []
+    media_attr = f' media="{escape(media)}"' if media else ''
+    for fmt, mime, _ in FORMATS:
+        value = srcset(original, fmt)
+        if value:
+            tags.append(f'<source type="{mime}" srcset="{value}" sizes="{escape(sizes)}"{media_attr}>')
+    return Markup(''.join(tags))
+
+
+def responsive_image(original, alt='', sizes='100vw', **attrs):
+    """<picture> com as variantes e o original como <img> de fallback."""
+    attrs = {('class' if key == 'class_' else key): value for key, value in attrs.items()}
+    img_attrs = ''.join(f' {key}="{escape(value)}"' for key, value in attrs.items())
+    img = f'<img src="{_upload_url(original)}" alt="{escape(alt)}"{img_attrs}>'
+    sources = image_sources(original, sizes)
+    if not sources:
+        return Markup(img)
+    return Markup(f'<picture>{sources}{img}</picture>')
+
+
+@click.command('gerar-imagens')
+@click.option('--forcar', is_flag=True, help='Regera mesmo as variantes que já existem.')
+def backfill_command(forcar):
+    """Gera as variantes de todas as imagens já enviadas."""
+    import models
+    if not available_formats():
+        click.echo('Pillow (com suporte a WebP/AVIF) não está instalado; nada a fazer.')
+        return
+    originals = set()
+    for model_name, fields in IMAGE_FIELDS.items():
+        model = getattr(models, model_name)
+        for field in fields:
+            column = getattr(model, field)
+            originals.update(value for (value,) in db.session.query(column).filter(column.isnot(None)))
+    total = 0
+    for original in sorted(originals):
+        count = generate(original, force=forcar)
+        total += count
+        if count:
+            click.echo(f'{original}: {count} variantes')
+    click.echo(f'{len(originals)} imagens verificadas, {total} variantes registradas.')
+
+
+def init_app(app):
+    app.jinja_env.globals['responsive_image'] = responsive_image
+    app.jinja_env.globals['image_sources'] = image_sources
+    app.cli.add_command(backfill_command)
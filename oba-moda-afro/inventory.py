@@ -0,0 +1,89 @@
+# inventory.py
+"""
+Relatório de estoque (baixo estoque / esgotados) calculado direto no SQL.
+
+Antes o dashboard carregava todos os produtos e somava `total_stock` em
+Python (uma query de variações por produto). Aqui a soma do estoque, o
+limite de "baixo estoque" e a classificação de cada produto saem de uma
+única query agrupada, e as listas são paginadas no banco.
+
+O limite vem da categoria (`Category.low_stock_threshold`); se o produto
+está em várias categorias vale o maior limite, e sem limite definido vale
+LOW_STOCK_THRESHOLD.
+"""
+from collections import namedtuple
+
+from sqlalchemy import case, func, literal, select
+
+from extensions import db
+from models import Category, Product, Variation, product_category_association
+
+# Limite padrão de "baixo estoque" (unidades somando todos os tamanhos)
+LOW_STOCK_THRESHOLD = 5
+
+# Níveis da classificação
+OUT_OF_STOCK = 'esgotado'
+LOW_STOCK = 'baixo'
+IN_STOCK = 'ok'
+
+LEVEL_LABELS = {
+    LOW_STOCK: 'Baixo Estoque',
+    OUT_OF_STOCK: 'Esgotados (Inativos ou 0)',
+}
+
+StockRow = namedtuple('StockRow', ['id', 'name', 'active', 'stock', 'threshold'])
+
+
+def stock_levels():
+    """Subquery com (id, name, active, stock, threshold, level) de cada produto."""
+    stock = select(
+        Variation.product_id.label('product_id'),
+        func.sum(Variation.stock).label('stock')
+    ).group_by(Variation.product_id).subquery()
+
+    default = literal(LOW_STOCK_THRESHOLD)
+    threshold = select(
+        product_category_association.c.product_id.label('product_id'),
+        func.max(func.coalesce(Category.low_stock_threshold, default)).label('threshold')
+    ).join(Category, Category.id == product_category_association.c.category_id)\
+     .group_by(product_category_association.c.product_id).subquery()
+
+    total = func.coalesce(stock.c.stock, 0)
+    limit = func.coalesce(threshold.c.threshold, default)
+    level = case(
+        (Product.active == False, OUT_OF_STOCK),
+        (total <= 0, OUT_OF_STOCK),
+        (total <= limit, LOW_STOCK),
+        else_=IN_STOCK
+    )
+    return select(
+        Product.id, Product.name, Product.active,
+        total.label('stock'), limit.label('threshold'), level.label('level')
+    ).outerjoin(stock, stock.c.product_id == Product.id)\
+     .outerjoin(threshold, threshold.c.product_id == Product.id)\
+     .subquery()
+
+
+def summary():
+    """Quantidade de produtos por nível, ex: {'baixo': 3, 'esgotado': 1, 'ok': 40}."""
+    levels = stock_levels()
+    rows = db.session.execute(
+        select(levels.c.level, func.count()).group_by(levels.c.level)
+    ).all()
+    counts = {LOW_STOCK: 0, OUT_OF_STOCK: 0, IN_STOCK: 0}
+    counts.update({level: count for level, count in rows})
+    return counts
+
+
+def products_at(level, page=1, per_page=20):
+    """Página `page` (começando em 1) dos produtos de um nível."""
+    levels = stock_levels()
+    query = select(levels.c.id, levels.c.name, levels.c.active,
+                   levels.c.stock, levels.c.threshold)\
+        .where(levels.c.level == level)
+    if level == LOW_STOCK:
+        query = query.order_by(levels.c.stock, levels.c.name, levels.c.id)
+    else:
+        query = query.order_by(levels.c.name, levels.c.id)
+    query = query.limit(per_page).offset((max(page, 1) - 1) * per_page)
+    return [StockRow(*row) for row in db.session.execute(query)]
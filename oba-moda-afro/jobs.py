@@ -0,0 +1,206 @@
+# jobs.py
+"""
+Fila de tarefas em segundo plano, guardada na tabela `job` do SQLite.
+
+Trabalho pesado disparado pelo admin (ex: gerar as versões WebP/AVIF de uma
+imagem enviada) não deve segurar o envio do formulário. A rota só grava uma
+linha 'pendente' com enqueue(); um JobWorker pega as tarefas e as executa
+em paralelo em um pool (threads ou processos, um por núcleo).
+
+Cada tipo de tarefa registra um handler com register():
+  - prepare(payload) -> (função, args): roda no pool; para o pool de
+    processos a função precisa ser importável e receber/devolver dados
+    simples (nada de sessão do banco).
+  - finish(payload, resultado): grava o resultado, no contexto da app.
+
+Onde o worker roda:
+  - dentro do próprio site (JOBS_IN_APP = True, padrão): uma thread por
+    processo, iniciada na primeira tarefa, com pool de threads;
+  - ou em um processo separado, com pool de processos:
+        flask processar-tarefas
+
+Vários workers podem rodar ao mesmo tempo: a tarefa é "pega" com um UPDATE
+condicional (`WHERE status = 'pendente'`), então só um deles a executa.
+"""
+import datetime
+import json
+import os
+import threading
+import traceback
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import click
+from sqlalchemy import or_, select, update
+
+from extensions import db
+
+PENDING = 'pendente'
+RUNNING = 'processando'
+DONE = 'concluido'
+FAILED = 'erro'
+
+JobHandler = namedtuple('JobHandler', ['prepare', 'finish'])
+
+_handlers = {}
+
+
+def register(kind, prepare, finish):
+    _handlers[kind] = JobHandler(prepare, finish)
+
+
+def enqueue(kind, **payload):
+    """Grava uma tarefa pendente (se já não houver uma igual na fila) e acorda o worker."""
+    from models import Job
+    data = json.dumps(payload, sort_keys=True)
+    exists = db.session.query(Job.id).filter_by(kind=kind, payload=data, status=PENDING).first()
+    if not exists:
+        db.session.add(Job(kind=kind, payload=data, status=PENDING))
+        db.session.commit()
+    worker.wake()
+
+
+class JobWorker:
+    """Pega tarefas pendentes e as executa em um pool."""
+
+    def __init__(self):
+        self.app = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+
+    @property
+    def config(self):
+        return self.app.config
+
+    def wake(self):
+        if self.app is None:
+            return
+        if self.config['JOBS_IN_APP']:
+            self._ensure_thread()
+        self._wake.set()
+
+    def _ensure_thread(self):
+        # Cada processo (ex: workers do gunicorn após o fork) tem sua própria thread
+        if self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self.run, kwargs={'use_processes': False},
+                                            name='job-worker', daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _claim(self, limit):
+        """Marca até `limit` tarefas como 'processando' e as retorna (id, kind, payload)."""
+        from models import Job
+        now = datetime.datetime.now()
+        # Tarefas 'processando' há muito tempo são de um worker que morreu
+        stale = now - datetime.timedelta(seconds=self.config['JOB_STALE_AFTER'])
+        claimable = or_(Job.status == PENDING, (Job.status == RUNNING) & (Job.started_at < stale))
+        candidates = db.session.execute(
+            select(Job.id, Job.kind, Job.payload).where(claimable).order_by(Job.id).limit(limit)
+        ).all()
+        claimed = []
+        for job_id, kind, payload in candidates:
+            result = db.session.execute(
+                update(Job).where(Job.id == job_id, claimable)
+                .values(status=RUNNING, started_at=now, attempts=Job.attempts + 1)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                claimed.append((job_id, kind, json.loads(payload)))
+        db.session.commit()
+        return claimed
+
+    def _finish(self, job_id, error=None):
+        from models import Job
+        job = db.session.get(Job, job_id)
+        if error is None:
+            job.status, job.error = DONE, None
+        elif job.attempts >= self.config['JOB_MAX_ATTEMPTS']:
+            job.status, job.error = FAILED, error
+        else:
+            job.status, job.error = PENDING, error
+        job.finished_at = datetime.datetime.now()
+        db.session.commit()
+
+    def run(self, use_processes=False, once=False):
+        """Laço do worker. `once` processa o que há na fila e retorna."""
+        max_workers = self.config['JOB_WORKERS'] or os.cpu_count() or 1
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        running = {}  # future -> (job_id, kind, payload)
+        with executor_class(max_workers=max_workers) as pool:
+            while not self._stop.is_set():
+                with self.app.app_context():
+                    try:
+                        for job_id, kind, payload in self._claim(max_workers - len(running)):
+                            handler = _handlers.get(kind)
+                            if handler is None:
+                                self._finish(job_id, f'Tipo de tarefa desconhecido: {kind}')
+                                continue
+                            try:
+                                func, args = handler.prepare(payload)
+                                running[pool.submit(func, *args)] = (job_id, kind, payload)
+                            except Exception:
+                                self._finish(job_id, traceback.format_exc())
+                    except Exception as e:
+                        db.session.rollback()
+                        print(f"Erro ao buscar tarefas: {e}")
+
+                if not running:
+                    if once:
+                        return
+                    self._wake.wait(self.config['JOB_POLL_INTERVAL'])
+                    self._wake.clear()
+                    continue
+
+                done, _ = wait(running, timeout=self.config['JOB_POLL_INTERVAL'],
+                               return_when=FIRST_COMPLETED)
+                with self.app.app_context():
+                    for future in done:
+                        job_id, kind, payload = running.pop(future)
+                        try:
+                            _handlers[kind].finish(payload, future.result())
+                            self._finish(job_id)
+                        except Exception:
+                            db.session.rollback()
+                            # Banco travado/caiu: a tarefa fica 'processando' e volta
+                            # depois de JOB_STALE_AFTER; o worker continua no laço
+                            try:
+                                self._finish(job_id, traceback.format_exc())
+                            except Exception as e:
+                                db.session.rollback()
+                                print(f"Erro ao finalizar a tarefa {job_id}: {e}")
+
+
+worker = JobWorker()
+
+
+@click.command('processar-tarefas')
+@click.option('--uma-vez', is_flag=True, help='Processa a fila atual e sai.')
+@click.option('--threads', is_flag=True, help='Usa threads em vez de processos.')
+def worker_command(uma_vez, threads):
+    """Executa as tarefas em segundo plano (ex: imagens) em um pool de processos."""
+    click.echo('Processando tarefas... (Ctrl+C para sair)' if not uma_vez else 'Processando a fila...')
+    worker.run(use_processes=not threads, once=uma_vez)
+
+
+def init_app(app):
+    app.config.setdefault('JOBS_IN_APP', True)
+    app.config.setdefault('JOB_WORKERS', None)  # None = um por núcleo
+    app.config.setdefault('JOB_POLL_INTERVAL', 2.0)
+    app.config.setdefault('JOB_STALE_AFTER', 600)
+    app.config.setdefault('JOB_MAX_ATTEMPTS', 3)
+    worker.init_app(app)
+    app.cli.add_command(worker_command)
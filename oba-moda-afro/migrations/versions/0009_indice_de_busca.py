@@ -0,0 +1,35 @@
+"""indice de busca
+
+Tabela virtual FTS5 product_search (nome, descrição, categorias e tamanhos
+de cada produto) usada pela busca da loja e do admin, mantida pelos
+eventos de search.py. Depois de aplicar, preencha com os produtos
+existentes:  flask reindexar-busca
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 12:41:12.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # O autogenerate não enxerga tabelas virtuais (ver search.CREATE_STATEMENTS)
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5("
+        "name, description, categories, sizes, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    op.execute("INSERT INTO product_search(product_search, rank) VALUES ('rank', 'bm25(10.0, 1.0, 4.0, 2.0)')")
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS product_search")
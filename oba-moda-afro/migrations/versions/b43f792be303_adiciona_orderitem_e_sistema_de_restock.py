@@ -0,0 +1,31 @@
+"""adiciona orderitem e sistema de restock
+
+Revisão da migração original do projeto (a que o README mandava aplicar).
+O arquivo não estava no repositório; ela volta aqui vazia só para
+continuar o histórico: bancos marcados com b43f792be303 seguem para a
+0001 com `flask db upgrade`, sem "Can't locate revision". A tabela
+order_item e a coluna order.restocked que ela criava estão na 0001 (com
+if_not_exists), então bancos sem nenhuma revisão também sobem direto.
+
+Revision ID: b43f792be303
+Revises: 
+Create Date: 2025-11-04 18:20:11.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b43f792be303'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    pass
+
+
+def downgrade():
+    pass
@@ -1,6 +1,8 @@
 # models.py
 from extensions import db, bcrypt
-from sqlalchemy.orm import relationship
+from sqlalchemy import func, select
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import relationship, selectinload
 from flask_login import UserMixin
 import datetime
 from flask import url_for 
@@ -9,16 +11,30 @@ from flask import url_for
 product_category_association = db.Table('product_category_association',
     db.metadata, 
     db.Column('product_id', db.Integer, db.ForeignKey('product.id'), primary_key=True),
-    db.Column('category_id', db.Integer, db.ForeignKey('category.id'), primary_key=True)
+    db.Column('category_id', db.Integer, db.ForeignKey('category.id'), primary_key=True),
+    # A PK (product_id, category_id) não serve para "produtos da categoria X"
+    db.Index('ix_product_category_category_id', 'category_id', 'product_id')
 )
 
 promotion_product_association = db.Table('promotion_product_association',
     db.metadata,
     db.Column('promotion_id', db.Integer, db.ForeignKey('promotion.id'), primary_key=True),
-    db.Column('product_id', db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    db.Column('product_id', db.Integer, db.ForeignKey('product.id'), primary_key=True),
+    # Promoções de um produto (a PK começa por promotion_id)
+    db.Index('ix_promotion_product_product_id', 'product_id', 'promotion_id')
 )
 
-class Promotion(db.Model):
+# --- VERSÃO DAS LINHAS DO CATÁLOGO (mantida pelos eventos de changelog.py) ---
+class CatalogVersioned:
+    """
+    Quando a linha mudou pela última vez e quantas vezes: `row_version`
+    começa em 1 no INSERT e só cresce. Cada mudança também entra na tabela
+    catalog_change, com a versão global do catálogo (ver changelog.py).
+    """
+    updated_at = db.Column(db.DateTime, nullable=True)
+    row_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+class Promotion(db.Model, CatalogVersioned):
     # ... (Sem alteração) ...
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, unique=True) # Ex: "Black Friday"
@@ -42,31 +58,33 @@ class Promotion(db.Model):
             return False
         return True
 
-class Category(db.Model):
+class Category(db.Model, CatalogVersioned):
     # ... (Sem alteração) ...
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, unique=True)
     slug = db.Column(db.String(100), nullable=False, unique=True)
     description = db.Column(db.Text, nullable=True)
+    # Limite de "baixo estoque" dos produtos desta categoria (vazio = padrão do inventory.py)
+    low_stock_threshold = db.Column(db.Integer, nullable=True)
     products = relationship('Product', 
                             secondary=product_category_association,
                             back_populates='categories')
     def __str__(self):
         return self.name
 
-class HeaderCategory(db.Model):
+class HeaderCategory(db.Model, CatalogVersioned):
     # ... (Sem alteração) ...
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
-    order = db.Column(db.Integer, default=0)
+    order = db.Column(db.Integer, default=0, index=True)
     category = db.relationship('Category', backref='header_links', lazy=True)
     def __str__(self):
         if self.category:
             return f"{self.name} (Links para: {self.category.name})"
         return self.name
 
-class CircularCategory(db.Model):
+class CircularCategory(db.Model, CatalogVersioned):
     # ... (Sem alteração) ...
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -75,12 +93,14 @@ class CircularCategory(db.Model):
     category = db.relationship('Category', backref='circular_links', lazy=True)
     order = db.Column(db.Integer, default=0)
     section = db.Column(db.Integer, default=1) 
+    # Home: WHERE section = ? ORDER BY "order"
+    __table_args__ = (db.Index('ix_circular_category_section_order', 'section', 'order'),)
     def __str__(self):
         if self.category:
             return f"{self.name} (Link: {self.category.name}) (Seção {self.section})"
         return f"{self.name} (Seção {self.section})"
 
-class Banner(db.Model):
+class Banner(db.Model, CatalogVersioned):
     # ... (Sem alteração - já corrigido) ...
     id = db.Column(db.Integer, primary_key=True)
     image_url_desktop = db.Column(db.String(200), nullable=False)
@@ -88,7 +108,7 @@ class Banner(db.Model):
     link_url = db.Column(db.String(200), default="#", nullable=True) 
     title = db.Column(db.String(150))
     subtitle = db.Column(db.String(200))
-    order = db.Column(db.Integer, default=0)
+    order = db.Column(db.Integer, default=0, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=True) 
     product = db.relationship('Product', backref='banners', lazy=True)
     
@@ -107,7 +127,7 @@ class Banner(db.Model):
 
     def __str__(self): return self.title or f"Banner {self.id}"
 
-class Product(db.Model):
+class Product(db.Model, CatalogVersioned):
     # ... (Sem alteração) ...
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
@@ -125,48 +145,67 @@ class Product(db.Model):
                               secondary=promotion_product_association,
                               back_populates='products')    
     variations = relationship('Variation', backref='product', lazy=True, cascade='all, delete-orphan')
+    # Listagens: WHERE active = 1 ORDER BY name/price, id (paginação em catalog.py)
+    __table_args__ = (
+        db.Index('ix_product_active_name', 'active', 'name'),
+        db.Index('ix_product_active_price', 'active', 'price'),
+    )
+    # Preços promocionais vêm do índice em memória (ver promotions.py):
+    # nenhuma query de promoções por produto nas listagens e no carrinho.
     @property
     def active_promotion(self):
-        if not self.promotions:
+        from promotions import current_index
+        entry = current_index().get(self.id)
+        if entry is None:
             return None
-        for promo in self.promotions:
-            if promo.is_currently_active:
-                return promo
-        return None
+        return db.session.get(Promotion, entry.promotion_id)
     @property
     def is_on_sale(self):
-        return self.active_promotion is not None
+        from promotions import current_index
+        return current_index().get(self.id) is not None
     @property
     def current_price(self):
-        promo = self.active_promotion
-        if promo:
-            discount_factor = 1.0 - (promo.discount_percent / 100.0)
-            return round(self.price * discount_factor, 2)
-        return self.price
-    @property
+        from promotions import current_index
+        return current_index().price(self.id, self.price)
+    # Em Python soma as variações já carregadas (use listing_options() nas
+    # listagens para carregá-las em lote); em SQL vira uma subquery correlacionada,
+    # útil em filtros/ordenação (ex: Product.query.filter(Product.total_stock > 0)).
+    @hybrid_property
     def total_stock(self):
         if not self.variations:
             return 0
         return sum(var.stock for var in self.variations)
+    @total_stock.expression
+    def total_stock(cls):
+        return select(func.coalesce(func.sum(Variation.stock), 0))\
+                   .where(Variation.product_id == cls.id)\
+                   .scalar_subquery()
+    @classmethod
+    def listing_options(cls):
+        """Opções de carregamento para listagens: as variações de todos os
+        produtos vêm em uma query extra (SELECT ... IN), sem N+1. As promoções
+        não precisam ser carregadas (ver promotions.py)."""
+        return (selectinload(cls.variations),)
     def __str__(self):
         return self.name
 
-class Variation(db.Model):
+class Variation(db.Model, CatalogVersioned):
     # ... (Sem alteração) ...
     id = db.Column(db.Integer, primary_key=True)
     size = db.Column(db.String(50), nullable=False)
     stock = db.Column(db.Integer, nullable=False, default=0)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
     def __str__(self):
         return f"{self.product.name} - {self.size} ({self.stock} unid.)"
 
 product_section_association = db.Table('product_section_association',
     db.metadata, 
     db.Column('product_id', db.Integer, db.ForeignKey('product.id')),
-    db.Column('section_id', db.Integer, db.ForeignKey('product_section.id'))
+    db.Column('section_id', db.Integer, db.ForeignKey('product_section.id')),
+    db.Index('ix_product_section_section_id', 'section_id', 'product_id')
 )
 
-class ProductSection(db.Model):
+class ProductSection(db.Model, CatalogVersioned):
     # ... (Sem alteração) ...
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False, default="Destaques")
@@ -174,7 +213,7 @@ class ProductSection(db.Model):
                                backref=db.backref('sections', lazy='dynamic'))
     def __str__(self): return self.title
 
-class TextSection(db.Model):
+class TextSection(db.Model, CatalogVersioned):
     # ... (Sem alteração) ...
     id = db.Column(db.Integer, primary_key=True)
     key = db.Column(db.String(50), unique=True, nullable=False, default='sobre-nos')
@@ -183,12 +222,13 @@ class TextSection(db.Model):
     def __str__(self): return self.title
 
 # --- MODELO FOOTERLINK ATUALIZADO ---
-class FooterLink(db.Model):
+class FooterLink(db.Model, CatalogVersioned):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     url = db.Column(db.String(200), default="#")
     order = db.Column(db.Integer, default=0)
     column = db.Column(db.Integer, default=1)
+    __table_args__ = (db.Index('ix_footer_link_column_order', 'column', 'order'),)
     
     # --- 1. ADICIONE ESTA NOVA PROPRIEDADE ---
     @property
@@ -217,8 +257,8 @@ class FooterLink(db.Model):
 class OrderItem(db.Model):
     # ... (Sem alteração) ...
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
-    variation_id = db.Column(db.Integer, db.ForeignKey('variation.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
+    variation_id = db.Column(db.Integer, db.ForeignKey('variation.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     price_per_item = db.Column(db.Float, nullable=False)
     order = relationship('Order', back_populates='order_items')
@@ -234,15 +274,27 @@ class Order(db.Model):
     whatsapp_url = db.Column(db.String(1000), nullable=True)
     status = db.Column(db.String(30), nullable=False, default='Pendente')
     restocked = db.Column(db.Boolean, default=False)
+    # Dashboard: filtros por período e por (status, período)
+    __table_args__ = (
+        db.Index('ix_order_created_at', 'created_at'),
+        db.Index('ix_order_status_created_at', 'status', 'created_at'),
+    )
+    # "2x Brinco (P), ..." gravado no checkout/admin (ver order_search.py): a lista não relê os itens
+    items_summary = db.Column(db.Text, nullable=True)
     order_items = relationship('OrderItem', back_populates='order', lazy='dynamic', cascade='all, delete-orphan')
-    @property
-    def items_summary(self):
-        if not self.order_items:
-            return "N/A"
-        return ", ".join([f"{item.quantity}x {item.variation.product.name} ({item.variation.size})" for item in self.order_items])
     def __str__(self):
         return f"Pedido #{self.id} - R${self.total_price:.2f} ({self.status})"
 
+# --- RESUMO DIÁRIO DE VENDAS (mantido por rollup.py, lido pelo dashboard) ---
+class DailySalesRollup(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(30), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    items_sold = db.Column(db.Integer, nullable=False, default=0)
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.order_count} pedidos"
+
 class SiteStat(db.Model):
     # ... (Sem alteração) ...
     id = db.Column(db.Integer, primary_key=True)
@@ -251,6 +303,79 @@ class SiteStat(db.Model):
     def __str__(self):
         return f"{self.key}: {self.value}"
 
+# --- CARIMBOS DE VERSÃO DOS CACHES (ver cache.py) ---
+class CacheVersion(db.Model):
+    namespace = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.now)
+    def __str__(self):
+        return f"{self.namespace} (v{self.version})"
+
+# --- LOG DE ALTERAÇÕES DO CATÁLOGO (ver changelog.py) ---
+class CatalogChange(db.Model):
+    # O id é a versão global do catálogo: "o que mudou desde a versão N" = id > N
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    row_version = db.Column(db.Integer, nullable=False)
+    operation = db.Column(db.String(10), nullable=False) # 'insert', 'update' ou 'delete'
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
+    __table_args__ = (
+        # Compactação: a última alteração de cada linha
+        db.Index('ix_catalog_change_row', 'table_name', 'row_id', 'id'),
+        # AUTOINCREMENT: o SQLite nunca reaproveita um id (a versão só cresce)
+        {'sqlite_autoincrement': True},
+    )
+    def __str__(self):
+        return f"#{self.id} {self.operation} {self.table_name} {self.row_id} (v{self.row_version})"
+
+# --- CARRINHOS GUARDADOS NO SERVIDOR (CART_STORAGE = 'servidor', ver cart_storage.py) ---
+class StoredCart(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    # Pares (variation_id, quantidade) compactados em varint
+    items = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.now, index=True)
+    def __str__(self):
+        return f"Carrinho {self.id}"
+
+# --- VERSÕES REDIMENSIONADAS DAS IMAGENS ENVIADAS (ver images.py) ---
+class ImageVariant(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # Nome do arquivo original em static/uploads
+    original = db.Column(db.String(255), nullable=False)
+    # sha256 do conteúdo do original (as variantes são nomeadas por ele)
+    digest = db.Column(db.String(64), nullable=False)
+    width = db.Column(db.Integer, nullable=False)
+    format = db.Column(db.String(10), nullable=False)
+    # Caminho relativo a static/uploads
+    path = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    __table_args__ = (
+        db.UniqueConstraint('original', 'format', 'width', name='uq_image_variant_original_format_width'),
+    )
+    def __str__(self):
+        return f"{self.original} ({self.format} {self.width}w)"
+
+# --- FILA DE TAREFAS EM SEGUNDO PLANO (ver jobs.py) ---
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    # Parâmetros da tarefa em JSON
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    # 'pendente', 'processando', 'concluido' ou 'erro'
+    status = db.Column(db.String(20), nullable=False, default='pendente')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.now)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # O worker procura as pendentes mais antigas
+    __table_args__ = (
+        db.Index('ix_job_status_id', 'status', 'id'),
+    )
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
 class User(db.Model, UserMixin):
     # ... (Sem alteração) ...
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,197 @@
+# order_search.py
+"""
+Resumo e busca dos pedidos no admin.
+
+A lista de pedidos mostrava `items_summary`, uma @property que percorria
+a relação `lazy='dynamic'` (uma query por pedido da página, mais uma por
+variação e por produto), e a busca (`column_searchable_list =
+('order_items.variation.product.name',)`) fazia o Flask-Admin juntar
+Order -> OrderItem -> Variation -> Product e varrer os nomes com
+LIKE '%...%'.
+
+Agora cada pedido tem um documento pronto:
+
+- `order.items_summary`: o texto da lista ("2x Brinco Pérola (P), ..."),
+  gravado na própria linha do pedido;
+- tabela FTS5 `order_search` (rowid = id do pedido) com os nomes dos
+  produtos, os tamanhos e o status, usada pela caixa de busca (sem
+  acento, sem diferenciar maiúsculas; "#123" ou "123" acha também o
+  pedido 123).
+
+Os dois são atualizados por eventos do SQLAlchemy, na mesma transação:
+pedido criado (checkout ou admin), itens adicionados/alterados/removidos
+e mudança de status. O resumo é o que foi pedido: renomear um produto
+depois não muda os pedidos antigos.
+
+Para (re)montar tudo: flask reindexar-pedidos
+"""
+import click
+from sqlalchemy import bindparam, column, delete, event, inspect, literal_column, or_, select, table, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from extensions import db
+from models import Order, OrderItem, Product, Variation
+from search import CHUNK, match_expression
+
+TABLE_NAME = 'order_search'
+
+CREATE_STATEMENTS = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE_NAME} USING fts5("
+    "products, sizes, status, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+)
+
+order_search_table = table(TABLE_NAME, column('rowid'), column('products'), column('sizes'), column('status'))
+
+# Chave em session.info
+_PENDING = 'order_search_pending'
+
+
+# --- Consultas ---
+
+def summarize(items):
+    """Texto da lista a partir de [(quantidade, nome do produto, tamanho)]."""
+    return ', '.join(f'{quantity}x {name} ({size})' for quantity, name, size in items) or None
+
+
+def search_filter(text):
+    """
+    Condição para Order.id com o texto da caixa de busca do admin, ou None
+    se não houver nada para buscar.
+    """
+    conditions = []
+    number = (text or '').strip().lstrip('#')
+    if number.isdigit():
+        conditions.append(Order.id == int(number))
+    expression = match_expression(text)
+    if expression is not None:
+        conditions.append(Order.id.in_(
+            select(order_search_table.c.rowid).where(literal_column(TABLE_NAME).op('MATCH')(expression))))
+    return or_(*conditions) if conditions else None
+
+
+# --- Índice ---
+
+def reindex(connection, order_ids):
+    """
+    Refaz o resumo e a linha do índice destes pedidos (apaga as de pedidos
+    excluídos). Retorna {id do pedido: resumo}.
+    """
+    summaries = {}
+    order_ids = sorted(order_ids)
+    for start in range(0, len(order_ids), CHUNK):
+        ids = order_ids[start:start + CHUNK]
+        connection.execute(delete(order_search_table).where(order_search_table.c.rowid.in_(ids)))
+        items = {}
+        for order_id, quantity, name, size in connection.execute(
+                select(OrderItem.order_id, OrderItem.quantity, Product.name, Variation.size)
+                .join(Variation, Variation.id == OrderItem.variation_id)
+                .join(Product, Product.id == Variation.product_id)
+                .where(OrderItem.order_id.in_(ids))
+                .order_by(OrderItem.id)):
+            items.setdefault(order_id, []).append((quantity, name, size))
+        rows = []
+        for order_id, status in connection.execute(select(Order.id, Order.status).where(Order.id.in_(ids))):
+            order_items = items.get(order_id, [])
+            summaries[order_id] = summarize(order_items)
+            rows.append({'rowid': order_id,
+                         'products': ' '.join(name for _, name, _ in order_items),
+                         'sizes': ' '.join(size for _, _, size in order_items),
+                         'status': status})
+        if rows:
+            connection.execute(order_search_table.insert(), rows)
+            order = Order.__table__
+            connection.execute(
+                update(order).where(order.c.id == bindparam('order_id'))
+                .values(items_summary=bindparam('summary')),
+                [{'order_id': row['rowid'], 'summary': summaries[row['rowid']]} for row in rows])
+    return summaries
+
+
+def rebuild():
+    """Apaga e remonta o índice e os resumos de todos os pedidos. Retorna quantos."""
+    connection = db.session.connection()
+    connection.execute(delete(order_search_table))
+    order_ids = list(db.session.scalars(select(Order.id)))
+    reindex(connection, order_ids)
+    db.session.commit()
+    return len(order_ids)
+
+
+def create_table(connection):
+    for statement in CREATE_STATEMENTS:
+        connection.exec_driver_sql(statement)
+
+
+# --- Eventos (mantêm os resumos e o índice em dia) ---
+
+def _changed(obj, *attributes):
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+def _before_flush(session, flush_context, instances):
+    orders = []            # objetos (os novos ainda não têm id)
+    order_ids = set()
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Order):
+                orders.append(obj)
+            elif isinstance(obj, OrderItem):
+                if obj.order is not None:
+                    orders.append(obj.order)
+                elif obj.order_id is not None:
+                    order_ids.add(obj.order_id)
+        for obj in session.dirty:
+            if isinstance(obj, Order) and _changed(obj, 'status'):
+                orders.append(obj)
+            elif isinstance(obj, OrderItem) and _changed(obj, 'quantity', 'variation_id', 'variation', 'order_id'):
+                order_ids.update(oid for oid in inspect(obj).attrs.order_id.history.sum() if oid)
+                if obj.order is not None:
+                    orders.append(obj.order)
+        for obj in session.deleted:
+            if isinstance(obj, Order):
+                order_ids.add(obj.id)
+            elif isinstance(obj, OrderItem) and obj.order_id is not None:
+                order_ids.add(obj.order_id)
+    if orders or order_ids:
+        pending = session.info.setdefault(_PENDING, ([], set()))
+        pending[0].extend(orders)
+        pending[1].update(order_ids)
+
+
+def _after_flush(session, flush_context):
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    orders, order_ids = pending
+    order_ids = set(order_ids)
+    order_ids.update(o.id for o in orders if o.id is not None)
+    summaries = reindex(session.connection(), order_ids)
+    # O UPDATE foi direto no banco: acerta os objetos já carregados sem reler
+    mapper = inspect(Order)
+    for order_id, summary in summaries.items():
+        order = session.identity_map.get(mapper.identity_key_from_primary_key((order_id,)))
+        if order is not None:
+            set_committed_value(order, 'items_summary', summary)
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(_PENDING, None)
+
+
+event.listen(db.session, 'before_flush', _before_flush)
+event.listen(db.session, 'after_flush', _after_flush)
+event.listen(db.session, 'after_soft_rollback', _after_rollback)
+# db.create_all() (testes, benchmarks) também cria a tabela FTS5
+event.listen(db.metadata, 'after_create', lambda target, connection, **kw: create_table(connection))
+
+
+@click.command('reindexar-pedidos')
+def reindex_command():
+    """Remonta o resumo dos itens e o índice de busca de todos os pedidos."""
+    click.echo(f'{rebuild()} pedidos indexados.')
+
+
+def init_app(app):
+    app.cli.add_command(reindex_command)
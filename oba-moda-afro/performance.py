@@ -0,0 +1,298 @@
+# performance.py
+"""
+Medição de tempo por requisição: queries, SQL, templates e Python.
+
+Não havia como saber por que uma página estava lenta sem rodar um
+profiler na mão. Agora cada requisição mede, com eventos do SQLAlchemy
+(todos os engines, inclusive o de leitura do sqlite_profile.py) e os
+sinais de template do Flask:
+
+- quantas queries rodou e quanto tempo passou no banco (sql);
+- quanto tempo passou renderizando templates, sem contar as queries que
+  o template disparou (tpl);
+- o resto, que é o nosso código Python (app).
+
+Os números são somados por rota na página "Desempenho" do admin, com
+p50/p95/máximo (os totais ficam em memória, por processo). Com
+PERF_SERVER_TIMING ligado (desenvolvimento, benchmarks), vão também no
+header `Server-Timing`, que aparece na aba Rede do navegador; em produção
+fica desligado, porque qualquer visitante veria as queries e os tempos.
+
+Requisições acima de PERF_SLOW_MS vão para a lista de lentas. Uma fração
+(PERF_PROFILE_RATE) das requisições roda com o cProfile ligado, e a
+próxima requisição de uma rota que acabou de ser lenta também; se ela for
+lenta de novo, as funções mais caras ficam guardadas junto.
+
+Config: PERF_ENABLED, PERF_SERVER_TIMING, PERF_SLOW_MS, PERF_PROFILE_RATE.
+"""
+import cProfile
+import datetime
+import io
+import pstats
+import random
+import threading
+import time
+from collections import deque
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Durações guardadas por rota para calcular os percentis
+SAMPLES_PER_ROUTE = 500
+# Quantas requisições lentas ficam na lista (as mais recentes)
+SLOW_LOG_SIZE = 50
+# Linhas do cProfile guardadas por requisição lenta
+PROFILE_LINES = 30
+
+
+class RequestTimer:
+    """Tempos da requisição atual (guardado em g)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql = 0.0
+        self.template = 0.0
+        self.profiler = None
+        self._template_depth = 0
+        self._template_started = 0.0
+        self._template_sql = 0.0
+
+    def enter_template(self):
+        # Templates renderizados dentro de outro (ex: fragmentos) contam uma vez só
+        if self._template_depth == 0:
+            self._template_started = time.perf_counter()
+            self._template_sql = self.sql
+        self._template_depth += 1
+
+    def exit_template(self):
+        self._template_depth -= 1
+        if self._template_depth == 0:
+            elapsed = time.perf_counter() - self._template_started
+            # Queries disparadas pelo template (lazy load) já contam em sql
+            self.template += elapsed - (self.sql - self._template_sql)
+
+    def finish(self):
+        """(total, sql, template, python) em segundos."""
+        total = time.perf_counter() - self.started
+        return total, self.sql, self.template, max(0.0, total - self.sql - self.template)
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class RouteStats:
+    """Totais de uma rota (endpoint)."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.count = 0
+        self.total = 0.0
+        self.sql = 0.0
+        self.template = 0.0
+        self.python = 0.0
+        self.queries = 0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLES_PER_ROUTE)
+
+    def add(self, total, sql, template, python, queries):
+        self.count += 1
+        self.total += total
+        self.sql += sql
+        self.template += template
+        self.python += python
+        self.queries += queries
+        self.max = max(self.max, total)
+        self.samples.append(total)
+
+    def summary(self):
+        """Médias e percentis em milissegundos, para o admin."""
+        count = self.count or 1
+        return {
+            'endpoint': self.endpoint,
+            'count': self.count,
+            'avg_ms': self.total / count * 1000,
+            'p50_ms': _percentile(self.samples, 50) * 1000,
+            'p95_ms': _percentile(self.samples, 95) * 1000,
+            'max_ms': self.max * 1000,
+            'queries': self.queries / count,
+            'sql_ms': self.sql / count * 1000,
+            'template_ms': self.template / count * 1000,
+            'python_ms': self.python / count * 1000,
+            'total_s': self.total,
+        }
+
+
+class PerformanceStats:
+    """Totais por rota e lista de requisições lentas (por processo)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._slow = deque(maxlen=SLOW_LOG_SIZE)
+        # Rotas cuja próxima requisição roda com o cProfile
+        self._armed = set()
+        self.since = datetime.datetime.now()
+
+    def record(self, endpoint, total, sql, template, python, queries):
+        with self._lock:
+            route = self._routes.get(endpoint)
+            if route is None:
+                route = self._routes[endpoint] = RouteStats(endpoint)
+            route.add(total, sql, template, python, queries)
+
+    def record_slow(self, entry, profiled):
+        with self._lock:
+            self._slow.appendleft(entry)
+            if profiled:
+                self._armed.discard(entry['endpoint'])
+            else:
+                self._armed.add(entry['endpoint'])
+
+    def should_profile(self, endpoint, rate):
+        return endpoint in self._armed or (rate > 0 and random.random() < rate)
+
+    def routes(self):
+        """Resumo de cada rota, da que mais consumiu tempo no total para a que menos."""
+        with self._lock:
+            summaries = [route.summary() for route in self._routes.values()]
+        return sorted(summaries, key=lambda s: s['total_s'], reverse=True)
+
+    def slow_requests(self):
+        with self._lock:
+            return list(self._slow)
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._slow.clear()
+            self._armed.clear()
+            self.since = datetime.datetime.now()
+
+
+stats = PerformanceStats()
+
+
+def _current():
+    return g.get('_perf_timer') if has_request_context() else None
+
+
+# --- Eventos do SQLAlchemy (todos os engines) ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current() is not None:
+        conn.info.setdefault('_perf_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('_perf_query_started')
+    timer = _current()
+    if started and timer is not None:
+        timer.sql += time.perf_counter() - started.pop()
+        timer.queries += 1
+
+
+def _handle_error(context):
+    # A query deu erro e o after_cursor_execute não vai rodar: tira o início
+    # dela da pilha, senão a conexão (reaproveitada pelo pool) fica com um
+    # horário velho e as próximas medições saem erradas
+    connection = context.connection
+    started = connection.info.get('_perf_query_started') if connection is not None else None
+    if started and context.statement is not None:
+        started.pop()
+
+
+# --- Sinais de template do Flask ---
+
+def _before_render(sender, template, context, **extra):
+    timer = _current()
+    if timer is not None:
+        timer.enter_template()
+
+
+def _template_rendered(sender, template, context, **extra):
+    timer = _current()
+    if timer is not None:
+        timer.exit_template()
+
+
+# --- Hooks da requisição ---
+
+def _start(app):
+    timer = g._perf_timer = RequestTimer()
+    if stats.should_profile(request.endpoint, app.config['PERF_PROFILE_RATE']):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Outro profiler já ativo nesta thread
+            return
+        timer.profiler = profiler
+
+
+def _profile_text(profiler):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_LINES)
+    return out.getvalue()
+
+
+def _finish(app, response):
+    timer = g.pop('_perf_timer', None)
+    if timer is None:
+        return response
+    if timer.profiler is not None:
+        timer.profiler.disable()
+    total, sql, template, python = timer.finish()
+    endpoint = request.endpoint or f'<{response.status_code}>'
+    stats.record(endpoint, total, sql, template, python, timer.queries)
+
+    if total * 1000 >= app.config['PERF_SLOW_MS']:
+        stats.record_slow({
+            'at': datetime.datetime.now(),
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': response.status_code,
+            'total_ms': total * 1000,
+            'sql_ms': sql * 1000,
+            'template_ms': template * 1000,
+            'python_ms': python * 1000,
+            'queries': timer.queries,
+            'profile': _profile_text(timer.profiler) if timer.profiler is not None else None,
+        }, profiled=timer.profiler is not None)
+
+    if app.config['PERF_SERVER_TIMING']:
+        response.headers['Server-Timing'] = ', '.join([
+            f'sql;dur={sql * 1000:.1f};desc="{timer.queries} queries"',
+            f'tpl;dur={template * 1000:.1f};desc="Templates"',
+            f'app;dur={python * 1000:.1f};desc="Python"',
+            f'total;dur={total * 1000:.1f}',
+        ])
+    return response
+
+
+def init_app(app):
+    """Liga a medição. Chame antes dos outros init_app que registram after_request,
+    para medir também o que eles fazem (o Flask roda os after_request ao contrário)."""
+    app.config.setdefault('PERF_ENABLED', True)
+    # Desligado por padrão: o header mostra para qualquer visitante quantas queries a página fez
+    app.config.setdefault('PERF_SERVER_TIMING', False)
+    app.config.setdefault('PERF_SLOW_MS', 500)
+    app.config.setdefault('PERF_PROFILE_RATE', 0.01)
+    if not app.config['PERF_ENABLED']:
+        return
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_template_rendered, app)
+
+    app.before_request(lambda: _start(app))
+    app.after_request(lambda response: _finish(app, response))
@@ -0,0 +1,82 @@
+# product_detail.py
+"""
+Página do produto (/produto/<slug>) com uma única query.
+
+Antes a rota buscava o produto e o template ia carregando o resto aos
+poucos: as variações (e somava o estoque de novo em `total_stock`), as
+categorias para o link "Categoria:". Aqui produto, variações e categorias
+vêm juntos (JOIN); o preço promocional já vem do índice em memória
+(promotions.py) e a contagem de visualizações do buffer de counters.py,
+então a página não faz nenhuma outra query nem escrita.
+
+A matriz de tamanhos (o <select> com o estoque de cada tamanho) é
+renderizada uma vez e guardada em memória por produto, com a chave
+formada pelos (id, row_version) das variações (ver changelog.py): qualquer
+mudança de estoque ou tamanho — admin, checkout — muda a chave, sem
+precisar invalidar nada.
+"""
+import threading
+from collections import OrderedDict
+
+from flask import render_template
+from markupsafe import Markup
+from sqlalchemy import select
+from sqlalchemy.orm import contains_eager
+
+from extensions import db
+from models import Category, Product, Variation, product_category_association
+
+# Quantas matrizes ficam em memória (por processo); as menos usadas saem
+SIZE_MATRIX_CACHE_SIZE = 2048
+
+
+def load(slug):
+    """Produto ativo com variações (em ordem de id) e categorias, ou None."""
+    # Categorias com JOINs "planos": o joinedload (e o outerjoin pela relação) gera
+    # LEFT JOIN (associação JOIN category), que o SQLite materializa varrendo a
+    # tabela de associação inteira a cada página
+    stmt = select(Product)\
+        .outerjoin(Product.variations)\
+        .outerjoin(product_category_association, product_category_association.c.product_id == Product.id)\
+        .outerjoin(Category, Category.id == product_category_association.c.category_id)\
+        .options(contains_eager(Product.variations), contains_eager(Product.categories))\
+        .where(Product.slug == slug, Product.active == True)\
+        .order_by(Variation.id)
+    # one_or_none() lê todas as linhas do JOIN (first() pararia na primeira variação)
+    return db.session.execute(stmt).unique().scalars().one_or_none()
+
+
+class SizeMatrixCache:
+    """LRU do HTML da matriz de tamanhos, por (produto, versões das variações)."""
+
+    def __init__(self, max_entries=SIZE_MATRIX_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, product):
+        key = (product.id, tuple((var.id, var.row_version) for var in product.variations))
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                return html
+        html = Markup(render_template(
+            '_matriz_tamanhos.html',
+            product_id=product.id,
+            variations=product.variations,
+            total_stock=product.total_stock
+        ))
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+size_matrix_cache = SizeMatrixCache()
@@ -0,0 +1,164 @@
+# promotions.py
+"""
+Índice de preços promocionais (product_id -> promoção em vigor).
+
+Antes, cada `Product.current_price` carregava as promoções do produto e
+testava `is_currently_active` (com datetime.now()) uma a uma, em toda
+listagem e em toda linha do carrinho. Agora um índice com todas as
+promoções em vigor é montado uma vez por processo e consultar o preço é
+só um acesso a dict.
+
+O índice é refeito quando:
+- uma promoção é salva/excluída no admin (namespace de cache 'promocoes');
+- o relógio passa pela próxima data de início/fim de alguma promoção
+  (`valid_until`), o que liga ou desliga preços sem ninguém mexer no admin.
+
+O PromotionScheduler é o único lugar que sabe quando os preços mudam: ele
+dá a "dica de TTL" (segundos até a próxima virada) para os caches de
+páginas com preço, e a cada requisição confere o relógio; passada a virada,
+limpa o índice e os caches registrados. O relógio é injetável
+(`scheduler.clock`), o que permite simular datas.
+"""
+import datetime
+import hashlib
+import threading
+from collections import namedtuple
+
+from cache import VersionedCache
+from extensions import db
+from models import Promotion, promotion_product_association
+
+# Promoção em vigor de um produto; `valid_until` é quando ela deixa de valer
+# (None = sem data de fim)
+PromotionPrice = namedtuple('PromotionPrice', ['discount_percent', 'promotion_id', 'valid_until'])
+
+# Uma promoção vale até o instante exato de end_date (inclusive); a virada
+# acontece logo depois
+END_BOUNDARY_DELAY = datetime.timedelta(microseconds=1)
+
+
+def discounted(price, discount_percent):
+    """Preço com desconto, arredondado como sempre foi (2 casas)."""
+    return round(price * (1.0 - (discount_percent / 100.0)), 2)
+
+
+def is_running(start_date, end_date, now):
+    """Mesma regra de Promotion.is_currently_active (sem olhar is_active)."""
+    if start_date and now < start_date:
+        return False
+    if end_date and now > end_date:
+        return False
+    return True
+
+
+class PriceIndex:
+    """Promoções em vigor por produto, válidas até `valid_until`."""
+
+    def __init__(self, entries, built_at, valid_until):
+        self.entries = entries
+        self.built_at = built_at
+        self.valid_until = valid_until
+        # Igual em todos os workers enquanto os mesmos preços estão em vigor
+        # (entra no ETag das páginas, ver conditional.py)
+        self.fingerprint = hashlib.sha1(repr(sorted(
+            (product_id, entry.discount_percent) for product_id, entry in entries.items()
+        )).encode()).hexdigest()[:16]
+
+    def get(self, product_id):
+        return self.entries.get(product_id)
+
+    def price(self, product_id, base_price):
+        entry = self.entries.get(product_id)
+        if entry is None:
+            return base_price
+        return discounted(base_price, entry.discount_percent)
+
+    def seconds_left(self):
+        """Segundos até a próxima mudança de preço (None = nenhuma prevista)."""
+        if self.valid_until is None:
+            return None
+        return max(0.0, (self.valid_until - self.built_at).total_seconds())
+
+
+def build_index(now=None):
+    """Monta o PriceIndex com uma única query (promoções ativas x produtos)."""
+    now = now or datetime.datetime.now()
+    rows = db.session.query(
+        promotion_product_association.c.product_id,
+        Promotion.id, Promotion.discount_percent, Promotion.start_date, Promotion.end_date
+    ).join(Promotion, Promotion.id == promotion_product_association.c.promotion_id)\
+     .filter(Promotion.is_active == True)\
+     .order_by(Promotion.id).all()
+
+    entries = {}
+    boundaries = []
+    for product_id, promotion_id, discount_percent, start_date, end_date in rows:
+        if start_date and start_date > now:
+            boundaries.append(start_date)
+        if end_date and end_date >= now:
+            boundaries.append(end_date + END_BOUNDARY_DELAY)
+        if not is_running(start_date, end_date, now):
+            continue
+        # Campanhas sobrepostas no mesmo produto: vale o maior desconto
+        current = entries.get(product_id)
+        if current is None or (discount_percent or 0.0) > current.discount_percent:
+            entries[product_id] = PromotionPrice(discount_percent or 0.0, promotion_id, end_date)
+
+    return PriceIndex(entries, now, min(boundaries) if boundaries else None)
+
+
+class PromotionScheduler:
+    """Sabe quando o próximo preço muda e avisa os caches que dependem disso."""
+
+    def __init__(self, clock=datetime.datetime.now):
+        self.clock = clock
+        self._caches = []
+        self._lock = threading.Lock()
+
+    def now(self):
+        return self.clock()
+
+    def register(self, cache):
+        """Registra um VersionedCache que guarda preços (limpo a cada virada)."""
+        self._caches.append(cache)
+
+    def next_boundary(self):
+        """Data/hora da próxima ativação ou expiração (None = nenhuma prevista)."""
+        return price_index.get().valid_until
+
+    def ttl(self, max_age=None):
+        """Segundos que um conteúdo com preços pode ficar em cache."""
+        boundary = self.next_boundary()
+        if boundary is None:
+            return max_age
+        seconds = max(0.0, (boundary - self.now()).total_seconds())
+        return seconds if max_age is None else min(seconds, max_age)
+
+    def tick(self):
+        """Passou da virada? Limpa o índice e os caches registrados deste processo."""
+        index = price_index.peek()
+        if index is None or index.valid_until is None or self.now() < index.valid_until:
+            return False
+        with self._lock:
+            if price_index.peek() is index:
+                price_index.clear()
+                for cache in self._caches:
+                    cache.clear()
+        return True
+
+
+scheduler = PromotionScheduler()
+
+# Um índice por processo; expira sozinho na próxima data de início/fim
+price_index = VersionedCache('promocoes', lambda: build_index(scheduler.now()),
+                             max_age=PriceIndex.seconds_left)
+
+
+def current_index():
+    return price_index.get()
+
+
+def init_app(app):
+    @app.before_request
+    def check_promotion_boundary():
+        scheduler.tick()
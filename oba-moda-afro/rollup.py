@@ -0,0 +1,122 @@
+# rollup.py
+"""
+Resumo diário de vendas (tabela daily_sales_rollup).
+
+O dashboard do admin lia a tabela de pedidos inteira a cada acesso. Agora
+cada pedido soma (ou subtrai) sua contribuição em uma linha por (dia, status)
+no momento em que é criado, muda de status/data/valor ou é excluído. O
+dashboard lê só algumas centenas de linhas do resumo.
+
+Se o resumo sair de sincronia (ex: edição direta no banco), reconstrua com:
+    flask reconstruir-resumo-vendas
+"""
+import datetime
+
+import click
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+
+from extensions import db
+from models import DailySalesRollup, Order, OrderItem
+
+
+def _day(value):
+    if value is None:
+        return datetime.date.today()
+    return value.date() if isinstance(value, datetime.datetime) else value
+
+
+def _apply(day, status, orders, revenue, items):
+    """Soma os deltas na linha (dia, status), criando-a se preciso (upsert)."""
+    table = DailySalesRollup.__table__
+    stmt = insert(table).values(day=day, status=status, order_count=orders,
+                                revenue=revenue, items_sold=items)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.status],
+        set_={
+            'order_count': table.c.order_count + stmt.excluded.order_count,
+            'revenue': table.c.revenue + stmt.excluded.revenue,
+            'items_sold': table.c.items_sold + stmt.excluded.items_sold,
+        }
+    )
+    db.session.execute(stmt)
+
+
+def _items_sold(order):
+    if order.id is None:
+        db.session.flush()
+    return db.session.query(func.coalesce(func.sum(OrderItem.quantity), 0))\
+                     .filter(OrderItem.order_id == order.id).scalar()
+
+
+def snapshot(order):
+    """(dia, status, valor, itens) do pedido como está agora no banco.
+
+    Chamar ANTES de aplicar o formulário: o autoflush das listas de itens
+    apagaria o histórico de alterações do SQLAlchemy.
+    """
+    return (_day(order.created_at), order.status, order.total_price or 0.0, _items_sold(order))
+
+
+def record_order(order, items_sold=None):
+    """Conta um pedido novo. Chamar antes do commit, na mesma transação."""
+    if items_sold is None:
+        items_sold = _items_sold(order)
+    _apply(_day(order.created_at), order.status or 'Pendente', 1, order.total_price or 0.0, items_sold)
+
+
+def record_order_change(order, previous):
+    """Move a contribuição do pedido se data, status, valor ou itens mudaram."""
+    current = snapshot(order)
+    if current == previous:
+        return
+    _apply(previous[0], previous[1], -1, -previous[2], -previous[3])
+    _apply(*current[:2], 1, *current[2:])
+
+
+def remove_order(order):
+    """Desconta um pedido que será excluído."""
+    _apply(_day(order.created_at), order.status, -1, -(order.total_price or 0.0), -_items_sold(order))
+
+
+def rebuild():
+    """Recalcula todo o resumo a partir dos pedidos (backfill)."""
+    items_per_order = db.session.query(
+        OrderItem.order_id.label('order_id'),
+        func.sum(OrderItem.quantity).label('quantity')
+    ).group_by(OrderItem.order_id).subquery()
+    day = func.date(Order.created_at)
+    rows = db.session.query(
+        day, Order.status, func.count(Order.id), func.sum(Order.total_price),
+        func.coalesce(func.sum(items_per_order.c.quantity), 0)
+    ).outerjoin(items_per_order, items_per_order.c.order_id == Order.id)\
+     .group_by(day, Order.status).all()
+    db.session.query(DailySalesRollup).delete()
+    for day_value, status, orders, revenue, items in rows:
+        if day_value is None:
+            continue
+        db.session.add(DailySalesRollup(
+            day=datetime.date.fromisoformat(day_value) if isinstance(day_value, str) else day_value,
+            status=status, order_count=orders, revenue=revenue or 0.0, items_sold=items
+        ))
+    db.session.commit()
+    return len(rows)
+
+
+def rows_between(start_day, end_day):
+    """Linhas do resumo no período (inclusivo), ordenadas por dia."""
+    return DailySalesRollup.query.filter(
+        DailySalesRollup.day >= start_day,
+        DailySalesRollup.day <= end_day
+    ).order_by(DailySalesRollup.day).all()
+
+
+@click.command('reconstruir-resumo-vendas')
+def rebuild_command():
+    """Recalcula o resumo diário de vendas a partir de todos os pedidos."""
+    total = rebuild()
+    click.echo(f'Resumo de vendas reconstruído: {total} linhas (dia, status).')
+
+
+def init_app(app):
+    app.cli.add_command(rebuild_command)
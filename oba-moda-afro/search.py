@@ -0,0 +1,282 @@
+# search.py
+"""
+Busca de produtos com um índice FTS5 do SQLite.
+
+A única busca era a do Flask-Admin (`column_searchable_list = ('name',)`),
+um LIKE '%...%' que varre a tabela inteira, e a loja não tinha busca
+nenhuma. Agora há uma tabela virtual FTS5 `product_search` (rowid = id do
+produto) com:
+
+    name | description (sem o HTML do CKEditor) | categories | sizes
+
+- tokenizer unicode61 com remove_diacritics: "perola" acha "Pérola" e
+  vice-versa, maiúsculas não importam;
+- ordem por relevância (bm25), com o nome pesando mais que categorias,
+  tamanhos e descrição;
+- índice de prefixos de 2 e 3 letras para o autocompletar;
+- todas as ocorrências entram na ordenação, e a paginação é o
+  LIMIT/OFFSET da própria consulta ordenada (nenhum resultado fica de fora).
+
+O índice é atualizado por eventos do SQLAlchemy, na mesma transação:
+produto criado/editado/excluído, tamanho (variação) adicionado ou
+renomeado, categoria renomeada ou excluída. Os UPDATEs em massa (estoque,
+contadores) não mexem em nada que é indexado.
+
+Usado em /busca, /busca/sugestoes e na busca de produtos do admin.
+Para (re)montar o índice inteiro: flask reindexar-busca
+"""
+import re
+from collections import namedtuple
+
+import click
+from markupsafe import Markup
+from sqlalchemy import column, delete, event, inspect, literal_column, select, table
+
+from extensions import db
+from models import Category, Product, Variation, product_category_association
+
+TABLE_NAME = 'product_search'
+
+# Pesos do bm25 na ordem das colunas: name, description, categories, sizes
+RANK = 'bm25(10.0, 1.0, 4.0, 2.0)'
+
+CREATE_STATEMENTS = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE_NAME} USING fts5("
+    "name, description, categories, sizes, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    f"INSERT INTO {TABLE_NAME}({TABLE_NAME}, rank) VALUES ('rank', '{RANK}')",
+)
+
+search_table = table(TABLE_NAME, column('rowid'), column('name'), column('description'),
+                     column('categories'), column('sizes'), column('rank'))
+
+# Palavras usadas de uma busca (o resto da frase é ignorado)
+MAX_TERMS = 8
+# Produtos reindexados por comando
+CHUNK = 500
+# Letras mínimas para o autocompletar
+SUGGEST_MIN_LENGTH = 2
+# Última página da busca: o OFFSET de ?pagina=999...9 estouraria o INTEGER
+# do SQLite (erro 500); 10 mil páginas já passam de qualquer catálogo
+MAX_PAGE = 10000
+
+_TERMS = re.compile(r'\w+')
+
+# Chave em session.info
+_PENDING = 'search_pending'
+
+SearchPage = namedtuple('SearchPage', ['items', 'page', 'has_next'])
+
+
+# --- Consultas ---
+
+def match_expression(text, column_name=None):
+    """
+    Converte o texto digitado numa expressão MATCH segura: cada palavra
+    entre aspas (todas obrigatórias) e a última também como prefixo (a
+    palavra inteira conta de novo no bm25, então "perola" vem antes de
+    "perolado"). None se não houver nenhuma palavra.
+    """
+    terms = _TERMS.findall(text or '')[:MAX_TERMS]
+    if not terms:
+        return None
+    *words, last = [f'"{term}"' for term in terms]
+    expression = ' AND '.join(words + [f'({last} OR {last}*)'])
+    return f'{column_name} : ({expression})' if column_name else expression
+
+
+def _matching(expression):
+    return literal_column(TABLE_NAME).op('MATCH')(expression)
+
+
+def ranked_ids(text, limit=None, offset=0, active_only=True, column_name=None):
+    """
+    Ids dos produtos que casam com `text`, do mais relevante para o menos.
+
+    O bm25 é calculado para todas as ocorrências: uma busca comum leva
+    menos de 1 ms; uma palavra que aparece em todos os 100k produtos do
+    benchmark, ~200 ms.
+    """
+    expression = match_expression(text, column_name)
+    if expression is None:
+        return []
+    stmt = select(search_table.c.rowid).where(_matching(expression)).order_by(search_table.c.rank)
+    if active_only:
+        stmt = stmt.join(Product.__table__, Product.id == search_table.c.rowid).where(Product.active == True)
+    if limit is not None:
+        stmt = stmt.limit(limit).offset(offset)
+    return list(db.session.scalars(stmt))
+
+
+def matching_ids_subquery(text):
+    """SELECT dos ids (ativos ou não) que casam com `text`, para usar em IN (admin)."""
+    expression = match_expression(text)
+    if expression is None:
+        return None
+    return select(search_table.c.rowid).where(_matching(expression))
+
+
+def search(text, page=1, per_page=24):
+    """Página `page` dos produtos ativos que casam com `text`, por relevância."""
+    page = max(1, min(page, MAX_PAGE))
+    ids = ranked_ids(text, limit=per_page + 1, offset=(page - 1) * per_page)
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+    if not ids:
+        return SearchPage([], page, False)
+    products = {p.id: p for p in Product.query.options(*Product.listing_options()).filter(Product.id.in_(ids))}
+    return SearchPage([products[pid] for pid in ids if pid in products], page, has_next)
+
+
+def suggest(text, limit=8):
+    """(nome, slug) dos produtos ativos cujo nome começa com o que foi digitado."""
+    if len((text or '').strip()) < SUGGEST_MIN_LENGTH:
+        return []
+    ids = ranked_ids(text, limit=limit, column_name='name')
+    if not ids:
+        return []
+    rows = {pid: (name, slug) for pid, name, slug in
+            db.session.execute(select(Product.id, Product.name, Product.slug).where(Product.id.in_(ids)))}
+    return [rows[pid] for pid in ids if pid in rows]
+
+
+# --- Índice ---
+
+def plain_text(html):
+    """Texto da descrição sem as tags e entidades do CKEditor."""
+    return Markup(html or '').striptags()
+
+
+def _chunks(ids):
+    ids = sorted(ids)
+    for start in range(0, len(ids), CHUNK):
+        yield ids[start:start + CHUNK]
+
+
+def reindex(connection, product_ids):
+    """Refaz as linhas do índice destes produtos (apaga as de produtos excluídos)."""
+    for ids in _chunks(product_ids):
+        connection.execute(delete(search_table).where(search_table.c.rowid.in_(ids)))
+        categories = {}
+        for product_id, name in connection.execute(
+                select(product_category_association.c.product_id, Category.name)
+                .join(Category, Category.id == product_category_association.c.category_id)
+                .where(product_category_association.c.product_id.in_(ids))):
+            categories.setdefault(product_id, []).append(name)
+        sizes = {}
+        for product_id, size in connection.execute(
+                select(Variation.product_id, Variation.size).where(Variation.product_id.in_(ids))):
+            sizes.setdefault(product_id, []).append(size)
+        rows = [
+            {'rowid': product_id, 'name': name, 'description': plain_text(description),
+             'categories': ' '.join(categories.get(product_id, [])),
+             'sizes': ' '.join(sizes.get(product_id, []))}
+            for product_id, name, description in connection.execute(
+                select(Product.id, Product.name, Product.description).where(Product.id.in_(ids)))
+        ]
+        if rows:
+            connection.execute(search_table.insert(), rows)
+
+
+def rebuild():
+    """Apaga e remonta o índice com todos os produtos. Retorna quantos."""
+    connection = db.session.connection()
+    connection.execute(delete(search_table))
+    product_ids = list(db.session.scalars(select(Product.id)))
+    reindex(connection, product_ids)
+    db.session.commit()
+    return len(product_ids)
+
+
+def create_table(connection):
+    for statement in CREATE_STATEMENTS:
+        connection.exec_driver_sql(statement)
+
+
+# Tabelas FTS5 do projeto (esta e a dos pedidos, ver order_search.py)
+FTS_TABLES = (TABLE_NAME, 'order_search')
+
+
+def include_name(name, type_, parent_names):
+    """Filtro do Alembic: as tabelas FTS5 e as tabelas internas delas não são modelos."""
+    return not (type_ == 'table' and name.startswith(FTS_TABLES))
+
+
+# --- Eventos (mantêm o índice em dia) ---
+
+def _changed(obj, *attributes):
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+def _before_flush(session, flush_context, instances):
+    products = []          # objetos (os novos ainda não têm id)
+    product_ids = set()
+    category_ids = set()
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Product):
+                products.append(obj)
+            elif isinstance(obj, Variation):
+                if obj.product is not None:
+                    products.append(obj.product)
+                elif obj.product_id is not None:
+                    product_ids.add(obj.product_id)
+        for obj in session.dirty:
+            if isinstance(obj, Product) and _changed(obj, 'name', 'description', 'categories'):
+                products.append(obj)
+            elif isinstance(obj, Variation) and _changed(obj, 'size', 'product_id'):
+                product_ids.update(pid for pid in inspect(obj).attrs.product_id.history.sum() if pid)
+                if obj.product is not None:
+                    products.append(obj.product)
+            elif isinstance(obj, Category) and _changed(obj, 'name'):
+                category_ids.add(obj.id)
+        for obj in session.deleted:
+            if isinstance(obj, Product):
+                product_ids.add(obj.id)
+            elif isinstance(obj, Variation) and obj.product_id is not None:
+                product_ids.add(obj.product_id)
+            elif isinstance(obj, Category):
+                # As linhas da associação somem neste flush
+                product_ids.update(p.id for p in obj.products)
+    if products or product_ids or category_ids:
+        pending = session.info.setdefault(_PENDING, ([], set(), set()))
+        pending[0].extend(products)
+        pending[1].update(product_ids)
+        pending[2].update(category_ids)
+
+
+def _after_flush(session, flush_context):
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    products, product_ids, category_ids = pending
+    product_ids = set(product_ids)
+    product_ids.update(p.id for p in products if p.id is not None)
+    connection = session.connection()
+    if category_ids:
+        product_ids.update(connection.execute(
+            select(product_category_association.c.product_id)
+            .where(product_category_association.c.category_id.in_(category_ids))).scalars())
+    reindex(connection, product_ids)
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(_PENDING, None)
+
+
+event.listen(db.session, 'before_flush', _before_flush)
+event.listen(db.session, 'after_flush', _after_flush)
+event.listen(db.session, 'after_soft_rollback', _after_rollback)
+# db.create_all() (testes, benchmarks) também cria a tabela FTS5
+event.listen(db.metadata, 'after_create', lambda target, connection, **kw: create_table(connection))
+
+
+@click.command('reindexar-busca')
+def reindex_command():
+    """Remonta o índice de busca (FTS5) com todos os produtos."""
+    click.echo(f'{rebuild()} produtos indexados.')
+
+
+def init_app(app):
+    app.cli.add_command(reindex_command)
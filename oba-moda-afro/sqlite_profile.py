@@ -0,0 +1,132 @@
+# sqlite_profile.py
+"""
+Perfil de produção do SQLite: WAL, pragmas e conexões de leitura/escrita.
+
+Com as opções padrão, cada escrita (contadores, carrinho, checkout) pegava
+um lock exclusivo do arquivo que bloqueava as leituras, e workers do
+gunicorn concorrentes recebiam "database is locked". Com
+SQLITE_PROFILE = 'producao' (padrão):
+
+- toda conexão recebe os PRAGMAS (WAL, synchronous=NORMAL, busy_timeout,
+  mmap e cache maiores): no WAL leitores não bloqueiam o escritor nem o
+  escritor bloqueia os leitores;
+- há dois pools para o mesmo arquivo. O engine padrão (escrita) abre toda
+  transação com BEGIN IMMEDIATE, então dois escritores fazem fila pelo
+  busy_timeout em vez de falhar no meio da transação ao tentar "subir" de
+  leitura para escrita. O engine 'leitura' (bind SQLITE_READ_BIND) tem
+  conexões `query_only` para os SELECTs;
+- a RoutingSession manda para a leitura os SELECTs de sessões que ainda não
+  escreveram nada. A partir do primeiro flush/INSERT/UPDATE/DELETE, a sessão
+  usa só a escrita até o commit/rollback (e enxerga o que acabou de gravar).
+
+Tamanhos dos pools: SQLITE_READ_POOL_SIZE (leituras simultâneas por
+processo, ~ threads do worker) e SQLITE_WRITE_POOL_SIZE.
+
+Teste de carga com vários processos: benchmarks/sqlite_load.py
+"""
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# Bind (SQLALCHEMY_BINDS) das conexões só de leitura
+SQLITE_READ_BIND = 'leitura'
+
+# Chave em session.info: a sessão já escreveu nesta transação
+_WRITING = 'sqlite_escrita'
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,          # ms esperando o lock antes de "database is locked"
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,          # negativo = KiB (64 MB por conexão)
+    'temp_store': 'MEMORY',
+}
+
+
+class RoutingSession(Session):
+    """Session do Flask-SQLAlchemy que separa leitura e escrita (ver acima)."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self.info.get(_WRITING):
+            if clause is not None and getattr(clause, 'is_dml', False):
+                self.info[_WRITING] = True
+            elif clause is not None and getattr(clause, 'is_select', False):
+                read_engine = self._db.engines.get(SQLITE_READ_BIND)
+                if read_engine is not None:
+                    return read_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _before_flush(session, flush_context, instances):
+    session.info[_WRITING] = True
+
+
+def _end_transaction(session, *args):
+    session.info.pop(_WRITING, None)
+
+
+def _is_file_database(uri):
+    return uri.startswith('sqlite') and ':memory:' not in uri and uri.rstrip('/') not in ('sqlite:', 'sqlite:/')
+
+
+def configure(app):
+    """Monta as opções dos engines. Chame antes de db.init_app(app)."""
+    app.config.setdefault('SQLITE_PROFILE', 'producao')
+    app.config.setdefault('SQLITE_PRAGMAS', {})
+    app.config.setdefault('SQLITE_READ_POOL_SIZE', 8)
+    app.config.setdefault('SQLITE_WRITE_POOL_SIZE', 2)
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if app.config['SQLITE_PROFILE'] != 'producao' or not _is_file_database(uri):
+        return
+    write_options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    write_options.setdefault('pool_size', app.config['SQLITE_WRITE_POOL_SIZE'])
+    write_options.setdefault('max_overflow', 2)
+    binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+    binds.setdefault(SQLITE_READ_BIND, {
+        'url': uri,
+        'pool_size': app.config['SQLITE_READ_POOL_SIZE'],
+        'max_overflow': app.config['SQLITE_READ_POOL_SIZE'],
+    })
+
+
+def _apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
+
+
+def init_app(app, db):
+    """Liga os pragmas e o BEGIN IMMEDIATE nos engines. Chame depois de db.init_app(app)."""
+    if app.config['SQLITE_PROFILE'] != 'producao' or not _is_file_database(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+    pragmas = {**PRAGMAS, **app.config['SQLITE_PRAGMAS']}
+    with app.app_context():
+        write_engine = db.engines[None]
+        read_engine = db.engines.get(SQLITE_READ_BIND)
+
+    @event.listens_for(write_engine, 'connect')
+    def connect_writer(dbapi_connection, connection_record):
+        _apply_pragmas(dbapi_connection, pragmas)
+        # O pysqlite abre transações sozinho (BEGIN "deferred"); quem abre é o evento abaixo
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(write_engine, 'begin')
+    def begin_immediate(connection):
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+    if read_engine is not None:
+        @event.listens_for(read_engine, 'connect')
+        def connect_reader(dbapi_connection, connection_record):
+            # journal_mode fica gravado no arquivo (a escrita já ligou o WAL)
+            _apply_pragmas(dbapi_connection, {k: v for k, v in pragmas.items() if k != 'journal_mode'})
+            dbapi_connection.execute('PRAGMA query_only = ON')
+
+    # Liga o WAL já na inicialização, antes da primeira leitura
+    with write_engine.connect():
+        pass
+
+
+event.listen(RoutingSession, 'before_flush', _before_flush)
+event.listen(RoutingSession, 'after_commit', _end_transaction)
+event.listen(RoutingSession, 'after_soft_rollback', _end_transaction)
@@ -0,0 +1,39 @@
+// Autocompletar do campo de busca do cabeçalho (ver /busca/sugestoes em app.py)
+document.addEventListener('DOMContentLoaded', function () {
+    var input = document.getElementById('busca-campo');
+    var list = document.getElementById('busca-sugestoes');
+    if (!input || !list) {
+        return;
+    }
+    var urls = {};
+    var timer = null;
+
+    input.addEventListener('input', function () {
+        // Escolheu uma sugestão: vai direto para o produto
+        if (urls[input.value]) {
+            window.location = urls[input.value];
+            return;
+        }
+        clearTimeout(timer);
+        var termo = input.value.trim();
+        if (termo.length < 2) {
+            list.innerHTML = '';
+            return;
+        }
+        // Espera a pessoa parar de digitar
+        timer = setTimeout(function () {
+            fetch(input.dataset.sugestoes + '?q=' + encodeURIComponent(termo))
+                .then(function (response) { return response.json(); })
+                .then(function (sugestoes) {
+                    urls = {};
+                    list.innerHTML = '';
+                    sugestoes.forEach(function (sugestao) {
+                        urls[sugestao.nome] = sugestao.url;
+                        var option = document.createElement('option');
+                        option.value = sugestao.nome;
+                        list.appendChild(option);
+                    });
+                });
+        }, 150);
+    });
+});
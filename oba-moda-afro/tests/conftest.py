@@ -0,0 +1,59 @@
+# tests/conftest.py
+"""
+Fixtures dos testes: cada teste ganha uma app com um banco SQLite novo
+(criado pelo db.create_all(), como nos benchmarks).
+
+Rode da pasta oba-moda-afro:  python -m pytest
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import facets
+import images
+import product_detail
+import promotions
+from app import create_app
+from cache import versions
+from counters import counters
+from extensions import db
+
+
+def _reset_process_caches():
+    # Caches por processo: o banco de cada teste recomeça com as versões em 0,
+    # então o que ficou guardado do teste anterior pareceria atual
+    versions._versions = {}
+    versions._checked_at = 0.0
+    for cache in (promotions.price_index, images.variant_cache,
+                  facets.facet_cache, product_detail.size_matrix_cache):
+        cache.clear()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    _reset_process_caches()
+    # create_app registra o cache da home no scheduler: não acumula entre testes
+    monkeypatch.setattr(promotions.scheduler, '_caches', [])
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'loja.db'}",
+        'JOBS_IN_APP': False,
+        'PERF_PROFILE_RATE': 0,
+    })
+    with app.app_context():
+        db.create_all()
+    yield app
+    counters.flush()
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    _reset_process_caches()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
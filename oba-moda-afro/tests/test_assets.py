@@ -0,0 +1,49 @@
+# tests/test_assets.py
+"""
+Cache dos arquivos de /static (assets.py): só os nomes gerados com o hash
+do conteúdo saem imutáveis; o resto fica com o cache padrão.
+"""
+import pytest
+
+from assets import IMMUTABLE
+
+HASHED = (
+    'dist/css/style.3f2a9c1b0d4e.css',
+    'uploads/product_0123456789abcdef01234567.jpg',
+    'uploads/banner_d_0123456789abcdef01234567.png',
+    'uploads/derivados/0123456789abcdef0123456789abcdef-640w.webp',
+)
+NOT_HASHED = (
+    'css/style.css',
+    'uploads/Screenshot_20240101123045.png',
+    'uploads/turbante-0123456789abcdef.jpg',
+    'uploads/foto.3f2a9c1b0d4e.jpg',
+    'dist/manifest.json',
+)
+
+
+@pytest.fixture
+def static_folder(app, tmp_path):
+    folder = tmp_path / 'static'
+    for name in HASHED + NOT_HASHED:
+        path = folder / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'conteudo')
+    app.static_folder = str(folder)
+    return folder
+
+
+@pytest.mark.parametrize('name', HASHED)
+def test_generated_names_are_immutable(client, static_folder, name):
+    response = client.get(f'/static/{name}')
+
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == IMMUTABLE
+
+
+@pytest.mark.parametrize('name', NOT_HASHED)
+def test_other_names_keep_the_default_cache(client, static_folder, name):
+    response = client.get(f'/static/{name}')
+
+    assert response.status_code == 200
+    assert 'immutable' not in response.headers.get('Cache-Control', '')
@@ -0,0 +1,35 @@
+# tests/test_catalog.py
+"""
+Cursores da paginação (catalog.py): um ?cursor= montado na mão volta para
+a primeira página em vez de dar erro 500.
+"""
+import pytest
+
+from catalog import encode_cursor
+from extensions import db
+from models import Product
+
+
+@pytest.fixture
+def products(app):
+    with app.app_context():
+        db.session.add_all(Product(name=f'Brinco {n}', slug=f'brinco-{n}', price=10.0 + n) for n in range(3))
+        db.session.commit()
+
+
+@pytest.mark.parametrize('sort, value, product_id', [
+    ('nome', 'Brinco 0', 10 ** 30),
+    ('nome', 'Brinco 0', 1e999),
+    ('nome', 'Brinco 0', -2 ** 63 - 1),
+    ('preco', 10 ** 30, 1),
+    ('preco', 1e999, 1),
+    ('preco', float('nan'), 1),
+    ('novos', 2 ** 63, 1),
+])
+def test_out_of_range_cursor_falls_back_to_first_page(client, products, sort, value, product_id):
+    first = client.get(f'/produtos?ordem={sort}')
+
+    response = client.get(f'/produtos?ordem={sort}&cursor={encode_cursor(value, product_id)}')
+
+    assert response.status_code == 200
+    assert response.data == first.data
@@ -0,0 +1,60 @@
+# tests/test_checkout.py
+"""
+Checkouts simultâneos do mesmo tamanho (versão pequena do
+benchmarks/checkout_stress.py): o estoque nunca fica negativo e não se
+vende mais do que havia.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func
+
+from extensions import db
+from models import Order, OrderItem, Product, Variation
+
+STOCK = 5
+CLIENTS = 16         # múltiplo de THREADS: a barreira fecha em toda rodada
+THREADS = 8
+
+
+def test_concurrent_checkouts_never_oversell(app):
+    with app.app_context():
+        product = Product(name='Turbante Edição Limitada', slug='turbante-edicao-limitada', price=89.9,
+                          variations=[Variation(size='Único', stock=STOCK), Variation(size='Infantil', stock=STOCK)])
+        db.session.add(product)
+        db.session.commit()
+        variation_ids = [v.id for v in product.variations]
+
+    # Carrinhos montados antes, para os checkouts saírem juntos
+    clients = []
+    for _ in range(CLIENTS):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['cart'] = {str(v): 1 for v in variation_ids}
+        clients.append(client)
+    start = threading.Barrier(THREADS)
+
+    def checkout(client):
+        try:
+            start.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            pass
+        response = client.post('/checkout/criar-pedido')
+        return 'wa.me' in (response.location or '')
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        succeeded = sum(pool.map(checkout, clients))
+
+    with app.app_context():
+        stocks = dict(db.session.query(Variation.id, Variation.stock))
+        sold = dict(db.session.query(OrderItem.variation_id, func.sum(OrderItem.quantity))
+                    .group_by(OrderItem.variation_id))
+        orders = db.session.query(func.count(Order.id)).scalar()
+
+    assert all(stock >= 0 for stock in stocks.values())
+    for variation_id in variation_ids:
+        assert sold.get(variation_id, 0) + stocks[variation_id] == STOCK
+    assert orders == succeeded <= STOCK
+    # Com mais clientes que estoque, tudo deve ser vendido
+    assert orders == STOCK
+    assert set(stocks.values()) == {0}
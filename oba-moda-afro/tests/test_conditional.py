@@ -0,0 +1,109 @@
+# tests/test_conditional.py
+"""
+GET condicional das páginas da loja (conditional.py): a visita repetida
+recebe 304 sem renderizar template, e o ETag muda com o que aparece na
+página (carrinho, estoque); mensagem flash pendente sempre renderiza.
+"""
+from contextlib import contextmanager
+
+import pytest
+from flask import template_rendered
+
+from extensions import db
+from models import Category, Product, Variation
+
+PAGES = ('/', '/produtos', '/categoria/turbantes', '/produto/turbante-kente')
+
+
+@contextmanager
+def rendered_templates(app):
+    names = []
+
+    def record(sender, template, context, **extra):
+        names.append(template.name)
+
+    with template_rendered.connected_to(record, app):
+        yield names
+
+
+@pytest.fixture
+def product(app):
+    with app.app_context():
+        category = Category(name='Turbantes', slug='turbantes')
+        product = Product(name='Turbante Kente', slug='turbante-kente', price=59.9, categories=[category],
+                          variations=[Variation(size='Único', stock=5)])
+        db.session.add(product)
+        db.session.commit()
+        return product.id, product.variations[0].id
+
+
+def _etag(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.get_etag()[0]
+    return response.get_etag()[0]
+
+
+def _revalidate(app, client, path, etag):
+    with rendered_templates(app) as templates:
+        response = client.get(path, headers={'If-None-Match': f'"{etag}"'})
+    return response, templates
+
+
+@pytest.mark.parametrize('path', PAGES)
+def test_repeated_request_returns_304_without_rendering(app, client, product, path):
+    etag = _etag(client, path)
+
+    response, templates = _revalidate(app, client, path, etag)
+
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.get_etag()[0] == etag
+    assert templates == []
+
+
+def test_etag_changes_after_cart_update(app, client, product):
+    product_id, variation_id = product
+    etag = _etag(client, '/produtos')
+
+    client.post(f'/carrinho/adicionar/{product_id}', data={'variation_id': variation_id, 'quantity': 2})
+    client.get('/carrinho')  # mostra (e consome) a mensagem de "adicionado"
+    response, templates = _revalidate(app, client, '/produtos', etag)
+
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etag
+    assert 'produtos.html' in templates
+
+
+def test_flashed_message_is_always_rendered(app, client, product):
+    etag = _etag(client, '/produtos')
+    with client.session_transaction() as session:
+        session['_flashes'] = [('info', 'Frete grátis neste fim de semana')]
+
+    response, templates = _revalidate(app, client, '/produtos', etag)
+
+    assert response.status_code == 200
+    assert 'Frete grátis neste fim de semana' in response.get_data(as_text=True)
+    assert 'produtos.html' in templates
+    # Sem ETag: o navegador não guarda a página com a mensagem
+    assert response.get_etag() == (None, None)
+
+    # Mensagem já exibida: volta a responder 304
+    response, templates = _revalidate(app, client, '/produtos', etag)
+    assert response.status_code == 304
+    assert templates == []
+
+
+def test_etag_changes_after_stock_change(app, client, product):
+    _, variation_id = product
+    etags = {path: _etag(client, path) for path in PAGES}
+
+    with app.app_context():
+        db.session.get(Variation, variation_id).stock = 0
+        db.session.commit()
+
+    for path, etag in etags.items():
+        response, templates = _revalidate(app, client, path, etag)
+        assert response.status_code == 200, path
+        assert response.get_etag()[0] != etag, path
+        assert templates, path
@@ -0,0 +1,43 @@
+# tests/test_jobs.py
+"""
+Worker das tarefas em segundo plano (jobs.py): um erro do banco ao gravar
+o resultado de uma tarefa não derruba o laço.
+"""
+from sqlalchemy.exc import OperationalError
+
+import jobs
+from extensions import db
+from models import Job
+
+
+def _fail(payload, result):
+    raise RuntimeError('falha ao aplicar o resultado')
+
+
+def _ok(payload, result):
+    pass
+
+
+def test_worker_survives_database_error_while_recording_failure(app, monkeypatch):
+    app.config['JOB_WORKERS'] = 2
+    monkeypatch.setitem(jobs._handlers, 'teste-falha', jobs.JobHandler(lambda payload: (int, ()), _fail))
+    monkeypatch.setitem(jobs._handlers, 'teste-ok', jobs.JobHandler(lambda payload: (int, ()), _ok))
+    with app.app_context():
+        jobs.enqueue('teste-falha')
+        jobs.enqueue('teste-ok')
+        db.session.commit()
+
+    finish = jobs.worker._finish
+
+    def locked_when_recording_errors(job_id, error=None):
+        if error is not None:
+            raise OperationalError('UPDATE job', {}, Exception('database is locked'))
+        finish(job_id, error)
+
+    monkeypatch.setattr(jobs.worker, '_finish', locked_when_recording_errors)
+
+    jobs.worker.run(once=True)
+
+    with app.app_context():
+        statuses = dict(db.session.query(Job.kind, Job.status))
+    assert statuses == {'teste-falha': jobs.RUNNING, 'teste-ok': jobs.DONE}
@@ -0,0 +1,148 @@
+# tests/test_promotions.py
+"""
+Viradas de preço do PromotionScheduler com um relógio falso: duas
+campanhas que se sobrepõem no mesmo produto, andando o relógio por cada
+data de início e fim.
+"""
+import datetime
+
+import pytest
+
+import promotions
+from extensions import db
+from models import Product, Promotion
+
+T0 = datetime.datetime(2026, 11, 27, 0, 0, 0)
+HOUR = datetime.timedelta(hours=1)
+TICK = promotions.END_BOUNDARY_DELAY
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock(T0)
+    monkeypatch.setattr(promotions.scheduler, 'clock', clock)
+    return clock
+
+
+def _product_with_campaigns(campaigns):
+    """Produto de R$ 100 com as campanhas [(nome, desconto, início, fim)]."""
+    product = Product(name='Vestido Ankara', slug='vestido-ankara', price=100.0)
+    for name, discount, start, end in campaigns:
+        db.session.add(Promotion(name=name, is_active=True, discount_percent=discount,
+                                 start_date=start, end_date=end, products=[product]))
+    db.session.add(product)
+    db.session.commit()
+    return product
+
+
+def _step(clock, now):
+    """Anda o relógio e roda o que cada requisição roda antes da rota."""
+    clock.now = now
+    return promotions.scheduler.tick()
+
+
+def test_overlapping_campaigns_switch_prices_at_each_boundary(app, clock):
+    with app.app_context():
+        # 10% das 1h às 3h e 30% das 2h às 4h: na sobreposição vale o maior
+        product = _product_with_campaigns([
+            ('Esquenta', 10, T0 + HOUR, T0 + 3 * HOUR),
+            ('Black Friday', 30, T0 + 2 * HOUR, T0 + 4 * HOUR),
+        ])
+        scheduler = promotions.scheduler
+
+        assert product.current_price == 100.0
+        assert scheduler.next_boundary() == T0 + HOUR
+        assert scheduler.ttl() == 3600
+        assert scheduler.ttl(max_age=60) == 60
+        assert _step(clock, T0 + HOUR - datetime.timedelta(seconds=1)) is False
+        assert scheduler.ttl() == 1
+        assert product.current_price == 100.0
+
+        # Início da primeira campanha
+        assert _step(clock, T0 + HOUR) is True
+        assert product.current_price == 90.0
+        assert scheduler.next_boundary() == T0 + 2 * HOUR
+        assert scheduler.ttl() == 3600
+        assert _step(clock, T0 + HOUR + datetime.timedelta(minutes=30)) is False
+
+        # Início da segunda: as duas valem, fica o maior desconto
+        assert _step(clock, T0 + 2 * HOUR) is True
+        assert product.current_price == 70.0
+        assert scheduler.next_boundary() == T0 + 3 * HOUR + TICK
+
+        # O fim é inclusivo: no instante exato a primeira ainda vale
+        assert _step(clock, T0 + 3 * HOUR) is False
+        assert product.current_price == 70.0
+        assert scheduler.ttl() == TICK.total_seconds()
+
+        # Fim da primeira: a segunda continua
+        assert _step(clock, T0 + 3 * HOUR + TICK) is True
+        assert product.current_price == 70.0
+        assert scheduler.next_boundary() == T0 + 4 * HOUR + TICK
+        assert scheduler.ttl() == 3600
+
+        # Fim da segunda: sem promoção e sem próxima virada
+        assert _step(clock, T0 + 4 * HOUR + TICK) is True
+        assert product.current_price == 100.0
+        assert product.is_on_sale is False
+        assert scheduler.next_boundary() is None
+        assert scheduler.ttl() is None
+        assert scheduler.ttl(max_age=60) == 60
+        assert _step(clock, T0 + 10 * HOUR) is False
+
+
+def test_longer_weaker_campaign_takes_over_when_stronger_one_ends(app, clock):
+    with app.app_context():
+        product = _product_with_campaigns([
+            ('Relâmpago', 40, T0 + HOUR, T0 + 2 * HOUR),
+            ('Semana Afro', 15, T0, T0 + 5 * HOUR),
+        ])
+        scheduler = promotions.scheduler
+
+        assert product.current_price == 85.0
+        assert scheduler.next_boundary() == T0 + HOUR
+
+        assert _step(clock, T0 + HOUR) is True
+        assert product.current_price == 60.0
+        assert scheduler.next_boundary() == T0 + 2 * HOUR + TICK
+
+        assert _step(clock, T0 + 2 * HOUR + TICK) is True
+        assert product.current_price == 85.0
+        assert scheduler.next_boundary() == T0 + 5 * HOUR + TICK
+
+        assert _step(clock, T0 + 5 * HOUR + TICK) is True
+        assert product.current_price == 100.0
+        assert scheduler.next_boundary() is None
+
+
+def test_tick_clears_registered_caches_only_after_a_boundary(app, clock):
+    class RecordingCache:
+        cleared = 0
+
+        def clear(self):
+            self.cleared += 1
+
+    cache = RecordingCache()
+    promotions.scheduler.register(cache)
+    with app.app_context():
+        product = _product_with_campaigns([('Esquenta', 10, T0 + HOUR, None)])
+        assert product.current_price == 100.0
+
+        assert _step(clock, T0 + HOUR - datetime.timedelta(seconds=1)) is False
+        assert cache.cleared == 0
+
+        assert _step(clock, T0 + HOUR) is True
+        assert cache.cleared == 1
+        # Campanha sem data de fim: nada mais para virar
+        assert product.current_price == 90.0
+        assert promotions.scheduler.next_boundary() is None
+        assert _step(clock, T0 + 100 * HOUR) is False
+        assert cache.cleared == 1
@@ -0,0 +1,32 @@
+# tests/test_search.py
+"""
+Página de busca (/busca, search.py): ?pagina= fora da faixa não dá erro.
+"""
+import pytest
+
+import search
+from extensions import db
+from models import Product
+
+
+@pytest.fixture
+def products(app):
+    with app.app_context():
+        db.session.add_all(Product(name=f'Anel {n}', slug=f'anel-{n}', price=20.0) for n in range(3))
+        db.session.commit()
+
+
+@pytest.mark.parametrize('page', ['99999999999999999999999', str(2 ** 63), str(search.MAX_PAGE + 1)])
+def test_huge_page_is_clamped(app, client, products, page):
+    response = client.get(f'/busca?q=anel&pagina={page}')
+
+    assert response.status_code == 200
+    with app.test_request_context():
+        assert search.search('anel', page=int(page)).page == search.MAX_PAGE
+
+
+def test_first_page_still_lists_matches(client, products):
+    response = client.get('/busca?q=anel&pagina=-5')
+
+    assert response.status_code == 200
+    assert b'Anel 0' in response.data